@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "engine.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -137,6 +138,37 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AWS_ACCESS_KEY_ID = env("AWS_ACCESS_KEY_ID", default="")
 AWS_SECRET_ACCESS_KEY = env("AWS_SECRET_ACCESS_KEY", default="")
 AWS_STORAGE_BUCKET_NAME = env("AWS_STORAGE_BUCKET_NAME", default="")
+# Where datasets are stored: "s3" or "local" (files under LOCAL_STORAGE_ROOT)
+STORAGE_BACKEND = env("STORAGE_BACKEND", default="s3")
+LOCAL_STORAGE_ROOT = env("LOCAL_STORAGE_ROOT", default=str(BASE_DIR / "storage"))
+# Memory-map local files for ranged reads instead of reading them
+LOCAL_STORAGE_MMAP = env.bool("LOCAL_STORAGE_MMAP", default=True)
+# Codec of JSON objects written to storage: "zstd", "gzip" or "identity"
+STORAGE_COMPRESSION = env("STORAGE_COMPRESSION", default="zstd")
+# Concurrent object reads and writes per worker, the S3 connection pool is sized for it
+STORAGE_MAX_CONCURRENCY = env.int("STORAGE_MAX_CONCURRENCY", default=16)
+# Attempts per S3 request, retried with adaptive rate limiting on throttling
+S3_MAX_ATTEMPTS = env.int("S3_MAX_ATTEMPTS", default=5)
+# Memory budget per worker for decoded datasets and metadata
+DATASET_CACHE_MAX_BYTES = env.int("DATASET_CACHE_MAX_BYTES", default=512 * 1024**2)
+# Results of expensive classifier transforms, such as phone number parsing,
+# remembered per worker for the most common values
+CLASSIFIER_MEMO_MAX_ENTRIES = env.int("CLASSIFIER_MEMO_MAX_ENTRIES", default=100_000)
+# Processes per worker for CPU-bound classification of large columns, 0 (the
+# default) to classify in the worker itself. Each gunicorn worker starts its
+# own pool, so a host runs up to gunicorn's --workers times this many, keep
+# the product around the host's CPU count
+CLASSIFY_PROCESS_POOL_WORKERS = env.int("CLASSIFY_PROCESS_POOL_WORKERS", default=0)
+# Values to transform from which a column is classified on the process pool,
+# in chunks of this size
+CLASSIFY_PROCESS_POOL_MIN_VALUES = env.int(
+    "CLASSIFY_PROCESS_POOL_MIN_VALUES", default=20_000
+)
+CLASSIFY_PROCESS_POOL_CHUNK_SIZE = env.int(
+    "CLASSIFY_PROCESS_POOL_CHUNK_SIZE", default=5_000
+)
+# Responses smaller than this are sent uncompressed
+RESPONSE_COMPRESSION_MIN_BYTES = env.int("RESPONSE_COMPRESSION_MIN_BYTES", default=1024)
 AI_API_KEY = env("AI_API_KEY", default="")
 AI_BASE_URL = "https://openrouter.ai/api/v1"
 # Clerk settings
@@ -165,6 +197,10 @@ REST_FRAMEWORK = {
         "engine.authentication.ClerkJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "engine.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
 
 
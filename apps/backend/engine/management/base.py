@@ -0,0 +1,27 @@
+import time
+from typing import Callable
+
+from django.core.management.base import BaseCommand
+
+
+class BenchmarkCommand(BaseCommand):
+    """
+    Base of the benchmark commands, which time a function over --repeat runs
+    and keep the best. They skip the system checks: those import every view,
+    which would connect the AI services for nothing.
+    """
+
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Runs per measurement, best is kept"
+        )
+
+    def _time(self, func: Callable, repeat: int) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,78 @@
+import random
+import string
+
+from engine.management.base import BenchmarkCommand
+from engine.middleware import ContentEncoding, StreamCompressor
+from engine.renderers import ORJSONRenderer
+from engine.services.csv_service import CSVService
+
+
+class Command(BenchmarkCommand):
+    help = "Benchmark response compression of a dataset page: CPU time and size"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--rows", type=int, default=50_000, help="Rows per page")
+        parser.add_argument(
+            "--columns", type=int, default=8, help="Columns of the dataset"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=64 * 1024,
+            help="Bytes per chunk when compressing as a stream",
+        )
+
+    def handle(self, *args, **options):
+        body = self._generate_body(options["rows"], options["columns"])
+        chunk_size = options["chunk_size"]
+        chunks = [
+            body[start : start + chunk_size]
+            for start in range(0, len(body), chunk_size)
+        ]
+        self.stdout.write(
+            f"{options['rows']:,} rows x {options['columns']} columns, "
+            f"{len(body) / 1024**2:.1f} MB of JSON"
+        )
+
+        for encoding in ContentEncoding:
+            for label, compress in (
+                ("whole", lambda: StreamCompressor(encoding).compress_all(body)),
+                (
+                    "streamed",
+                    lambda: b"".join(
+                        StreamCompressor(encoding).compress_stream(iter(chunks))
+                    ),
+                ),
+            ):
+                seconds = self._time(compress, options["repeat"])
+                size = len(compress())
+                self.stdout.write(
+                    f"  {encoding.value:<5} {label:<9} {seconds * 1000:8.1f} ms "
+                    f"{len(body) / seconds / 1024**2:8.0f} MB/s "
+                    f"{size / 1024**2:6.2f} MB ({len(body) / size:4.1f}x)"
+                )
+
+    def _generate_body(self, rows: int, columns: int) -> bytes:
+        """A page of rows rendered the way get_csv renders it"""
+        rng = random.Random(0)
+        words = ["".join(rng.choices(string.ascii_lowercase, k=8)) for _ in range(1000)]
+        dataset = [
+            {
+                "id": f"col_{index}",
+                "label": f"col_{index}",
+                "classification": None,
+                "data": [rng.choice(words) for _ in range(rows)],
+            }
+            for index in range(columns)
+        ]
+        dataset.append(
+            {
+                "id": "row_id",
+                "label": "Row ID",
+                "classification": None,
+                "data": list(range(rows)),
+            }
+        )
+        _, rows = CSVService().transform_to_row_format(dataset, external_ids=True)
+        return ORJSONRenderer().render({"rows": rows})
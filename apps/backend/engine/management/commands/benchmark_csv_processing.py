@@ -0,0 +1,114 @@
+import random
+import string
+import uuid
+from typing import List
+
+import polars as pl
+
+from engine.management.base import BenchmarkCommand
+from engine.services.csv_service import CSVService
+
+
+def legacy_process_dataframe(df: pl.DataFrame) -> pl.DataFrame:
+    """Column-by-column empty column detection used before vectorization"""
+    non_empty_cols = [
+        col
+        for col in df.columns
+        if df[col].fill_null("").cast(pl.Utf8).str.strip_chars().ne("").any()
+    ]
+    df = df.select(non_empty_cols or df.columns)
+    return df.rename(
+        {col: "(No name)" if not col.strip() else col for col in df.columns}
+    )
+
+
+def legacy_convert_df_to_columns(df: pl.DataFrame) -> List[dict]:
+    """Per-cell conversion used before vectorization"""
+    row_ids = [str(uuid.uuid4()) for _ in range(len(df))]
+    columns = []
+    for col_name in df.columns:
+        column_data = [
+            str(val)
+            if val is not None and str(val).strip() not in ["", "None"]
+            else None
+            for val in df[col_name].to_list()
+        ]
+        columns.append(
+            {
+                "id": CSVService.generate_column_id(col_name),
+                "label": col_name,
+                "classification": None,
+                "data": column_data,
+            }
+        )
+    columns.append(
+        {"id": "row_id", "label": "Row ID", "classification": None, "data": row_ids}
+    )
+    return columns
+
+
+class Command(BenchmarkCommand):
+    help = "Benchmark CSV processing and column conversion against the legacy per-cell implementation"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[100_000, 1_000_000],
+            help="Row counts to benchmark",
+        )
+
+    def handle(self, *args, **options):
+        csv_service = CSVService()
+
+        for rows in options["rows"]:
+            df = self._generate_dataframe(rows)
+            self.stdout.write(f"\n{rows:,} rows x {df.width} columns")
+
+            for name, legacy, vectorized in (
+                (
+                    "_process_dataframe",
+                    lambda: legacy_process_dataframe(df),
+                    lambda: csv_service._process_dataframe(df),
+                ),
+                (
+                    "convert_df_to_columns",
+                    lambda: legacy_convert_df_to_columns(df),
+                    lambda: csv_service.convert_df_to_columns(df),
+                ),
+                (
+                    "to_dataset_frame",
+                    lambda: legacy_convert_df_to_columns(df),
+                    lambda: csv_service.to_dataset_frame(
+                        df, [f"col_{i}" for i in range(df.width)]
+                    ),
+                ),
+            ):
+                legacy_time = self._time(legacy, options["repeat"])
+                vectorized_time = self._time(vectorized, options["repeat"])
+                self.stdout.write(
+                    f"  {name:<22} legacy {legacy_time:8.3f}s  "
+                    f"vectorized {vectorized_time:8.3f}s  "
+                    f"speedup {legacy_time / vectorized_time:6.1f}x"
+                )
+
+    def _generate_dataframe(self, rows: int) -> pl.DataFrame:
+        """Contact-list shaped data with numbers, blanks and an empty column"""
+        rng = random.Random(0)
+        names = ["".join(rng.choices(string.ascii_lowercase, k=8)) for _ in range(1000)]
+        domains = ["example.com", "acme.io", "mail.net", " ", ""]
+        return pl.DataFrame(
+            {
+                "First Name": [rng.choice(names) for _ in range(rows)],
+                "Last Name": [rng.choice(names) for _ in range(rows)],
+                "Email": [
+                    f"{rng.choice(names)}@{rng.choice(domains)}" for _ in range(rows)
+                ],
+                "Company": [rng.choice(names + [None, "  "]) for _ in range(rows)],
+                "Employees": [rng.randint(1, 10_000) for _ in range(rows)],
+                "Revenue": [rng.random() * 1e6 for _ in range(rows)],
+                "Notes": [None] * rows,
+            }
+        )
@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import random
+import resource
+import string
+import tempfile
+
+import django
+import polars as pl
+
+from engine.management.base import BenchmarkCommand
+
+CHUNK_ROWS = 100_000
+
+
+def measure_peak_memory(path: str, profile: bool, queue):
+    """Read or profile a CSV and report the peak RSS of the process, in MB"""
+    django.setup()
+    from engine.services.csv_service import CSVService
+
+    csv_service = CSVService()
+    if profile:
+        csv_service._scan_columns(path)
+    else:
+        for _ in csv_service._read_csv_batches(path):
+            pass
+    # ru_maxrss is in KB on Linux
+    queue.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)
+
+
+class Command(BenchmarkCommand):
+    help = "Benchmark the peak memory of profiling CSVs of growing size on ingest"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[250_000, 1_000_000, 2_000_000],
+            help="Row counts to benchmark",
+        )
+
+    def handle(self, *args, **options):
+        # Each measurement gets a fresh process, as peak RSS only grows
+        context = multiprocessing.get_context("spawn")
+        with tempfile.TemporaryDirectory() as directory:
+            for rows in options["rows"]:
+                path = os.path.join(directory, f"{rows}.csv")
+                self._write_csv(path, rows)
+                size = os.path.getsize(path) / 1024**2
+                peaks = {}
+                for name, profile in (("read", False), ("profile", True)):
+                    peaks[name] = min(
+                        self._measure(context, path, profile)
+                        for _ in range(options["repeat"])
+                    )
+                self.stdout.write(
+                    f"{rows:>10,} rows {size:8.1f} MB  "
+                    f"peak RSS: read {peaks['read']:7.1f} MB  "
+                    f"read and profile {peaks['profile']:7.1f} MB"
+                )
+
+    def _measure(self, context, path: str, profile: bool) -> float:
+        queue = context.Queue()
+        process = context.Process(
+            target=measure_peak_memory, args=(path, profile, queue)
+        )
+        process.start()
+        peak = queue.get()
+        process.join()
+        return peak
+
+    def _write_csv(self, path: str, rows: int):
+        """Contact-list shaped data, with unique IDs and emails, in chunks"""
+        rng = random.Random(0)
+        names = ["".join(rng.choices(string.ascii_lowercase, k=8)) for _ in range(1000)]
+        with open(path, "wb") as file:
+            for start in range(0, rows, CHUNK_ROWS):
+                size = min(CHUNK_ROWS, rows - start)
+                pl.DataFrame(
+                    {
+                        "ID": [str(start + i) for i in range(size)],
+                        "Name": [rng.choice(names) for _ in range(size)],
+                        "Email": [
+                            f"{rng.choice(names)}{start + i}@example.com"
+                            for i in range(size)
+                        ],
+                        "Country": [
+                            rng.choice(["US", "FR", "DE", ""]) for _ in range(size)
+                        ],
+                        "Amount": [f"{rng.random() * 1e4:.2f}" for _ in range(size)],
+                        "Joined": [
+                            f"20{rng.randint(10, 24)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"
+                            for _ in range(size)
+                        ],
+                    }
+                ).write_csv(file, include_header=start == 0)
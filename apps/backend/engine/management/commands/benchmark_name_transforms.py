@@ -0,0 +1,119 @@
+import random
+from typing import List
+
+import polars as pl
+
+from engine.management.base import BenchmarkCommand
+from engine.services.base import BaseClassifier
+from engine.services.column_processor import PersonFirstNameClassifier
+from engine.services.dictionary import DictionaryData
+
+SYLLABLES = [
+    "an", "na", "ma", "ri", "el", "jo", "se", "li", "ka", "to", "ber", "ger",
+    "mül", "ler", "ño", "zé", "ça", "ø", "ås", "ay", "şe",
+]  # fmt: skip
+# Names the expression leaves to transform: dotless i, scripts other than
+# Latin, and digits
+FALLBACK_NAMES = [
+    "ılkay", "Işık", "Ayşe Yıldız", "Σοφία", "Дмитрий", "Олег", "李伟", "王芳",
+    "Nguyễn", "Trần", "محمد", "Jean2", "Mary-Ann 3rd",
+]  # fmt: skip
+
+
+class Command(BenchmarkCommand):
+    help = (
+        "Benchmark the name transform per distinct value against its Polars "
+        "expression, on names some of which fall back to the per-value transform"
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument(
+            "--distinct",
+            type=int,
+            nargs="+",
+            default=[10_000, 100_000, 1_000_000],
+            help="Distinct names to draw the rows from",
+        )
+        parser.add_argument(
+            "--fallback",
+            type=float,
+            nargs="+",
+            default=[0.0, 0.05, 0.2],
+            help="Shares of distinct names the expression leaves to transform",
+        )
+
+    def handle(self, *args, **options):
+        classifier = PersonFirstNameClassifier(column_id="name")
+        expr = classifier.transform_expr(pl.col("value"))
+
+        for distinct in options["distinct"]:
+            for share in options["fallback"]:
+                values = self._generate_names(options["rows"], distinct, share)
+                dictionary = DictionaryData.encode(values).dictionary
+
+                def per_value():
+                    return [classifier.transform(value) for value in dictionary]
+
+                def vectorized():
+                    results = classifier._transform_vectorized(dictionary, expr)
+                    return [
+                        classifier.transform(value) if result is None else result
+                        for value, result in zip(dictionary, results)
+                    ]
+
+                timings = {
+                    name: self._time_uncached(func, options["repeat"])
+                    for name, func in (
+                        ("per_value", per_value),
+                        ("vectorized", vectorized),
+                        (
+                            "column_per_value",
+                            lambda: classifier.map_distinct(
+                                values, classifier.transform
+                            ),
+                        ),
+                        (
+                            "column_vectorized",
+                            lambda: classifier.transform_values(values),
+                        ),
+                    )
+                }
+                self.stdout.write(
+                    f"{len(dictionary):>9,} distinct, {share:4.0%} fallback  "
+                    f"distinct values: per value {timings['per_value']:6.3f}s "
+                    f"vectorized {timings['vectorized']:6.3f}s "
+                    f"({timings['per_value'] / timings['vectorized']:4.1f}x)  "
+                    f"column: per value {timings['column_per_value']:6.3f}s "
+                    f"vectorized {timings['column_vectorized']:6.3f}s "
+                    f"({timings['column_per_value'] / timings['column_vectorized']:4.1f}x)"
+                )
+
+    def _time_uncached(self, func, repeat: int) -> float:
+        """Time func with the transform memo emptied before each run"""
+
+        def run():
+            BaseClassifier.memo.clear()
+            func()
+
+        return self._time(run, repeat)
+
+    def _generate_names(self, rows: int, distinct: int, share: float) -> List[str]:
+        """Names in mixed case and padding, share of them falling back"""
+        rng = random.Random(0)
+        names = []
+        for _ in range(distinct):
+            if rng.random() < share:
+                name = rng.choice(FALLBACK_NAMES) + rng.choice(["", "a", "ov"])
+            else:
+                name = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+            style = rng.random()
+            if style < 0.2:
+                name = name.upper()
+            elif style < 0.8:
+                name = name.title()
+            else:
+                name = f"  {name} "
+            names.append(name)
+        return [rng.choice(names) for _ in range(rows)]
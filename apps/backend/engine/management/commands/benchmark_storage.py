@@ -0,0 +1,89 @@
+import random
+import string
+import tempfile
+
+import polars as pl
+
+from engine.management.base import BenchmarkCommand
+from engine.services.backends import LocalBackend, StorageBackend, get_storage_backend
+from engine.services.csv_service import CSVService
+from engine.services.storage import ColumnStorageEngine
+
+
+class Command(BenchmarkCommand):
+    help = "Benchmark dataset reads and writes on the S3 and local storage backends"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--rows", type=int, default=200_000, help="Rows of the dataset"
+        )
+        parser.add_argument(
+            "--columns", type=int, default=8, help="Columns of the dataset"
+        )
+        parser.add_argument(
+            "--backends",
+            nargs="+",
+            choices=["s3", "local", "local-mmap"],
+            default=["local", "local-mmap"],
+            help="Backends to benchmark, s3 uses the configured bucket",
+        )
+
+    def handle(self, *args, **options):
+        df = self._generate_dataframe(options["rows"], options["columns"])
+        column_defs = [
+            {"id": col_id, "label": col_id, "classification": None}
+            for col_id in df.columns
+        ]
+        self.stdout.write(f"{df.height:,} rows x {df.width} columns")
+
+        for name in options["backends"]:
+            with tempfile.TemporaryDirectory() as root:
+                if name == "s3":
+                    backend = get_storage_backend("s3")
+                else:
+                    backend = LocalBackend(root, use_mmap=name == "local-mmap")
+                self.stdout.write(f"\n{name}")
+                self._benchmark(backend, df, column_defs, options["repeat"])
+
+    def _benchmark(
+        self,
+        backend: StorageBackend,
+        df: pl.DataFrame,
+        column_defs: list,
+        repeat: int,
+    ):
+        # No cache, so every measurement goes to the backend
+        engine = ColumnStorageEngine(backend)
+        path = f"benchmark/{CSVService.generate_column_id('storage')}"
+        first_id = column_defs[0]["id"]
+
+        def update_column(columns):
+            columns[0]["data"] = [value.upper() for value in columns[0]["data"]]
+            return columns
+
+        try:
+            for label, func in (
+                ("ingest", lambda: engine.write_batches(path, column_defs, [df])),
+                ("read all", lambda: engine.read(path)),
+                ("read one column", lambda: engine.read(path, [first_id])),
+                (
+                    "read page",
+                    lambda: engine.read_rows(path, offset=df.height // 2, limit=100),
+                ),
+                ("column definitions", lambda: engine.read_column_defs(path)),
+                ("update one column", lambda: engine.update(path, update_column)),
+            ):
+                self.stdout.write(f"  {label:<20} {self._time(func, repeat):8.3f}s")
+        finally:
+            engine.delete(path)
+
+    def _generate_dataframe(self, rows: int, columns: int) -> pl.DataFrame:
+        rng = random.Random(0)
+        words = ["".join(rng.choices(string.ascii_lowercase, k=8)) for _ in range(1000)]
+        return pl.DataFrame(
+            {
+                f"col_{index}": [rng.choice(words) for _ in range(rows)]
+                for index in range(columns)
+            }
+        )
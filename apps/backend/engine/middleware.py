@@ -0,0 +1,140 @@
+import zlib
+from enum import StrEnum
+from typing import AsyncIterator, Iterator, Optional
+
+import zstandard
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+
+class ContentEncoding(StrEnum):
+    ZSTD = "zstd"
+    GZIP = "gzip"
+
+
+class StreamCompressor:
+    """
+    Compresses a response body chunk by chunk. Each chunk is flushed at a
+    block boundary, so a streamed chunk reaches the client without waiting
+    for the ones after it.
+    """
+
+    # Measured with the benchmark_compression command on a page of rows: zstd
+    # level 3 compresses better than any gzip level at about 5x the speed of
+    # gzip level 4, which compresses as well as the default level 6 in half
+    # the time
+    ZSTD_LEVEL = 3
+    GZIP_LEVEL = 4
+
+    def __init__(self, encoding: ContentEncoding):
+        if encoding == ContentEncoding.ZSTD:
+            self.compressor = zstandard.ZstdCompressor(
+                level=self.ZSTD_LEVEL
+            ).compressobj()
+            self.block_flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            # wbits 31 writes a gzip header and trailer
+            self.compressor = zlib.compressobj(self.GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.block_flush = zlib.Z_SYNC_FLUSH
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self.compressor.compress(chunk) + self.compressor.flush(self.block_flush)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+    def compress_all(self, content: bytes) -> bytes:
+        return self.compressor.compress(content) + self.finish()
+
+    def compress_stream(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            if chunk:
+                yield self.compress(chunk)
+        yield self.finish()
+
+    async def acompress_stream(
+        self, chunks: AsyncIterator[bytes]
+    ) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            if chunk:
+                yield self.compress(chunk)
+        yield self.finish()
+
+
+def get_content_encoding(accept_encoding: str) -> Optional[ContentEncoding]:
+    """
+    Pick the encoding to send from an Accept-Encoding header: the one with
+    the highest quality, zstd first on a tie, or None for no compression
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+
+    best_encoding, best_quality = None, 0.0
+    for encoding in ContentEncoding:
+        quality = qualities.get(encoding.value, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best_encoding, best_quality = encoding, quality
+    return best_encoding
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses responses with zstd or gzip, negotiated with Accept-Encoding.
+    Streaming responses are compressed as they stream, without buffering the
+    body. Bodies under settings.RESPONSE_COMPRESSION_MIN_BYTES are sent as
+    they are, they would cost more CPU than they save in transfer.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and (
+            len(response.content) < settings.RESPONSE_COMPRESSION_MIN_BYTES
+        ):
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+        if "no-transform" in response.get("Cache-Control", ""):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = get_content_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        compressor = StreamCompressor(encoding)
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compressor.acompress_stream(
+                    response.streaming_content
+                )
+            else:
+                response.streaming_content = compressor.compress_stream(
+                    response.streaming_content
+                )
+            # The compressed size isn't known until the body has streamed
+            del response.headers["Content-Length"]
+        else:
+            content = compressor.compress_all(response.content)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers["Content-Length"] = str(len(content))
+
+        # A strong ETag is for the uncompressed body, as with Django's
+        # GZipMiddleware it becomes weak. If-None-Match still compares weakly.
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding.value
+        return response
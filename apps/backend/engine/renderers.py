@@ -0,0 +1,80 @@
+import datetime
+from decimal import Decimal
+from typing import Any
+
+import orjson
+import pyarrow as pa
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+from .services.dictionary import DictionaryData
+
+
+def _default(value: Any) -> Any:
+    """
+    Serialize the types orjson doesn't know natively: column data, and the
+    ones DRF's JSON encoder supports besides. Others raise TypeError, as
+    they would without a default.
+    """
+    if isinstance(value, DictionaryData):
+        return list(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, Decimal):
+        # As with DRF's default COERCE_DECIMAL_TO_STRING
+        return str(value)
+    if isinstance(value, datetime.timedelta):
+        return str(value.total_seconds())
+    if isinstance(value, Promise):
+        # Lazily translated strings
+        return force_str(value)
+    if isinstance(value, bytes):
+        return value.decode()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Renders JSON with orjson, which serializes large lists of rows many times
+    faster than the standard library. Tuples, dates and column data are
+    serialized as they are, without converting them first.
+    """
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        if data is None:
+            return b""
+
+        option = orjson.OPT_NON_STR_KEYS
+        # The browsable API asks for indented JSON
+        if (renderer_context or {}).get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+
+
+class ArrowStreamRenderer(BaseRenderer):
+    """
+    Renders a pyarrow Table as an Arrow IPC stream, which clients decode
+    column by column without any per-cell parsing. Anything else, such as an
+    error, is rendered as JSON.
+    """
+
+    media_type = "application/vnd.apache.arrow.stream"
+    format = "arrow"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        if not isinstance(data, pa.Table):
+            response = (renderer_context or {}).get("response")
+            if response is not None:
+                response["Content-Type"] = ORJSONRenderer.media_type
+            return ORJSONRenderer().render(data, accepted_media_type, renderer_context)
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, data.schema) as writer:
+            writer.write_table(data)
+        return sink.getvalue().to_pybytes()
@@ -1,6 +1,7 @@
 from typing import List, Dict
 from openai import OpenAI
 from .column_processor import CLASSIFIERS, ClassifierId, get_classifier, DatasetType
+from .column_types import to_display_values
 from .types import ColumnDef
 from django.conf import settings
 from pydantic import BaseModel
@@ -75,7 +76,9 @@ class AIService:
 
     def _get_column_sample(self, column: ColumnDef, max_tokens: int = 100) -> List[str]:
         """Get first x non-null values from column, limiting by token count"""
-        non_empty_values = [val for val in column["data"] if val and val.strip()]
+        non_empty_values = [
+            val for val in to_display_values(column["data"]) if val and val.strip()
+        ]
         if len(non_empty_values) == 0:
             return []
 
@@ -103,7 +106,8 @@ class AIService:
         valid_columns = []
 
         for col in columns:
-            if col["classification"]:
+            # Row IDs are not part of the data
+            if col["classification"] or col["id"] == "row_id":
                 continue
 
             sample = self._get_column_sample(col)
@@ -240,7 +244,9 @@ class AIService:
     ) -> Dict:
         """Generate transformation suggestions for column values"""
         unique_values = set(
-            val.strip() for val in column["data"] if val and val.strip()
+            val.strip()
+            for val in to_display_values(column["data"])
+            if val and val.strip()
         )
         if len(unique_values) > max_unique_values:
             raise ValueError(
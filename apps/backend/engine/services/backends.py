@@ -0,0 +1,644 @@
+import datetime
+import fcntl
+import io
+import logging
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional
+
+import boto3
+import pyarrow as pa
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from django.conf import settings
+
+
+class ObjectNotFoundError(ValueError):
+    """Raised when an object doesn't exist"""
+
+    pass
+
+
+class PreconditionFailedError(Exception):
+    """Raised when a conditional write finds the object was changed"""
+
+    pass
+
+
+class StoredObject(NamedTuple):
+    # Streamed from storage, can only be read once
+    body: BinaryIO
+    etag: str
+    last_modified: datetime.datetime
+    metadata: Dict[str, str]
+
+
+class ObjectInfo(NamedTuple):
+    key: str
+    size: int
+
+
+class ObjectWriter(ABC):
+    """Write-only file whose content becomes visible at once when closed"""
+
+    closed: bool
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self):
+        pass
+
+    @abstractmethod
+    def tell(self) -> int:
+        pass
+
+    @abstractmethod
+    def write(self, data) -> int:
+        pass
+
+    @abstractmethod
+    def close(self):
+        """Finish the write, raising PreconditionFailedError on a conflict"""
+        pass
+
+    @abstractmethod
+    def abort(self):
+        """Discard everything written so far"""
+        pass
+
+
+class StorageBackend(ABC):
+    """
+    Key/value object store the storage engines, metadata and catalogs are
+    kept in. Keys are "/" separated paths such as "user_id/uuid/manifest.json".
+    """
+
+    @abstractmethod
+    def get(
+        self, key: str, if_none_match: Optional[str] = None
+    ) -> Optional[StoredObject]:
+        """
+        Get an object, or None when its ETag still is `if_none_match`.
+        Raises ObjectNotFoundError when the object doesn't exist.
+        """
+        pass
+
+    @abstractmethod
+    def head(self, key: str) -> str:
+        """
+        Get the ETag of an object without reading it. Raises
+        ObjectNotFoundError when the object doesn't exist.
+        """
+        pass
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """Open an object as a seekable file that only reads the ranges needed"""
+        pass
+
+    @abstractmethod
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        if_match: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """
+        Write an object along with string `metadata` returned by get, and
+        return its ETag. With `if_match` the object must still have that ETag,
+        with `if_none_match="*"` it must not exist, or PreconditionFailedError
+        is raised.
+        """
+        pass
+
+    @abstractmethod
+    def open_writer(self, key: str, if_match: Optional[str] = None) -> ObjectWriter:
+        """Open a file streaming into an object, conditions apply on close"""
+        pass
+
+    @abstractmethod
+    def put_file(self, key: str, file: BinaryIO):
+        """Write an object from a local file"""
+        pass
+
+    @abstractmethod
+    def list(self, prefix: str) -> Iterator[ObjectInfo]:
+        """List the objects whose key starts with `prefix`, in key order"""
+        pass
+
+    @abstractmethod
+    def delete(self, keys: List[str]):
+        """Delete objects, ignoring the ones that don't exist"""
+        pass
+
+
+class S3RangeReader(io.RawIOBase):
+    """
+    Read-only, seekable file over an S3 object that fetches only the byte
+    ranges being read. The tail of the object is prefetched on open since
+    Parquet readers always start with the footer.
+    """
+
+    tail_size = 64 * 1024
+
+    def __init__(self, s3, bucket: str, key: str):
+        super().__init__()
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.position = 0
+
+        try:
+            tail_obj = self.s3.get_object(
+                Bucket=self.bucket, Key=self.key, Range=f"bytes=-{self.tail_size}"
+            )
+        except self.s3.exceptions.NoSuchKey:
+            raise ObjectNotFoundError(f"Object not found: {key}")
+
+        self.tail = tail_obj["Body"].read()
+        content_range = tail_obj.get("ContentRange")
+        self.size = (
+            int(content_range.rsplit("/", 1)[1]) if content_range else len(self.tail)
+        )
+        self.tail_offset = self.size - len(self.tail)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self.position
+
+    def read(self, size: int = -1) -> bytes:
+        start = self.position
+        end = self.size if size is None or size < 0 else min(start + size, self.size)
+        if start >= end:
+            return b""
+
+        if start >= self.tail_offset:
+            data = self.tail[start - self.tail_offset : end - self.tail_offset]
+        else:
+            range_obj = self.s3.get_object(
+                Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end - 1}"
+            )
+            data = range_obj["Body"].read()
+
+        self.position = start + len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class S3MultipartWriter(ObjectWriter):
+    """
+    Write-only file that uploads to S3 part by part as data is written, so
+    the object never has to be held in memory as a whole. Objects smaller
+    than a single part are uploaded with one PUT when the writer is closed.
+    """
+
+    part_size = 8 * 1024 * 1024
+
+    def __init__(self, s3, bucket: str, key: str, conditions: Optional[dict] = None):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        # Conditional request headers (e.g. IfMatch) checked when completing
+        self.conditions = conditions or {}
+        self.buffer = bytearray()
+        self.position = 0
+        self.upload_id = None
+        self.parts = []
+        self.closed = False
+
+    def tell(self) -> int:
+        return self.position
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[: self.part_size]))
+            del self.buffer[: self.part_size]
+        return len(data)
+
+    def close(self):
+        """Finish the upload, making the object visible"""
+        if self.closed:
+            return
+        self.closed = True
+
+        try:
+            if self.upload_id is None:
+                self.s3.put_object(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    Body=bytes(self.buffer),
+                    **self.conditions,
+                )
+            else:
+                if self.buffer:
+                    self._upload_part(bytes(self.buffer))
+                self.s3.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self.upload_id,
+                    MultipartUpload={"Parts": self.parts},
+                    **self.conditions,
+                )
+        except ClientError as e:
+            if S3Backend.is_write_conflict(e):
+                raise PreconditionFailedError(f"Object was changed: {self.key}")
+            raise
+        finally:
+            self.buffer.clear()
+
+    def abort(self):
+        self.closed = True
+        self.buffer.clear()
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+            )
+
+    def _upload_part(self, body: bytes):
+        if self.upload_id is None:
+            self.upload_id = self.s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key
+            )["UploadId"]
+
+        part_number = len(self.parts) + 1
+        part = self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        self.parts.append({"ETag": part["ETag"], "PartNumber": part_number})
+
+
+class S3Backend(StorageBackend):
+    """Stores objects in an S3 bucket"""
+
+    def __init__(self, s3, bucket: str):
+        self.s3 = s3
+        self.bucket = bucket
+
+    def get(
+        self, key: str, if_none_match: Optional[str] = None
+    ) -> Optional[StoredObject]:
+        conditions = {"IfNoneMatch": if_none_match} if if_none_match else {}
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket, Key=key, **conditions)
+        except self.s3.exceptions.NoSuchKey:
+            raise ObjectNotFoundError(f"Object not found: {key}")
+        except ClientError as e:
+            if if_none_match and e.response["Error"]["Code"] in ("304", "NotModified"):
+                return None
+            raise
+        return StoredObject(
+            obj["Body"], obj["ETag"], obj["LastModified"], obj.get("Metadata", {})
+        )
+
+    def head(self, key: str) -> str:
+        try:
+            return self.s3.head_object(Bucket=self.bucket, Key=key)["ETag"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                raise ObjectNotFoundError(f"Object not found: {key}")
+            raise
+
+    def open(self, key: str) -> BinaryIO:
+        return S3RangeReader(self.s3, self.bucket, key)
+
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        if_match: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> str:
+        conditions = {}
+        if if_match:
+            conditions["IfMatch"] = if_match
+        if if_none_match:
+            conditions["IfNoneMatch"] = if_none_match
+
+        try:
+            response = self.s3.put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=body,
+                Metadata=metadata or {},
+                **conditions,
+            )
+        except ClientError as e:
+            if self.is_write_conflict(e):
+                raise PreconditionFailedError(f"Object was changed: {key}")
+            raise
+        return response["ETag"]
+
+    def open_writer(self, key: str, if_match: Optional[str] = None) -> ObjectWriter:
+        conditions = {"IfMatch": if_match} if if_match else {}
+        return S3MultipartWriter(self.s3, self.bucket, key, conditions)
+
+    def put_file(self, key: str, file: BinaryIO):
+        # Large files are uploaded in parts, in parallel
+        self.s3.upload_fileobj(file, self.bucket, key)
+
+    def list(self, prefix: str) -> Iterator[ObjectInfo]:
+        paginator = self.s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield ObjectInfo(obj["Key"], obj["Size"])
+
+    def delete(self, keys: List[str]):
+        # DeleteObjects accepts up to 1000 keys per request
+        for start in range(0, len(keys), 1000):
+            self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={
+                    "Objects": [{"Key": key} for key in keys[start : start + 1000]],
+                    "Quiet": True,
+                },
+            )
+
+    @staticmethod
+    def is_write_conflict(error: ClientError) -> bool:
+        """Whether a conditional write failed because the object changed"""
+        return error.response["Error"]["Code"] in (
+            "PreconditionFailed",
+            "ConditionalRequestConflict",
+        )
+
+
+class LocalFileWriter(ObjectWriter):
+    """Writes to a temporary file that's renamed over the object when closed"""
+
+    def __init__(self, backend: "LocalBackend", key: str, if_match: Optional[str]):
+        self.backend = backend
+        self.key = key
+        self.if_match = if_match
+        self.file = backend._create_temp_file(key)
+        self.closed = False
+
+    def tell(self) -> int:
+        return self.file.tell()
+
+    def write(self, data) -> int:
+        return self.file.write(data)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.backend._commit(self.file, self.key, self.if_match, None)
+
+    def abort(self):
+        self.closed = True
+        self.file.close()
+        os.unlink(self.file.name)
+
+
+class LocalBackend(StorageBackend):
+    """
+    Stores objects as files under a root directory, for single-node
+    deployments and benchmarks. Writes go to a temporary file that's renamed
+    over the object, so readers never see partial content. Conditional writes
+    are serialized with a lock file shared by every process using the root.
+    Parquet range reads can memory-map files instead of reading them.
+    Object metadata is kept in extended attributes of the files, so the root
+    must be on a filesystem that supports them.
+    """
+
+    lock_filename = ".lock"
+    temp_prefix = ".tmp-"
+    xattr_prefix = "user."
+
+    def __init__(self, root: str, use_mmap: bool = True):
+        self.root = os.path.abspath(root)
+        self.use_mmap = use_mmap
+        os.makedirs(self.root, exist_ok=True)
+
+    def get(
+        self, key: str, if_none_match: Optional[str] = None
+    ) -> Optional[StoredObject]:
+        path = self._get_path(key)
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            raise ObjectNotFoundError(f"Object not found: {key}")
+
+        # Stat and attributes of the open file, an object replaced meanwhile
+        # doesn't mix with it
+        stat = os.fstat(file.fileno())
+        etag = self._get_etag(stat)
+        if if_none_match == etag:
+            file.close()
+            return None
+
+        metadata = {
+            name.removeprefix(self.xattr_prefix): os.getxattr(
+                file.fileno(), name
+            ).decode()
+            for name in os.listxattr(file.fileno())
+            if name.startswith(self.xattr_prefix)
+        }
+        last_modified = datetime.datetime.fromtimestamp(
+            stat.st_mtime, tz=datetime.timezone.utc
+        )
+        return StoredObject(file, etag, last_modified, metadata)
+
+    def head(self, key: str) -> str:
+        try:
+            return self._get_etag(os.stat(self._get_path(key)))
+        except FileNotFoundError:
+            raise ObjectNotFoundError(f"Object not found: {key}")
+
+    def open(self, key: str) -> BinaryIO:
+        path = self._get_path(key)
+        try:
+            return pa.memory_map(path) if self.use_mmap else pa.OSFile(path)
+        except FileNotFoundError:
+            raise ObjectNotFoundError(f"Object not found: {key}")
+
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        if_match: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+    ) -> str:
+        file = self._create_temp_file(key)
+        file.write(body)
+        # Set before the rename, so the object never appears without them
+        for name, value in (metadata or {}).items():
+            os.setxattr(file.fileno(), self.xattr_prefix + name, value.encode())
+        return self._commit(file, key, if_match, if_none_match)
+
+    def open_writer(self, key: str, if_match: Optional[str] = None) -> ObjectWriter:
+        return LocalFileWriter(self, key, if_match)
+
+    def put_file(self, key: str, file: BinaryIO):
+        temp_file = self._create_temp_file(key)
+        shutil.copyfileobj(file, temp_file)
+        self._commit(temp_file, key, None, None)
+
+    def list(self, prefix: str) -> Iterator[ObjectInfo]:
+        # Only the directory the prefix points into has to be walked
+        directory = os.path.join(self.root, os.path.dirname(prefix))
+        keys = []
+        for dirpath, _, filenames in os.walk(directory):
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                path = os.path.join(dirpath, filename)
+                key = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    keys.append(key)
+
+        for key in sorted(keys):
+            try:
+                yield ObjectInfo(key, os.path.getsize(self._get_path(key)))
+            except FileNotFoundError:
+                continue
+
+    def delete(self, keys: List[str]):
+        for key in keys:
+            try:
+                os.unlink(self._get_path(key))
+            except FileNotFoundError:
+                pass
+
+    def _get_path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid key: {key}")
+        return path
+
+    @staticmethod
+    def _get_etag(stat: os.stat_result) -> str:
+        # Every write renames a new file into place, changing the inode
+        return f'"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    def _create_temp_file(self, key: str):
+        directory = os.path.dirname(self._get_path(key))
+        os.makedirs(directory, exist_ok=True)
+        # Same directory as the object, so the rename stays on one filesystem
+        return tempfile.NamedTemporaryFile(
+            dir=directory, prefix=self.temp_prefix, delete=False
+        )
+
+    def _commit(
+        self,
+        file,
+        key: str,
+        if_match: Optional[str],
+        if_none_match: Optional[str],
+    ) -> str:
+        """
+        Atomically move a finished temporary file over the object, returning
+        the object's ETag
+        """
+        path = self._get_path(key)
+        try:
+            file.flush()
+            os.fsync(file.fileno())
+            file.close()
+            # The rename keeps the inode and modification time
+            written_etag = self._get_etag(os.stat(file.name))
+            if if_match is None and if_none_match is None:
+                os.replace(file.name, path)
+                return written_etag
+
+            with self._lock():
+                try:
+                    etag = self._get_etag(os.stat(path))
+                except FileNotFoundError:
+                    etag = None
+                if (if_match is not None and etag != if_match) or (
+                    if_none_match == "*" and etag is not None
+                ):
+                    raise PreconditionFailedError(f"Object was changed: {key}")
+                os.replace(file.name, path)
+            return written_etag
+        except BaseException:
+            file.close()
+            if os.path.exists(file.name):
+                os.unlink(file.name)
+            raise
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        with open(os.path.join(self.root, self.lock_filename), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def get_storage_backend(name: Optional[str] = None) -> StorageBackend:
+    """Create a storage backend, by default the one configured in settings"""
+    logger = logging.getLogger(__name__)
+
+    if (name or settings.STORAGE_BACKEND) == "local":
+        logger.info(f"Using local storage in {settings.LOCAL_STORAGE_ROOT}")
+        return LocalBackend(
+            settings.LOCAL_STORAGE_ROOT, use_mmap=settings.LOCAL_STORAGE_MMAP
+        )
+
+    # Initialize S3 client with optional credentials
+    s3_kwargs = {}
+
+    # Get AWS credentials with defaults of None
+    aws_key = getattr(settings, "AWS_ACCESS_KEY_ID", None)
+    aws_secret = getattr(settings, "AWS_SECRET_ACCESS_KEY", None)
+
+    if aws_key and aws_secret:
+        s3_kwargs.update(
+            {
+                "aws_access_key_id": aws_key,
+                "aws_secret_access_key": aws_secret,
+            }
+        )
+        logger.warning(f"Initializing S3 client with AWS credentials ID: {aws_key}")
+    else:
+        logger.info("Initializing S3 client without AWS credentials (using IAM role)")
+
+    config = Config(
+        # Request fan-out and column I/O each run up to STORAGE_MAX_CONCURRENCY
+        # requests, plus the threads of a multipart upload
+        max_pool_connections=2 * settings.STORAGE_MAX_CONCURRENCY + 10,
+        # Idle pooled connections stay open between requests
+        tcp_keepalive=True,
+        retries={"total_max_attempts": settings.S3_MAX_ATTEMPTS, "mode": "adaptive"},
+    )
+    return S3Backend(
+        boto3.client("s3", config=config, **s3_kwargs),
+        settings.AWS_STORAGE_BUCKET_NAME,
+    )
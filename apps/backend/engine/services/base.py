@@ -1,7 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Union
+from typing import Any, Callable, List, Optional, Sequence, Union
+import polars as pl
 import splink.comparison_library as cl
-from .types import ColumnDef
+from django.conf import settings
+from .cache import TransformMemo
+from .dictionary import DictionaryData
+from .process_pool import map_in_processes
+from .types import ColumnDef, RowId
 from enum import StrEnum
 
 
@@ -10,6 +15,11 @@ class DatasetType(StrEnum):
     COMPANY = "COMPANY"
 
 
+def to_external_row_id(row_id: RowId) -> str:
+    """Convert an internal row ID to the string ID used in API responses"""
+    return str(row_id)
+
+
 class OperationError(Exception):
     """Base exception for operation errors"""
 
@@ -45,6 +55,13 @@ class BaseClassifier(ABC):
     # - AI for classification
     # - Displaying which columns can be deduplicated by
     allowed_dataset_types: tuple[DatasetType, ...] = ()
+    # Shared by every classifier, keyed by transform
+    memo = TransformMemo(settings.CLASSIFIER_MEMO_MAX_ENTRIES)
+    # Most common values of a column whose results are remembered
+    MEMO_VALUES_PER_COLUMN = 1_000
+    # Whether transforms are slow enough for large columns to be worth
+    # classifying on the process pool
+    parallel = False
 
     def __init__(self, column_id: str | None = None):
         self.column_id = column_id
@@ -71,8 +88,102 @@ class BaseClassifier(ABC):
     def transform(self, value: str) -> str:
         pass
 
-    def transform_values(self, values: List[str]) -> List[str]:
-        return [self.transform(val) if val else val for val in values]
+    def transform_expr(self, values: pl.Expr) -> Optional[pl.Expr]:
+        """
+        Optionally, transform as a Polars expression over non-empty strings,
+        run over a whole column at once. Values it yields null for, such as
+        ones it can't transform exactly as transform does, go through
+        transform instead.
+        """
+        return None
+
+    def transform_values(self, values: Sequence[str]) -> Sequence[str]:
+        return self.map_distinct(
+            values, self.transform, self.transform_expr(pl.col("value"))
+        )
+
+    def map_distinct(
+        self,
+        values: Sequence[Optional[str]],
+        func: Callable[[str], Any],
+        expr: Optional[pl.Expr] = None,
+    ) -> Sequence[Any]:
+        """
+        Apply func to the non-empty values of column data once per distinct
+        value, or expr when given, falling back to func for the values it
+        yields null for. The results are scattered back to the rows by code.
+        Results of func for a column's most common values are remembered
+        across requests.
+        """
+        encoded = DictionaryData.encode(values)
+        dictionary = encoded.dictionary
+        results = (
+            list(dictionary)
+            if expr is None
+            else self._transform_vectorized(dictionary, expr)
+        )
+        pending = [
+            index
+            for index, (value, result) in enumerate(zip(dictionary, results))
+            if value and (expr is None or result is None)
+        ]
+        if pending:
+            self._apply_memoized(func, encoded, pending, results)
+
+        mapped = DictionaryData(encoded.codes, results)
+        return mapped if isinstance(values, DictionaryData) else mapped.to_list()
+
+    def _apply_memoized(
+        self,
+        func: Callable[[str], Any],
+        encoded: DictionaryData,
+        pending: List[int],
+        results: List[Any],
+    ):
+        """Set the results of func for the distinct values at pending codes"""
+        # The same function gives the same results whichever classifier runs it
+        name = func.__qualname__
+        dictionary = encoded.dictionary
+        remembered = self.memo.get_many(name, (dictionary[code] for code in pending))
+        misses = []
+        for code in pending:
+            if dictionary[code] in remembered:
+                results[code] = remembered[dictionary[code]]
+            else:
+                misses.append(code)
+
+        values = [dictionary[code] for code in misses]
+        if self.parallel:
+            computed = map_in_processes(func, values)
+        else:
+            computed = [func(value) for value in values]
+        for code, result in zip(misses, computed):
+            results[code] = result
+
+        if misses:
+            counts = encoded.count_codes()
+            misses.sort(key=lambda code: counts[code], reverse=True)
+            self.memo.set_many(
+                name,
+                {
+                    dictionary[code]: results[code]
+                    for code in misses[: self.MEMO_VALUES_PER_COLUMN]
+                },
+            )
+
+    def _transform_vectorized(
+        self, values: Sequence[Optional[str]], expr: pl.Expr
+    ) -> List[Optional[str]]:
+        # Lazily, so the subexpressions an expression repeats are run once
+        return (
+            pl.LazyFrame([pl.Series("value", values, dtype=pl.Utf8)])
+            .select(
+                pl.when(pl.col("value") != "").then(expr).otherwise(pl.col("value"))
+            )
+            .collect()
+            .to_series()
+            .to_list()
+        )
 
     def get_operations(self, column: ColumnDef) -> List[BaseOperation]:
         """Get additional operations to perform when classifying"""
@@ -88,3 +199,20 @@ class BaseClassifier(ABC):
         """Standardize a name by removing special characters and proper casing"""
         cleaned = "".join(char for char in value if char.isalnum() or char.isspace())
         return cleaned.strip().title()
+
+    # Names of these characters are cased by Polars exactly as str.title()
+    # does. Digits, and letters outside Latin, are word boundaries for
+    # str.title() only. Left out are dotless i, ŉ and long s, whose title
+    # case lowercases to another letter: transform titles before cleaning.
+    STANDARDIZE_NAME_CHARS = (
+        r"^[\x20-\x2f\x3a-\x7e\xc0-\xde\xe0-\u012f\u0132-\u0148\u014a-\u017e]*$"
+    )
+
+    @classmethod
+    def standardize_name_expr(cls, values: pl.Expr) -> pl.Expr:
+        """standardize_name as an expression, null for names it can't standardize"""
+        return pl.when(values.str.contains(cls.STANDARDIZE_NAME_CHARS)).then(
+            values.str.replace_all(r"[^\p{L}\p{N}\s]", "")
+            .str.strip_chars()
+            .str.to_titlecase()
+        )
@@ -0,0 +1,131 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional
+
+from .backends import ObjectNotFoundError, StorageBackend, StoredObject
+
+
+class CacheEntry(NamedTuple):
+    etag: str
+    value: Any
+    size: int
+
+
+class DatasetCache:
+    """
+    Per-process LRU cache of decoded stored objects (datasets and metadata).
+    Entries are keyed by object key and remember the ETag they were decoded
+    from, so they can be revalidated with a conditional GET. The cache is
+    bounded by the estimated in-memory size of its values.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, etag: str, value: Any, size: int):
+        with self.lock:
+            self._remove(key)
+            # Values larger than the whole budget are never cached
+            if size > self.max_bytes:
+                return
+
+            self.entries[key] = CacheEntry(etag, value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.current_bytes -= evicted.size
+
+    def invalidate(self, key: str):
+        with self.lock:
+            self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry.size
+
+    def get_object(
+        self,
+        backend: StorageBackend,
+        key: str,
+        decode: Callable[[StoredObject], tuple[Any, int]],
+    ) -> Any:
+        """
+        Get a decoded object. A cached copy is revalidated with a conditional
+        GET, so an unchanged object is neither downloaded nor decoded again.
+        `decode` turns the stored object into the value and its size.
+        Raises ObjectNotFoundError when the object doesn't exist.
+        """
+        return self.get_entry(backend, key, decode).value
+
+    def get_entry(
+        self,
+        backend: StorageBackend,
+        key: str,
+        decode: Callable[[StoredObject], tuple[Any, int]],
+    ) -> CacheEntry:
+        """Get a decoded object as get_object does, along with its ETag"""
+        cached = self.get(key)
+        try:
+            stored_obj = backend.get(key, if_none_match=cached.etag if cached else None)
+        except ObjectNotFoundError:
+            self.invalidate(key)
+            raise
+
+        if stored_obj is None:
+            return cached
+
+        value, size = decode(stored_obj)
+        self.set(key, stored_obj.etag, value, size)
+        return CacheEntry(stored_obj.etag, value, size)
+
+
+class TransformMemo:
+    """
+    Per-process LRU of the results of value transforms, such as phone number
+    formatting, shared between requests. Bounded by its number of entries,
+    callers only store the values worth remembering, e.g. the most common.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[tuple[str, Any], Any] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, name: str, values: Iterable[Any]) -> Dict[Any, Any]:
+        """Get the remembered results of a transform for some values"""
+        results = {}
+        with self.lock:
+            for value in values:
+                key = (name, value)
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    results[value] = self.entries[key]
+        return results
+
+    def set_many(self, name: str, results: Dict[Any, Any]):
+        with self.lock:
+            for value, result in results.items():
+                self.entries[(name, value)] = result
+                self.entries.move_to_end((name, value))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
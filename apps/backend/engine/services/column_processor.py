@@ -1,5 +1,7 @@
+from concurrent.futures import ThreadPoolExecutor
 from enum import StrEnum
-from typing import List, Optional
+from typing import Any, List, Optional, Sequence
+from django.conf import settings
 from nameparser import HumanName
 from urllib.parse import urlparse
 from .base import (
@@ -10,11 +12,28 @@ from .base import (
     InvalidActionError,
     DatasetType,
 )
+from .column_types import to_display_value, to_display_values
 from .csv_service import CSVService
+from .dictionary import DictionaryData, map_values
 from .types import ColumnDef
 import phonenumbers
+import polars as pl
 import splink.comparison_library as cl
 from cleanco import basename
+from cleanco.clean import prepare_default_terms
+
+# Characters str.strip() removes, Polars doesn't treat all of them as
+# whitespace
+STRIP_CHARS = (
+    "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002\u2003"
+    "\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000"
+)
+# Characters str.split() splits ASCII text on
+ASCII_WHITESPACE = "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f "
+# str.lower() lowercases a final capital sigma to "ς", Polars to "σ"
+FINAL_SIGMA = "Σ"
+# Last words of the legal terms basename removes from company names
+COMPANY_SUFFIX_WORDS = sorted({parts[-1] for _, parts in prepare_default_terms()})
 
 
 class ClassifierId(StrEnum):
@@ -47,7 +66,9 @@ class RemoveColumnOperation(BaseOperation):
 
 
 class AddColumnOperation(BaseOperation):
-    def __init__(self, label: str, data: List[str], classification: str | None = None):
+    def __init__(
+        self, label: str, data: Sequence[str], classification: str | None = None
+    ):
         self.column_id = CSVService.generate_column_id(label)
         self.label = label
         self.data = data
@@ -77,13 +98,19 @@ class UpdateColumnValuesOperation(BaseOperation):
         if not target_column:
             raise ColumnNotFoundError(f"Column not found: {self.column_id}")
 
-        # Create a mapping of old value to new value
-        for i, value in enumerate(target_column["data"]):
-            if value in self.updates:
-                target_column["data"][i] = self.updates[value]
+        # Each distinct value is looked up once for dictionary encoded columns
+        target_column["data"] = map_values(target_column["data"], self.update_value)
 
         return columns
 
+    def update_value(self, value: Any) -> Any:
+        # Updates are keyed by values as displayed
+        return self.updates.get(to_display_value(value), value)
+
+    def transform_distinct(self, values: List[Any]) -> List[Any]:
+        """Update a column's distinct values"""
+        return [self.update_value(value) for value in values]
+
 
 class ClassifyColumnOperation(BaseOperation):
     def __init__(self, column_id: str, classification: str):
@@ -95,6 +122,46 @@ class ClassifyColumnOperation(BaseOperation):
                 f"Invalid classification: {classification}"
             )
 
+        # Result of classify for the column's data, when prepared ahead
+        self.prepared: Optional[
+            tuple[Sequence, tuple[Sequence, List[BaseOperation]]]
+        ] = None
+
+    @property
+    def transforms_only(self) -> bool:
+        """Whether classifying only transforms the column's values"""
+        return type(self.classifier).get_operations is BaseClassifier.get_operations
+
+    def transform_distinct(self, values: List[Any]) -> List[Any]:
+        """Classify a column's distinct values, when transforms_only"""
+        return list(self.classifier.transform_values(to_display_values(values)))
+
+    def prepare(self, columns: List[ColumnDef]):
+        """
+        Classify the column ahead of apply, e.g. at the same time as other
+        columns. apply uses the result as long as the column's data is
+        unchanged.
+        """
+        target_column = next(
+            (col for col in columns if col["id"] == self.column_id), None
+        )
+        if target_column:
+            self.prepared = (target_column["data"], self.classify(target_column))
+
+    def classify(self, column: ColumnDef) -> tuple[Sequence, List[BaseOperation]]:
+        """
+        Get the column's data as displayed and the classifier's additional
+        operations, or its transformed data when it has none
+        """
+        # Classifiers work on text, typed values are classified as displayed
+        data = to_display_values(column["data"])
+
+        # Get additional operations from classifier
+        additional_ops = self.classifier.get_operations({**column, "data": data})
+        if additional_ops:
+            return data, additional_ops
+        return self.classifier.transform_values(data), []
+
     def apply(self, columns: List[ColumnDef]) -> List[ColumnDef]:
         target_column = next(
             (col for col in columns if col["id"] == self.column_id), None
@@ -102,15 +169,16 @@ class ClassifyColumnOperation(BaseOperation):
         if not target_column:
             raise ColumnNotFoundError(f"Column not found: {self.column_id}")
 
-        # Get additional operations from classifier
-        additional_ops = self.classifier.get_operations(target_column)
+        if self.prepared and self.prepared[0] is target_column["data"]:
+            data, additional_ops = self.prepared[1]
+        else:
+            data, additional_ops = self.classify(target_column)
+        self.prepared = None
+        target_column["data"] = data
 
         # Apply classifier's transform if no additional operations
         if not additional_ops:
             target_column["classification"] = self.classification
-            target_column["data"] = self.classifier.transform_values(
-                target_column["data"]
-            )
             return columns
 
         # Apply additional operations
@@ -121,8 +189,126 @@ class ClassifyColumnOperation(BaseOperation):
         return result
 
 
+class TransformColumnOperation(BaseOperation):
+    """
+    Consecutive value updates and classifications of a column, fused into one
+    pass: the column is dictionary encoded once, each operation transforms
+    its distinct values in turn and the results are scattered back once.
+    """
+
+    def __init__(
+        self,
+        column_id: str,
+        operations: List[UpdateColumnValuesOperation | ClassifyColumnOperation],
+    ):
+        self.column_id = column_id
+        self.operations = operations
+        self.prepared: Optional[tuple[Sequence, Sequence]] = None
+
+    def transform(self, data: Sequence) -> Sequence:
+        encoded = DictionaryData.encode(data)
+        values = list(encoded.dictionary)
+        for operation in self.operations:
+            values = operation.transform_distinct(values)
+        transformed = DictionaryData(encoded.codes, values)
+        return (
+            transformed if isinstance(data, DictionaryData) else transformed.to_list()
+        )
+
+    def prepare(self, columns: List[ColumnDef]):
+        """Transform the column ahead of apply, e.g. at the same time as others"""
+        target_column = next(
+            (col for col in columns if col["id"] == self.column_id), None
+        )
+        if target_column:
+            self.prepared = (
+                target_column["data"],
+                self.transform(target_column["data"]),
+            )
+
+    def apply(self, columns: List[ColumnDef]) -> List[ColumnDef]:
+        target_column = next(
+            (col for col in columns if col["id"] == self.column_id), None
+        )
+        if not target_column:
+            raise ColumnNotFoundError(f"Column not found: {self.column_id}")
+
+        if self.prepared and self.prepared[0] is target_column["data"]:
+            target_column["data"] = self.prepared[1]
+        else:
+            target_column["data"] = self.transform(target_column["data"])
+        self.prepared = None
+        for operation in self.operations:
+            if isinstance(operation, ClassifyColumnOperation):
+                target_column["classification"] = operation.classification
+        return columns
+
+
+class OperationPlan:
+    """
+    Plan of a batch of operations, applied in a single pass over the columns:
+    - updates and classifications of a column that a later operation of the
+      batch removes are dropped
+    - updates and classifications of the same column are fused into one
+      TransformColumnOperation, as long as no other operation on the column
+      comes between them. Operations on other columns don't read the column,
+      so they can come between.
+    Errors are raised as when applying the operations one by one, though not
+    always in the same order.
+    """
+
+    def __init__(self, operations: List[BaseOperation]):
+        self.steps = self._fuse(self._drop_dead_operations(operations))
+
+    @staticmethod
+    def _is_transform(operation: BaseOperation) -> bool:
+        return isinstance(operation, UpdateColumnValuesOperation) or (
+            isinstance(operation, ClassifyColumnOperation) and operation.transforms_only
+        )
+
+    def _drop_dead_operations(
+        self, operations: List[BaseOperation]
+    ) -> List[BaseOperation]:
+        live = []
+        removed = set()
+        for operation in reversed(operations):
+            if self._is_transform(operation) and operation.column_id in removed:
+                continue
+            if isinstance(operation, RemoveColumnOperation):
+                removed.add(operation.column_id)
+            elif getattr(operation, "column_id", None) in removed:
+                # The removed column is read from before, e.g. to split it
+                removed.discard(operation.column_id)
+            live.append(operation)
+        live.reverse()
+        return live
+
+    def _fuse(self, operations: List[BaseOperation]) -> List[BaseOperation]:
+        steps: List[BaseOperation] = []
+        # Fused operation a column's next transform joins, by column ID
+        open_steps: dict[str, TransformColumnOperation] = {}
+        for operation in operations:
+            column_id = getattr(operation, "column_id", None)
+            if not self._is_transform(operation):
+                open_steps.pop(column_id, None)
+                steps.append(operation)
+            elif column_id in open_steps:
+                open_steps[column_id].operations.append(operation)
+            else:
+                open_steps[column_id] = TransformColumnOperation(column_id, [operation])
+                steps.append(open_steps[column_id])
+        return steps
+
+    def apply(self, columns: List[ColumnDef]) -> List[ColumnDef]:
+        result = columns
+        for step in self.steps:
+            result = step.apply(result)
+        return result
+
+
 class PersonNameClassifier(BaseClassifier):
     allowed_dataset_types = (DatasetType.PERSON,)
+    parallel = True
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -148,14 +334,14 @@ class PersonNameClassifier(BaseClassifier):
 
     def get_operations(self, column: ColumnDef) -> List[BaseOperation]:
         """Split name column into first and last name columns"""
-        first_names = []
-        last_names = []
-        column_data = column["data"]
-
-        for value in column_data:
-            first, last = self.parse_name(value)
-            first_names.append(first)
-            last_names.append(last)
+        # Each distinct name is parsed once, as codes into the parsed names
+        names = self.map_distinct(
+            DictionaryData.encode(column["data"]), self.parse_name
+        )
+        first_names = map_values(names, lambda name: name[0] if name else name)
+        last_names = map_values(names, lambda name: name[1] if name else name)
+        if not isinstance(column["data"], DictionaryData):
+            first_names, last_names = first_names.to_list(), last_names.to_list()
 
         return [
             AddColumnOperation(
@@ -195,6 +381,9 @@ class PersonFirstNameClassifier(BaseClassifier):
     def transform(self, value: str) -> str:
         return self.standardize_name(value.strip().title())
 
+    def transform_expr(self, values: pl.Expr) -> pl.Expr:
+        return self.standardize_name_expr(values)
+
     @property
     def description(self) -> str:
         return "Standardizes first names by trimming whitespace and proper casing"
@@ -221,6 +410,9 @@ class PersonLastNameClassifier(BaseClassifier):
     def transform(self, value: str) -> str:
         return self.standardize_name(value.strip().title())
 
+    def transform_expr(self, values: pl.Expr) -> pl.Expr:
+        return self.standardize_name_expr(values)
+
     @property
     def description(self) -> str:
         return "Standardizes last names by trimming whitespace and proper casing"
@@ -234,6 +426,11 @@ class BaseEmailClassifier(BaseClassifier):
         """Clean and standardize email addresses"""
         return value.strip().lower()
 
+    def transform_expr(self, values: pl.Expr) -> pl.Expr:
+        return pl.when(~values.str.contains(FINAL_SIGMA, literal=True)).then(
+            values.str.strip_chars(STRIP_CHARS).str.to_lowercase()
+        )
+
     @property
     def description(self) -> str:
         return "Standardizes email addresses by converting to lowercase and trimming whitespace"
@@ -278,6 +475,8 @@ class CompanyEmailClassifier(BaseEmailClassifier):
 
 
 class BasePhoneClassifier(BaseClassifier):
+    parallel = True
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
@@ -368,6 +567,28 @@ class BaseURLClassifier(BaseClassifier):
 
         return value
 
+    def transform_expr(self, values: pl.Expr) -> pl.Expr:
+        value = values.str.strip_chars(STRIP_CHARS).str.to_lowercase()
+        url = pl.concat_str(
+            pl.when(value.str.contains("^https?://"))
+            .then(pl.lit(""))
+            .otherwise(pl.lit("https://")),
+            value,
+        )
+        return (
+            # urlparse removes tabs and newlines, splits parameters off the
+            # path and validates brackets and non-ASCII hosts
+            pl.when(value.str.contains(r"[^\x00-\x7f]|[\t\n\r;\[\]]"))
+            .then(None)
+            # Keep the scheme, host and path without its trailing slashes. URLs
+            # without a host don't match and are kept as they are.
+            .otherwise(
+                url.str.replace(
+                    r"^(https?://[^/?#]+)([^?#]*?)/*(?:[?#].*)?$", "${1}${2}"
+                )
+            )
+        )
+
     @property
     def description(self) -> str:
         return "Standardizes URLs by normalizing format and removing trailing slashes"
@@ -461,6 +682,7 @@ class PersonSocialClassifier(BaseURLClassifier):
 
 class CompanyNameClassifier(BaseClassifier):
     allowed_dataset_types = (DatasetType.COMPANY,)
+    parallel = True
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -484,6 +706,33 @@ class CompanyNameClassifier(BaseClassifier):
 
         return basename(value)
 
+    def transform_expr(self, values: pl.Expr) -> pl.Expr:
+        """
+        Names ending with a word of a legal suffix, or with non-ASCII
+        characters, are left to transform. The others only lose trailing
+        symbols and repeated whitespace, as basename would do to them.
+        """
+        # The last word of the name without its trailing symbols, normalized
+        # as cleanco compares it
+        last_word = (
+            values.str.extract(f"([^{ASCII_WHITESPACE}]*[.\\w])[^.\\w]*$", 1)
+            .str.to_lowercase()
+            .str.replace_all(r"[.,-]", "")
+        )
+        return (
+            pl.when(
+                values.str.contains(r"[^\x00-\x7f]")
+                | last_word.is_in(COMPANY_SUFFIX_WORDS)
+            )
+            .then(None)
+            .otherwise(
+                values.str.replace(r"[^.\w]+$", "")
+                .str.strip_chars(ASCII_WHITESPACE)
+                .str.replace_all(f"[{ASCII_WHITESPACE}]+", " ")
+                .str.replace(r"[^.\w]+$", "")
+            )
+        )
+
     @property
     def description(self) -> str:
         return "Standardizes company names by removing legal suffixes, standardizing abbreviations, and proper casing"
@@ -502,13 +751,39 @@ class ColumnOperationService:
         else:
             raise InvalidActionError(f"Invalid action: {action}")
 
+    # Columns classified at the same time, their transforms share the
+    # process pool
+    classify_executor = ThreadPoolExecutor(
+        max_workers=max(settings.CLASSIFY_PROCESS_POOL_WORKERS, 1),
+        thread_name_prefix="classify",
+    )
+
     def apply_operations(
         self, columns: List[ColumnDef], operations: List[BaseOperation]
     ) -> List[ColumnDef]:
-        result = columns
-        for operation in operations:
-            result = operation.apply(result)
-        return result
+        plan = OperationPlan(operations)
+        self._prepare_steps(columns, plan.steps)
+        return plan.apply(columns)
+
+    def _prepare_steps(self, columns: List[ColumnDef], steps: List[BaseOperation]):
+        """
+        Classify and transform the columns no earlier step changes
+        concurrently, before the steps are applied in order
+        """
+        touched = set()
+        independent = []
+        for step in steps:
+            column_id = getattr(step, "column_id", None)
+            if hasattr(step, "prepare") and column_id not in touched:
+                independent.append(step)
+            touched.add(column_id)
+
+        if len(independent) > 1:
+            list(
+                self.classify_executor.map(
+                    lambda step: step.prepare(columns), independent
+                )
+            )
 
 
 ALL_CLASSIFIERS = (
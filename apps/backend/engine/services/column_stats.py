@@ -0,0 +1,203 @@
+import math
+from typing import Dict, List
+
+import numpy as np
+import polars as pl
+
+from .types import ColumnStats
+
+# Most frequent values and value patterns kept per column
+TOP_VALUES = 20
+TOP_PATTERNS = 10
+# Values and patterns a profile keeps counting across batches. Their counts
+# are exact for columns with at most this many distinct ones, for others a
+# value evicted from the summary and seen again is undercounted.
+TOP_SUMMARY_SIZE = 1_000
+# HyperLogLog registers are 2^precision bytes per column, estimates are
+# within about 1.04 / sqrt(2^precision), 0.8%
+HLL_PRECISION = 14
+HLL_SEED = 0
+
+
+def to_pattern(values: pl.Expr) -> pl.Expr:
+    """
+    Reduce values to their shape: runs of uppercase letters become "A",
+    lowercase letters "a" and digits "9", e.g. "John Smith" becomes "Aa Aa"
+    and "e1@x.com" becomes "a9@a.a"
+    """
+    return (
+        values.str.replace_all(r"[A-Z]+", "A")
+        .str.replace_all(r"[a-z]+", "a")
+        .str.replace_all(r"[0-9]+", "9")
+    )
+
+
+class ColumnProfile:
+    """
+    Stats of string columns, built up one batch of rows at a time so memory
+    is bounded by the batch size rather than the data. Counts and lengths
+    are summed and compared, distinct values are estimated with HyperLogLog
+    registers and the most frequent values and patterns are kept in bounded
+    summaries, all merged batch by batch. Empty values must already be null.
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self.counts = {col: 0 for col in columns}
+        self.null_counts = {col: 0 for col in columns}
+        self.min_lengths: Dict[str, int | None] = {col: None for col in columns}
+        self.max_lengths: Dict[str, int | None] = {col: None for col in columns}
+        self.registers = {
+            col: np.zeros(2**HLL_PRECISION, dtype=np.uint8) for col in columns
+        }
+        empty_summary = pl.DataFrame(
+            schema={"value": pl.Utf8, "count": pl.Int64}
+        ).lazy()
+        self.top_values = {col: empty_summary for col in columns}
+        self.patterns = {col: empty_summary for col in columns}
+
+    def update(self, frame: pl.DataFrame):
+        """Add a batch of rows, with the profiled columns among its columns"""
+        if not self.columns:
+            return
+        batch = frame.lazy()
+        lengths = [
+            batch.select(
+                pl.col(col).count().alias("count"),
+                pl.col(col).null_count().alias("nulls"),
+                pl.col(col).str.len_chars().min().alias("min_length"),
+                pl.col(col).str.len_chars().max().alias("max_length"),
+            )
+            for col in self.columns
+        ]
+        registers = [self._get_registers(batch, col) for col in self.columns]
+        top_values = [
+            self._merge_counts(self.top_values[col], batch, pl.col(col))
+            for col in self.columns
+        ]
+        patterns = [
+            self._merge_counts(self.patterns[col], batch, to_pattern(pl.col(col)))
+            for col in self.columns
+        ]
+        # The columns' queries run in parallel
+        results = pl.collect_all([*lengths, *registers, *top_values, *patterns])
+        num_columns = len(self.columns)
+        for index, col in enumerate(self.columns):
+            summary = results[index].row(0, named=True)
+            self.counts[col] += summary["count"]
+            self.null_counts[col] += summary["nulls"]
+            self.min_lengths[col] = self._combine(
+                min, self.min_lengths[col], summary["min_length"]
+            )
+            self.max_lengths[col] = self._combine(
+                max, self.max_lengths[col], summary["max_length"]
+            )
+
+            batch_registers = results[num_columns + index]
+            indices = batch_registers.get_column("register").to_numpy()
+            self.registers[col][indices] = np.maximum(
+                self.registers[col][indices],
+                batch_registers.get_column("rank").to_numpy(),
+            )
+            self.top_values[col] = results[2 * num_columns + index].lazy()
+            self.patterns[col] = results[3 * num_columns + index].lazy()
+
+    def result(self) -> Dict[str, ColumnStats]:
+        return {
+            col: {
+                "count": self.counts[col],
+                "null_count": self.null_counts[col],
+                "distinct_count": min(
+                    self._estimate_distinct(self.registers[col]), self.counts[col]
+                ),
+                "min_length": self.min_lengths[col],
+                "max_length": self.max_lengths[col],
+                "top_values": [
+                    {"value": value, "count": count}
+                    for value, count in self.top_values[col]
+                    .head(TOP_VALUES)
+                    .collect()
+                    .iter_rows()
+                ],
+                "patterns": [
+                    {"pattern": pattern, "count": count}
+                    for pattern, count in self.patterns[col]
+                    .head(TOP_PATTERNS)
+                    .collect()
+                    .iter_rows()
+                ],
+            }
+            for col in self.columns
+        }
+
+    @staticmethod
+    def _combine(func, current, value):
+        if current is None or value is None:
+            return value if current is None else current
+        return func(current, value)
+
+    @staticmethod
+    def _get_registers(batch: pl.LazyFrame, col: str) -> pl.LazyFrame:
+        """
+        The batch's HyperLogLog registers: the first bits of each value's hash
+        pick a register, which keeps the highest rank of the other bits, the
+        position of their first 1 bit
+        """
+        hashes = pl.col(col).drop_nulls().hash(HLL_SEED)
+        rank_bits = 64 - HLL_PRECISION
+        return (
+            batch.select(
+                (hashes // 2**rank_bits).cast(pl.UInt32).alias("register"),
+                # Leading zeros of the low bits, which the high ones pad
+                ((hashes % 2**rank_bits).bitwise_leading_zeros() - HLL_PRECISION + 1)
+                .cast(pl.UInt8)
+                .alias("rank"),
+            )
+            .group_by("register")
+            .agg(pl.col("rank").max())
+        )
+
+    @staticmethod
+    def _merge_counts(
+        summary: pl.LazyFrame, batch: pl.LazyFrame, values: pl.Expr
+    ) -> pl.LazyFrame:
+        """Add the counts of a batch's values to a summary, keeping the top ones"""
+        batch_counts = (
+            batch.select(values.drop_nulls().alias("value"))
+            .group_by("value")
+            .agg(pl.len().cast(pl.Int64).alias("count"))
+        )
+        return (
+            pl.concat([summary, batch_counts])
+            .group_by("value")
+            .agg(pl.col("count").sum())
+            # Ties are broken by value, so the summary is deterministic
+            .sort(["count", "value"], descending=[True, False])
+            .head(TOP_SUMMARY_SIZE)
+        )
+
+    @staticmethod
+    def _estimate_distinct(registers: np.ndarray) -> int:
+        num_registers = len(registers)
+        empty = int(np.count_nonzero(registers == 0))
+        if empty == num_registers:
+            return 0
+        alpha = 0.7213 / (1 + 1.079 / num_registers)
+        estimate = (
+            alpha
+            * num_registers**2
+            / float(np.sum(np.ldexp(1.0, -registers.astype(np.int32))))
+        )
+        # Small cardinalities are counted better by the empty registers
+        if estimate <= 2.5 * num_registers and empty:
+            estimate = num_registers * math.log(num_registers / empty)
+        return round(estimate)
+
+
+def compute_column_stats(
+    frame: pl.LazyFrame, columns: List[str]
+) -> Dict[str, ColumnStats]:
+    """Profile string columns of a frame held in memory"""
+    profile = ColumnProfile(columns)
+    profile.update(frame.collect())
+    return profile.result()
@@ -0,0 +1,357 @@
+import datetime
+import math
+from decimal import Decimal
+from enum import StrEnum
+from typing import Any, Dict, List, Optional, Sequence
+
+import polars as pl
+import pyarrow as pa
+
+from .dictionary import map_values
+
+
+class ColumnType(StrEnum):
+    STRING = "string"
+    INTEGER = "integer"
+    FLOAT = "float"
+    BOOLEAN = "boolean"
+    DATE = "date"
+    DATETIME = "datetime"
+
+
+class ColumnTypeError(ValueError):
+    """Raised when a column's values can't be stored as the requested type"""
+
+    pass
+
+
+DATE_FORMAT = "%Y-%m-%d"
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Only values that are displayed exactly as they were written are typed, so
+# e.g. "007", "1.50" or "TRUE" stay strings
+VALUE_PATTERNS = {
+    ColumnType.INTEGER: r"^[+-]?(0|[1-9][0-9]{0,17})$",
+    ColumnType.FLOAT: r"^[+-]?(0|[1-9][0-9]*)\.[0-9]*[1-9]$",
+    ColumnType.BOOLEAN: r"^(true|false)$",
+    ColumnType.DATE: r"^[0-9]{4}-[0-9]{2}-[0-9]{2}$",
+    ColumnType.DATETIME: r"^[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2}$",
+}
+
+# Leading values checked for each type before all of a column's values are
+SAMPLE_ROWS = 1000
+
+ARROW_TYPES = {
+    ColumnType.STRING: pa.string(),
+    ColumnType.INTEGER: pa.int64(),
+    ColumnType.FLOAT: pa.float64(),
+    ColumnType.BOOLEAN: pa.bool_(),
+    ColumnType.DATE: pa.date32(),
+    ColumnType.DATETIME: pa.timestamp("us"),
+}
+
+
+def parse_values(values: pl.Expr, column_type: ColumnType) -> pl.Expr:
+    """Parse string values into `column_type`, values that don't parse become null"""
+    if column_type == ColumnType.INTEGER:
+        return values.cast(pl.Int64, strict=False)
+    if column_type == ColumnType.FLOAT:
+        return values.cast(pl.Float64, strict=False)
+    if column_type == ColumnType.BOOLEAN:
+        return values.replace_strict(
+            {"true": True, "false": False}, default=None, return_dtype=pl.Boolean
+        )
+    if column_type == ColumnType.DATE:
+        return values.str.to_date(DATE_FORMAT, strict=False)
+    if column_type == ColumnType.DATETIME:
+        return values.str.to_datetime(DATETIME_FORMAT, time_unit="us", strict=False)
+    return values
+
+
+def format_values(values: pl.Expr, column_type: ColumnType) -> pl.Expr:
+    """Format typed values as strings, the inverse of parse_values"""
+    if column_type == ColumnType.BOOLEAN:
+        return values.replace_strict(
+            {True: "true", False: "false"}, default=None, return_dtype=pl.Utf8
+        )
+    if column_type == ColumnType.DATE:
+        return values.dt.strftime(DATE_FORMAT)
+    if column_type == ColumnType.DATETIME:
+        return values.dt.strftime(DATETIME_FORMAT)
+    return values.cast(pl.Utf8)
+
+
+def from_polars_type(dtype: pl.DataType) -> ColumnType:
+    """Get the column type values of a polars dtype are stored as"""
+    if dtype.is_integer():
+        return ColumnType.INTEGER
+    if dtype.is_float():
+        return ColumnType.FLOAT
+    if dtype == pl.Boolean:
+        return ColumnType.BOOLEAN
+    if dtype == pl.Date:
+        return ColumnType.DATE
+    if isinstance(dtype, pl.Datetime):
+        return ColumnType.DATETIME
+    return ColumnType.STRING
+
+
+def to_display_expr(values: pl.Expr, dtype: pl.DataType) -> pl.Expr:
+    """
+    Format a column of dtype as strings for queries, the same strings
+    to_display_value gives its values in the API
+    """
+    column_type = from_polars_type(dtype)
+    if column_type == ColumnType.STRING:
+        return values.cast(pl.Utf8)
+    return format_values(values, column_type)
+
+
+def get_type_expressions(
+    columns: List[str],
+    pinned_types: Optional[Dict[str, ColumnType]] = None,
+    candidate_types: Optional[Dict[str, List[ColumnType]]] = None,
+) -> List[pl.Expr]:
+    """
+    Aggregations counting the values of string columns matching each type,
+    for resolve_column_types. They can be selected along with other
+    aggregations, so a file is only read once. Empty values must already be
+    null. Only the `candidate_types` of a column are counted when given, see
+    sample_candidate_types.
+    """
+    pinned_types = pinned_types or {}
+    expressions = []
+    for index, col in enumerate(columns):
+        values = pl.col(col).str.strip_chars()
+        expressions.append(values.count().alias(f"type_values_{index}"))
+        if candidate_types is not None:
+            column_candidates = candidate_types[col]
+        else:
+            column_candidates = _get_candidate_types(col, pinned_types)
+        for column_type in column_candidates:
+            parsed = parse_values(values, column_type)
+            if col in pinned_types:
+                # Pinned types take any value that parses, e.g. "007" as 7
+                matches = parsed.is_not_null()
+            else:
+                matches = values.str.contains(VALUE_PATTERNS[column_type]) & (
+                    format_values(parsed, column_type) == values
+                )
+            expressions.append(matches.sum().alias(f"type_{column_type}_{index}"))
+    return expressions
+
+
+def resolve_column_types(
+    counts: Dict[str, Any],
+    columns: List[str],
+    pinned_types: Optional[Dict[str, ColumnType]] = None,
+    labels: Optional[Dict[str, str]] = None,
+) -> Dict[str, ColumnType]:
+    """
+    Get the type of each column from the results of get_type_expressions:
+    the first type every value of a column parses as and formats back to
+    unchanged, or the type pinned for the column if every value parses as it.
+    Raises ColumnTypeError when a pinned column has values of another type,
+    naming the column by its `labels` entry if it has one.
+    """
+    labels = labels or {}
+    pinned_types = pinned_types or {}
+    column_types = {}
+    for index, col in enumerate(columns):
+        num_values = counts[f"type_values_{index}"]
+        column_types[col] = next(
+            (
+                column_type
+                for column_type in _get_candidate_types(col, pinned_types)
+                # Empty columns are only typed when pinned
+                if (num_values or col in pinned_types)
+                # Types ruled out by sample_candidate_types aren't counted
+                and counts.get(f"type_{column_type}_{index}") == num_values
+            ),
+            ColumnType.STRING,
+        )
+        if col in pinned_types and column_types[col] != pinned_types[col]:
+            raise ColumnTypeError(
+                f"Column {labels.get(col, col)} has values that are not of type "
+                f"{pinned_types[col]}"
+            )
+    return column_types
+
+
+def sample_candidate_types(
+    frame: pl.LazyFrame,
+    columns: List[str],
+    pinned_types: Optional[Dict[str, ColumnType]] = None,
+) -> Dict[str, List[ColumnType]]:
+    """
+    Get the types each string column can still be of, the ones all of its
+    first SAMPLE_ROWS values are of. Checking them first spares parsing every
+    value of e.g. a text column as each type.
+    """
+    if not columns:
+        return {}
+    pinned_types = pinned_types or {}
+    counts = (
+        frame.head(SAMPLE_ROWS)
+        .select(get_type_expressions(columns, pinned_types))
+        .collect()
+        .row(0, named=True)
+    )
+    return {
+        col: [
+            column_type
+            for column_type in _get_candidate_types(col, pinned_types)
+            if counts[f"type_{column_type}_{index}"] == counts[f"type_values_{index}"]
+        ]
+        for index, col in enumerate(columns)
+    }
+
+
+class TypeCounts:
+    """
+    Counts of the values of string columns matching each type, for
+    resolve_column_types, added up one batch of rows at a time. Candidate
+    types come from the first rows of the first batch, see
+    sample_candidate_types, and a type a batch rules out for a column isn't
+    counted in the batches after it. Empty values must already be null.
+    """
+
+    def __init__(
+        self,
+        columns: List[str],
+        pinned_types: Optional[Dict[str, ColumnType]] = None,
+    ):
+        self.columns = columns
+        self.pinned_types = pinned_types or {}
+        self.candidate_types: Optional[Dict[str, List[ColumnType]]] = None
+        self.counts: Dict[str, int] = {}
+        for index, col in enumerate(columns):
+            self.counts[f"type_values_{index}"] = 0
+            for column_type in _get_candidate_types(col, self.pinned_types):
+                self.counts[f"type_{column_type}_{index}"] = 0
+
+    def update(self, frame: pl.DataFrame):
+        """Count a batch of rows, with the columns among its columns"""
+        if not self.columns:
+            return
+        if self.candidate_types is None:
+            self.candidate_types = sample_candidate_types(
+                frame.lazy(), self.columns, self.pinned_types
+            )
+            self._drop_types_ruled_out()
+
+        counts = (
+            frame.lazy()
+            .select(
+                get_type_expressions(
+                    self.columns, self.pinned_types, self.candidate_types
+                )
+            )
+            .collect()
+            .row(0, named=True)
+        )
+        for index, col in enumerate(self.columns):
+            num_values = counts[f"type_values_{index}"]
+            self.counts[f"type_values_{index}"] += num_values
+            for column_type in list(self.candidate_types[col]):
+                key = f"type_{column_type}_{index}"
+                if counts[key] == num_values:
+                    self.counts[key] += num_values
+                else:
+                    self.candidate_types[col].remove(column_type)
+                    del self.counts[key]
+
+    def _drop_types_ruled_out(self):
+        for index, col in enumerate(self.columns):
+            for column_type in _get_candidate_types(col, self.pinned_types):
+                if column_type not in self.candidate_types[col]:
+                    del self.counts[f"type_{column_type}_{index}"]
+
+    def resolve(self, labels: Optional[Dict[str, str]] = None) -> Dict[str, ColumnType]:
+        """The type of each column, see resolve_column_types"""
+        return resolve_column_types(
+            self.counts, self.columns, self.pinned_types, labels
+        )
+
+
+def infer_column_types(
+    frame: pl.LazyFrame,
+    columns: List[str],
+    pinned_types: Optional[Dict[str, ColumnType]] = None,
+) -> Dict[str, ColumnType]:
+    """Find the type of string columns in a single pass over a frame"""
+    if not columns:
+        return {}
+    candidate_types = sample_candidate_types(frame, columns, pinned_types)
+    counts = (
+        frame.select(get_type_expressions(columns, pinned_types, candidate_types))
+        .collect()
+        .row(0, named=True)
+    )
+    return resolve_column_types(counts, columns, pinned_types)
+
+
+def _get_candidate_types(
+    col: str, pinned_types: Dict[str, ColumnType]
+) -> List[ColumnType]:
+    """Types other than string a column is checked for, in order of preference"""
+    if col in pinned_types:
+        return [pinned_types[col]] if pinned_types[col] != ColumnType.STRING else []
+    return list(VALUE_PATTERNS)
+
+
+def format_float(value: float) -> str:
+    """
+    Format a float the way Polars casts it to a string, which type inference
+    checks values against: the shortest digits reading back as the value,
+    positional unless the exponent is large or small, e.g. "0.00001",
+    "100.0", "1e-7" or "1.5e21"
+    """
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "inf" if value > 0 else "-inf"
+
+    sign = "-" if math.copysign(1.0, value) < 0 else ""
+    if value == 0:
+        return f"{sign}0.0"
+    # repr has the same shortest round-tripping digits
+    _, digit_tuple, exponent = Decimal(repr(abs(value))).as_tuple()
+    digits = "".join(map(str, digit_tuple)).rstrip("0")
+    exponent += len(digit_tuple) - len(digits)
+    # Position of the decimal point relative to the first digit
+    point = len(digits) + exponent
+    if 0 <= exponent and point <= 16:
+        formatted = f"{digits}{'0' * exponent}.0"
+    elif 0 < point <= 16:
+        formatted = f"{digits[:point]}.{digits[point:]}"
+    elif -5 < point <= 0:
+        formatted = f"0.{'0' * -point}{digits}"
+    elif len(digits) == 1:
+        formatted = f"{digits}e{point - 1}"
+    else:
+        formatted = f"{digits[0]}.{digits[1:]}e{point - 1}"
+    return sign + formatted
+
+
+def to_display_value(value: Any) -> Optional[str]:
+    """
+    Format a typed value the way it was written in the CSV, as to_display_expr
+    does a column
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime.datetime):
+        return value.strftime(DATETIME_FORMAT)
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, float):
+        return format_float(value)
+    return str(value)
+
+
+def to_display_values(values: Sequence) -> Sequence:
+    """Format column data as strings, e.g. before text transforms are applied"""
+    return map_values(values, to_display_value)
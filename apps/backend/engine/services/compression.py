@@ -0,0 +1,67 @@
+import json
+from enum import StrEnum
+from typing import Any, Dict, Optional
+
+import pyarrow as pa
+from django.conf import settings
+
+from .backends import StorageBackend, StoredObject
+
+
+class Codec(StrEnum):
+    IDENTITY = "identity"
+    ZSTD = "zstd"
+    GZIP = "gzip"
+
+
+# Object metadata entry recording how an object's body is compressed. Objects
+# written before compression existed have none and are read as they are.
+CODEC_METADATA_KEY = "codec"
+
+
+def encode_json(
+    value: Any, codec: Optional[Codec] = None
+) -> tuple[bytes, Dict[str, str]]:
+    """
+    Serialize a value to JSON compressed with `codec`, by default the one
+    configured in settings. Returns the body and the object metadata to
+    store it with.
+    """
+    codec = Codec(codec or settings.STORAGE_COMPRESSION)
+    body = json.dumps(value).encode()
+    if codec == Codec.IDENTITY:
+        return body, {}
+
+    sink = pa.BufferOutputStream()
+    with pa.CompressedOutputStream(sink, codec.value) as stream:
+        stream.write(body)
+    return sink.getvalue().to_pybytes(), {CODEC_METADATA_KEY: codec.value}
+
+
+def decode_json(stored_obj: StoredObject) -> tuple[Any, int]:
+    """
+    Parse a JSON object written by encode_json, returning it with its
+    uncompressed size. The body is decompressed while it's being read, so the
+    compressed bytes are never held in memory as a whole.
+    """
+    codec = Codec(stored_obj.metadata.get(CODEC_METADATA_KEY, Codec.IDENTITY))
+    if codec == Codec.IDENTITY:
+        body = stored_obj.body.read()
+    else:
+        stream = pa.CompressedInputStream(
+            pa.PythonFile(stored_obj.body, mode="r"), codec.value
+        )
+        body = stream.read()
+    return json.loads(body), len(body)
+
+
+def put_json(backend: StorageBackend, key: str, value: Any, **conditions) -> str:
+    """Write a value as a compressed JSON object, see StorageBackend.put"""
+    body, metadata = encode_json(value)
+    return backend.put(key, body, metadata=metadata, **conditions)
+
+
+def get_json(backend: StorageBackend, key: str) -> Any:
+    """Read a JSON object, raising ObjectNotFoundError if it doesn't exist"""
+    value, _ = decode_json(backend.get(key))
+    return value
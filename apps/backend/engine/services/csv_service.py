@@ -1,45 +1,101 @@
+import numpy as np
 import polars as pl
-import boto3
-import json
-from typing import List, BinaryIO
+import pyarrow as pa
+import copy
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    BinaryIO,
+    Optional,
+    Iterator,
+    TypeVar,
+)
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from contextlib import contextmanager
+from django.core.files.uploadedfile import UploadedFile
+import tempfile
 from django.conf import settings
-from .types import Metadata, ColumnDef, Column, Row
+from .types import (
+    Metadata,
+    ColumnDef,
+    Column,
+    ColumnStats,
+    Row,
+    Catalog,
+    CatalogEntry,
+)
+from .backends import (
+    ObjectNotFoundError,
+    PreconditionFailedError,
+    StoredObject,
+    get_storage_backend,
+)
+from .base import ColumnNotFoundError, to_external_row_id
+from .cache import DatasetCache
+from .column_stats import ColumnProfile, compute_column_stats
+from .column_types import (
+    ColumnType,
+    TypeCounts,
+    infer_column_types,
+    parse_values,
+    to_display_values,
+)
+from .compression import decode_json, put_json
+from .storage import (
+    StorageEngine,
+    BaseStorageEngine,
+    JSONStorageEngine,
+    ParquetStorageEngine,
+    ColumnStorageEngine,
+    to_column_array,
+    to_string_array,
+)
 import random
 import string
 import re
-import uuid
 from django.utils.text import slugify
-import logging
+
+T = TypeVar("T")
 
 
 class CSVService:
-    def __init__(self):
-        # Initialize S3 client with optional credentials
-        s3_kwargs = {}
-        logger = logging.getLogger(__name__)
-
-        # Get AWS credentials with defaults of None
-        aws_key = getattr(settings, "AWS_ACCESS_KEY_ID", None)
-        aws_secret = getattr(settings, "AWS_SECRET_ACCESS_KEY", None)
-
-        if aws_key and aws_secret:
-            s3_kwargs.update(
-                {
-                    "aws_access_key_id": aws_key,
-                    "aws_secret_access_key": aws_secret,
-                }
-            )
-            logger.warning(f"Initializing S3 client with AWS credentials ID: {aws_key}")
-        else:
-            logger.info(
-                "Initializing S3 client without AWS credentials (using IAM role)"
-            )
+    DEFAULT_STORAGE_ENGINE = StorageEngine.V3
+    # Bytes of whole rows read from an uploaded CSV at a time while ingesting
+    CSV_BATCH_BYTES = 16 * 1024 * 1024
+    # Rows of an ingested CSV kept in memory for dataset type detection
+    INGEST_SAMPLE_SIZE = 1_000
+    # Columns whose distinct values are at most this share of the rows are
+    # stored as codes into a dictionary of the distinct values. They're
+    # counted by the distinct estimate of the ingest profile, see _scan_columns
+    DICTIONARY_MAX_DISTINCT_RATIO = 0.5
+    # Per-user summary of every file, so listing doesn't read each metadata
+    CATALOG_FILENAME = "catalog.json"
+    CATALOG_WRITE_ATTEMPTS = 5
+    METADATA_WRITE_ATTEMPTS = 5
+    # Independent object reads and writes of a request run concurrently here,
+    # the storage engines' column I/O has its own pool
+    IO_THREAD_PREFIX = "storage-io"
+    io_executor = ThreadPoolExecutor(
+        max_workers=settings.STORAGE_MAX_CONCURRENCY,
+        thread_name_prefix=IO_THREAD_PREFIX,
+    )
 
-        self.s3 = boto3.client("s3", **s3_kwargs)
-        self.bucket = settings.AWS_STORAGE_BUCKET_NAME
+    def __init__(self):
+        self.backend = get_storage_backend()
+        # Decoded datasets and metadata, shared by all requests of this worker
+        self.cache = DatasetCache(settings.DATASET_CACHE_MAX_BYTES)
+        self.storage_engines: dict[StorageEngine, BaseStorageEngine] = {
+            StorageEngine.V1: JSONStorageEngine(self.backend),
+            StorageEngine.V2: ParquetStorageEngine(self.backend, self.cache),
+            StorageEngine.V3: ColumnStorageEngine(self.backend, self.cache),
+        }
 
     def _get_user_path(self, user_id: str, file_uuid: str) -> str:
-        """Generate the S3 path prefix for a user's file"""
+        """Generate the storage path prefix for a user's file"""
         return f"{user_id}/{file_uuid}"
 
     def generate_friendly_id(self, filename: str) -> str:
@@ -83,116 +139,601 @@ class CSVService:
             f"{formatted_label}_{''.join(random.choices(string.ascii_lowercase, k=4))}"
         )
 
+    def get_many(self, *reads: Callable[[], Any]) -> List[Any]:
+        """
+        Run independent reads concurrently, e.g. a file's metadata and its
+        columns, and return their results in order. The first error raised by
+        a read is re-raised.
+        """
+        return self._map(lambda read: read(), reads)
+
+    def get_many_metadata(
+        self, user_id: str, file_uuids: List[str]
+    ) -> Dict[str, Metadata]:
+        """Get the metadata of several files concurrently, skipping missing ones"""
+
+        def get(file_uuid: str) -> Optional[Metadata]:
+            try:
+                return self.get_metadata(user_id, file_uuid)
+            except ValueError:
+                return None
+
+        return {
+            file_uuid: metadata
+            for file_uuid, metadata in zip(file_uuids, self._map(get, file_uuids))
+            if metadata is not None
+        }
+
+    def _map(self, func: Callable[[Any], T], items: Iterable) -> List[T]:
+        """
+        Run func over items on the I/O pool. Calls made from one of its threads
+        run inline, so a task never waits for the pool it is occupying.
+        """
+        if threading.current_thread().name.startswith(self.IO_THREAD_PREFIX):
+            return [func(item) for item in items]
+        return list(self.io_executor.map(func, items))
+
     def get_metadata(self, user_id: str, file_uuid: str) -> Metadata:
+        metadata, _ = self._get_metadata_entry(user_id, file_uuid)
+        return metadata
+
+    def _get_metadata_entry(self, user_id: str, file_uuid: str) -> tuple[Metadata, str]:
+        """Get a dataset's metadata and its ETag, for conditional writes"""
         try:
             path = self._get_user_path(user_id, file_uuid)
-            metadata_obj = self.s3.get_object(
-                Bucket=self.bucket, Key=f"{path}/metadata.json"
+            entry = self.cache.get_entry(
+                self.backend, f"{path}/metadata.json", self._decode_metadata
             )
-            metadata = json.loads(metadata_obj["Body"].read())
-            metadata["created_at"] = (
-                metadata.get("created_at") or metadata_obj["LastModified"].isoformat()
-            )
-            return metadata
-        except self.s3.exceptions.NoSuchKey:
+            # Cached metadata is shared between requests, callers get their own copy
+            return copy.deepcopy(entry.value), entry.etag
+        except ObjectNotFoundError:
             raise ValueError("Metadata not found")
 
-    def save_metadata(self, user_id: str, file_uuid: str, metadata: Metadata):
-        path = self._get_user_path(user_id, file_uuid)
-        self.s3.put_object(
-            Bucket=self.bucket,
-            Key=f"{path}/metadata.json",
-            Body=json.dumps(metadata),
+    def _decode_metadata(self, metadata_obj: StoredObject) -> tuple[Metadata, int]:
+        metadata, size = decode_json(metadata_obj)
+        metadata["created_at"] = (
+            metadata.get("created_at") or metadata_obj.last_modified.isoformat()
         )
+        return metadata, size
+
+    def save_metadata(
+        self,
+        user_id: str,
+        file_uuid: str,
+        metadata: Metadata,
+        etag: Optional[str] = None,
+    ):
+        """
+        Save a dataset's metadata. With `etag` the metadata must still be at
+        that version, or PreconditionFailedError is raised.
+        """
+        path = self._get_user_path(user_id, file_uuid)
+        try:
+            put_json(self.backend, f"{path}/metadata.json", metadata, if_match=etag)
+        finally:
+            self.cache.invalidate(f"{path}/metadata.json")
+        self._update_catalog(user_id, file_uuid, metadata)
+
+    def delete_dataset(self, user_id: str, file_uuid: str):
+        """Delete every object stored under a dataset, e.g. of a failed upload"""
+        path = self._get_user_path(user_id, file_uuid)
+        keys = [obj.key for obj in self.backend.list(f"{path}/")]
+        if keys:
+            self.backend.delete(keys)
+        for key in keys:
+            self.cache.invalidate(key)
+
+    def update_metadata(
+        self,
+        user_id: str,
+        file_uuid: str,
+        update: Callable[[Metadata], Metadata],
+    ) -> Metadata:
+        """
+        Apply `update` to a dataset's metadata and save the result, unless
+        it's unchanged. Writes are conditional on the metadata not having
+        changed since it was read, and `update` is applied again to the new
+        metadata otherwise, so concurrent writes of other fields aren't lost.
+        """
+        for _ in range(self.METADATA_WRITE_ATTEMPTS):
+            metadata, etag = self._get_metadata_entry(user_id, file_uuid)
+            updated = update(copy.deepcopy(metadata))
+            if updated == metadata:
+                return updated
+            try:
+                self.save_metadata(user_id, file_uuid, updated, etag=etag)
+            except PreconditionFailedError:
+                continue
+            return updated
+
+        raise RuntimeError(f"Could not update the metadata of {file_uuid}")
 
     def parse_csv(self, file: BinaryIO) -> pl.DataFrame:
         df = pl.read_csv(file, truncate_ragged_lines=True)
         return self._process_dataframe(df)
 
-    def _process_dataframe(self, df: pl.DataFrame) -> pl.DataFrame:
-        # Create a list of columns that have at least one non-empty value
-        # (not null AND not empty string)
-        non_empty_cols = [
+    def ingest_csv(
+        self,
+        user_id: str,
+        file_uuid: str,
+        file: UploadedFile,
+        pinned_types: Optional[Dict[str, ColumnType]] = None,
+    ) -> tuple[List[ColumnDef], Dict[str, ColumnStats]]:
+        """
+        Stream an uploaded CSV into storage batch by batch, so memory is bounded
+        by the batch size instead of the file size. Columns are stored as the
+        type their values are inferred as, or as `pinned_types` by header.
+        Returns the first rows of the processed columns, as displayed, as a
+        sample of the dataset, and the stats of each column by ID. Raises
+        ColumnTypeError when a pinned column has values of another type.
+        """
+        path = self._get_user_path(user_id, file_uuid)
+
+        with self._get_local_path(file) as source:
+            non_empty_cols, column_types, dictionary_cols, column_stats = (
+                self._scan_columns(source, pinned_types)
+            )
+            labels = [self._get_column_label(col) for col in non_empty_cols]
+            column_ids = [self.generate_column_id(label) for label in labels]
+            column_defs = [
+                {"id": column_id, "label": label, "classification": None}
+                for column_id, label in zip(column_ids, labels)
+            ]
+            column_defs.append(
+                {"id": "row_id", "label": "Row ID", "classification": None}
+            )
+            dictionary_column_ids = [
+                column_id
+                for col, column_id in zip(non_empty_cols, column_ids)
+                if col in dictionary_cols
+            ]
+            column_types = {
+                column_id: column_types[col]
+                for col, column_id in zip(non_empty_cols, column_ids)
+            }
+            column_stats = {
+                column_id: column_stats[col]
+                for col, column_id in zip(non_empty_cols, column_ids)
+            }
+
+            sample_frames: List[pl.DataFrame] = []
+            sample_size = 0
+            num_rows = 0
+
+            def batches() -> Iterator[pl.DataFrame]:
+                nonlocal sample_size, num_rows
+                for df in self._read_csv_batches(source):
+                    df = self._process_dataframe(df, non_empty_cols)
+                    # Row IDs continue across batches
+                    dataset_df = self.to_dataset_frame(
+                        df, column_ids, num_rows, column_types
+                    )
+                    num_rows += len(dataset_df)
+                    if sample_size < self.INGEST_SAMPLE_SIZE:
+                        sample_frames.append(
+                            dataset_df.head(self.INGEST_SAMPLE_SIZE - sample_size)
+                        )
+                        sample_size += len(sample_frames[-1])
+                    yield dataset_df
+
+            storage_engine = self.storage_engines[self.DEFAULT_STORAGE_ENGINE]
+            storage_engine.write_batches(
+                path, column_defs, batches(), dictionary_column_ids, column_types
+            )
+
+        # Stats are current as long as their column's data is
+        column_versions = storage_engine.get_column_versions(path)
+        for column_id, stats in column_stats.items():
+            stats["version"] = column_versions[column_id]
+
+        sample_df = pl.concat(sample_frames) if sample_frames else None
+        return [
+            {
+                **col,
+                "data": to_display_values(sample_df.get_column(col["id"]).to_list())
+                if sample_df is not None
+                else [],
+            }
+            for col in column_defs
+        ], column_stats
+
+    @contextmanager
+    def _get_local_path(self, file: UploadedFile) -> Iterator[str]:
+        """Get a path on disk for an upload, spooling in-memory uploads to a temp file"""
+        if hasattr(file, "temporary_file_path"):
+            yield file.temporary_file_path()
+            return
+
+        with tempfile.NamedTemporaryFile(suffix=".csv") as tmp:
+            for chunk in file.chunks():
+                tmp.write(chunk)
+            tmp.flush()
+            yield tmp.name
+
+    def _read_csv_batches(self, source: str) -> Iterator[pl.DataFrame]:
+        # Values are read as written, columns are typed by _scan_columns
+        header = None
+        for block in self._read_csv_blocks(source):
+            if header is None:
+                df = pl.read_csv(
+                    block, infer_schema_length=0, truncate_ragged_lines=True
+                )
+                header = df.columns
+            else:
+                df = pl.read_csv(
+                    block,
+                    has_header=False,
+                    schema={col: pl.Utf8 for col in header},
+                    truncate_ragged_lines=True,
+                    raise_if_empty=False,
+                )
+            yield df
+
+    def _read_csv_blocks(self, source: str) -> Iterator[bytes]:
+        """
+        Split a CSV into blocks of whole rows of about CSV_BATCH_BYTES. Polars'
+        batched reader splits a file into a fixed number of batches, which
+        grow with the file, and maps all of it into memory.
+        """
+        with open(source, "rb") as file:
+            rest = b""
+            while block := file.read(self.CSV_BATCH_BYTES):
+                data = rest + block
+                end = self._find_last_row_end(data)
+                if end:
+                    yield data[:end]
+                rest = data[end:]
+            if rest:
+                yield rest
+
+    @staticmethod
+    def _find_last_row_end(data: bytes) -> int:
+        """
+        The end of the last whole row of CSV data starting at a row: past its
+        last newline outside quotes, one after an even number of quotes. 0 if
+        the data has no whole row.
+        """
+        values = np.frombuffer(data, dtype=np.uint8)
+        in_quotes = np.bitwise_xor.accumulate((values == ord('"')).view(np.uint8))
+        row_ends = np.flatnonzero((values == ord("\n")) & (in_quotes == 0))
+        return int(row_ends[-1]) + 1 if len(row_ends) else 0
+
+    def _scan_columns(
+        self,
+        source: str,
+        pinned_types: Optional[Dict[str, ColumnType]] = None,
+    ) -> tuple[List[str], Dict[str, ColumnType], List[str], Dict[str, ColumnStats]]:
+        """
+        Find the non-empty columns of a CSV, infer their type, find the ones
+        worth a dictionary and profile them, in one pass over its batches.
+        Each batch's counts and sketches are merged into the ones before, so
+        memory is bounded by the batch size instead of the file size.
+        """
+        # Polars reads the whole file for its header, only the first block is
+        first_block = next(self._read_csv_blocks(source), b"")
+        header = pl.read_csv(first_block, n_rows=0, truncate_ragged_lines=True).columns
+        # Batches are counted under positional names, expressions can't refer
+        # to every header, e.g. an empty one or one read as a regex like "^a$"
+        names = [f"column_{index}" for index in range(len(header))]
+        labels = dict(zip(names, header))
+        type_counts = TypeCounts(
+            names,
+            {
+                name: pinned_types[col]
+                for name, col in labels.items()
+                if col in pinned_types
+            }
+            if pinned_types
+            else None,
+        )
+        profile = ColumnProfile(names)
+        non_empty = set()
+        num_rows = 0
+        for df in self._read_csv_batches(source):
+            non_empty.update(self._get_non_empty_columns(df))
+            df = self._with_ids(df, names).select(
+                self._to_null_if_empty(pl.col(name)).alias(name) for name in names
+            )
+            num_rows += len(df)
+            type_counts.update(df)
+            profile.update(df)
+
+        # If we have no non-empty columns, keep all columns to prevent empty DataFrame
+        columns = [col for col in header if col in non_empty] or header
+        types_by_name = type_counts.resolve(labels)
+        stats_by_name = profile.result()
+        column_types = {labels[name]: types_by_name[name] for name in names}
+        column_stats = {labels[name]: stats_by_name[name] for name in names}
+        # Only strings repeat often enough to be worth a dictionary
+        dictionary_cols = [
             col
-            for col in df.columns
-            if df[col]
-            .fill_null("")  # Replace nulls with empty string
+            for col in columns
+            if column_types[col] == ColumnType.STRING
+            and num_rows
+            and column_stats[col]["distinct_count"]
+            <= num_rows * self.DICTIONARY_MAX_DISTINCT_RATIO
+        ]
+        return columns, column_types, dictionary_cols, column_stats
+
+    def _get_non_empty_columns(self, df: pl.DataFrame) -> List[str]:
+        # Find the columns that have at least one non-empty value (not null AND
+        # not empty string) in a single pass over all columns
+        has_values = df.select(
+            pl.all()
             .cast(pl.Utf8)  # Convert to string type
             .str.strip_chars()  # Strip whitespace
-            .ne("")  # Check if not empty string
-            .any()  # Check if any value is True
-        ]
+            .ne("")  # Check if not empty string, nulls stay null
+            .any()  # Check if any value is True, ignoring nulls
+        )
+        if not has_values.height:
+            return []
+        return [col for col, keep in zip(df.columns, has_values.row(0)) if keep]
+
+    @staticmethod
+    def _get_column_label(name: str) -> str:
+        # Unnamed or empty string columns are labelled "(No name)"
+        return "(No name)" if not name.strip() else name
+
+    def _process_dataframe(
+        self, df: pl.DataFrame, non_empty_cols: Optional[List[str]] = None
+    ) -> pl.DataFrame:
+        # Non-empty columns are passed in when processing a file in batches,
+        # since a single batch can't tell whether a column is empty
+        if non_empty_cols is None:
+            non_empty_cols = self._get_non_empty_columns(df)
 
         # If we have no non-empty columns, keep all columns to prevent empty DataFrame
         if not non_empty_cols:
             non_empty_cols = df.columns
 
-        # Filter to keep only non-empty columns in original order
-        df = df.select(non_empty_cols)
+        # Filter to keep only non-empty columns in original order. Selected as
+        # Series, expressions would read headers such as "^a$" or "*" as patterns
+        df = df.select(df.get_column(col) for col in non_empty_cols)
 
         # Rename unnamed or empty string columns to "(No name)" while preserving order
-        new_names = {col: "(No name)" if not col.strip() else col for col in df.columns}
+        new_names = {col: self._get_column_label(col) for col in df.columns}
         df = df.rename(new_names)
 
         return df
 
     def save_data(self, user_id: str, file_uuid: str, columns: List[ColumnDef]):
         path = self._get_user_path(user_id, file_uuid)
-        self.s3.put_object(
-            Bucket=self.bucket,
-            Key=f"{path}/data.json",
-            Body=json.dumps(columns),
+        self.storage_engines[self.DEFAULT_STORAGE_ENGINE].write(path, columns)
+
+    def get_data(
+        self, user_id: str, file_uuid: str, column_ids: Optional[List[str]] = None
+    ) -> List[ColumnDef]:
+        """Get the columns of a dataset, optionally only the given column IDs"""
+        path = self._get_user_path(user_id, file_uuid)
+        return self._get_storage_engine(user_id, file_uuid).read(path, column_ids)
+
+    def update_data(
+        self,
+        user_id: str,
+        file_uuid: str,
+        update: Callable[[List[ColumnDef]], List[ColumnDef]],
+    ) -> tuple[List[ColumnDef], str]:
+        """
+        Apply `update` to the columns of a dataset and save the result,
+        returning the updated columns and the version of the data saved, as
+        get_data_version gives it. Only the columns it added or modified are
+        written when the storage engine supports it, so small edits don't
+        rewrite the whole dataset.
+        """
+        path = self._get_user_path(user_id, file_uuid)
+        return self._get_storage_engine(user_id, file_uuid).update(path, update)
+
+    def get_rows(
+        self,
+        user_id: str,
+        file_uuid: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> tuple[List[ColumnDef], int]:
+        """Get a range of rows of a dataset along with the total number of rows"""
+        path = self._get_user_path(user_id, file_uuid)
+        return self._get_storage_engine(user_id, file_uuid).read_rows(
+            path, offset, limit
         )
 
-    def get_data(self, user_id: str, file_uuid: str) -> List[ColumnDef]:
+    def get_data_version(self, user_id: str, file_uuid: str) -> str:
+        """
+        Get the version of a dataset's data, the ETag of the object every write
+        replaces, without reading the data
+        """
         path = self._get_user_path(user_id, file_uuid)
         try:
-            data_obj = self.s3.get_object(Bucket=self.bucket, Key=f"{path}/data.json")
-            data = data_obj["Body"].read()
-            return json.loads(data)
-        except self.s3.exceptions.NoSuchKey:
+            return self._get_storage_engine(user_id, file_uuid).get_version(path)
+        except ObjectNotFoundError:
             raise ValueError("Data not found")
 
-    def convert_df_to_columns(self, df: pl.DataFrame) -> List[ColumnDef]:
-        # Generate row IDs once
-        row_ids = [str(uuid.uuid4()) for _ in range(len(df))]
-
-        columns: List[ColumnDef] = []
-        for col_name in df.columns:
-            column_id = self.generate_column_id(col_name)
-            column_data = df[col_name].to_list()
-            # Convert values to strings, treating empty/whitespace strings as None
-            column_data = [
-                str(val)
-                if val is not None and str(val).strip() not in ["", "None"]
-                else None
-                for val in column_data
-            ]
+    def get_metadata_version(self, user_id: str, file_uuid: str) -> str:
+        """Get the ETag of a dataset's metadata without reading it"""
+        path = self._get_user_path(user_id, file_uuid)
+        try:
+            return self.backend.head(f"{path}/metadata.json")
+        except ObjectNotFoundError:
+            raise ValueError("Metadata not found")
 
-            columns.append(
-                {
-                    "id": column_id,
-                    "label": col_name,
-                    "classification": None,
-                    "data": column_data,
-                }
+    def get_columns(self, user_id: str, file_uuid: str) -> List[Column]:
+        """Get the column definitions of a dataset without reading their data"""
+        path = self._get_user_path(user_id, file_uuid)
+        column_defs = self._get_storage_engine(user_id, file_uuid).read_column_defs(
+            path
+        )
+        return [col for col in column_defs if col["id"] != "row_id"]
+
+    def get_column_stats(
+        self, user_id: str, file_uuid: str, column_id: str
+    ) -> ColumnStats:
+        """
+        Get the stats of a column as profiled at ingest, without reading any
+        row data. A column written since, or ingested before columns were
+        profiled, is profiled again from its data. Its stats are saved unless
+        the metadata changed in the meantime, requests reading stats don't
+        overwrite other writes. Raises ValueError when the dataset doesn't
+        exist and ColumnNotFoundError for unknown columns.
+        """
+        path = self._get_user_path(user_id, file_uuid)
+        metadata, metadata_etag = self._get_metadata_entry(user_id, file_uuid)
+        try:
+            column_versions = self._get_storage_engine(
+                user_id, file_uuid
+            ).get_column_versions(path)
+        except ObjectNotFoundError:
+            raise ValueError("Data not found")
+        if column_id not in column_versions or column_id == "row_id":
+            raise ColumnNotFoundError(f"Column not found: {column_id}")
+
+        stats = metadata.get("column_stats", {}).get(column_id)
+        if stats is not None and stats.get("version") == column_versions[column_id]:
+            return stats
+
+        (col,) = self.get_data(user_id, file_uuid, [column_id])
+        values = pl.Series(
+            column_id, list(to_display_values(col["data"])), dtype=pl.Utf8
+        )
+        frame = pl.LazyFrame([values]).select(
+            self._to_null_if_empty(pl.col(column_id)).alias(column_id)
+        )
+        stats = compute_column_stats(frame, [column_id])[column_id]
+        stats["version"] = column_versions[column_id]
+        metadata.setdefault("column_stats", {})[column_id] = stats
+        try:
+            self.save_metadata(user_id, file_uuid, metadata, etag=metadata_etag)
+        except PreconditionFailedError:
+            # The column is profiled again by the next request for its stats
+            pass
+        return stats
+
+    def _get_storage_engine(self, user_id: str, file_uuid: str) -> BaseStorageEngine:
+        """Get the engine a dataset is stored with, migrating legacy datasets"""
+        metadata = self.get_metadata(user_id, file_uuid)
+        storage_engine = metadata.get("storage_engine") or StorageEngine.V1
+
+        if storage_engine != self.DEFAULT_STORAGE_ENGINE:
+            self._migrate_data(
+                user_id, file_uuid, metadata, StorageEngine(storage_engine)
             )
+            storage_engine = self.DEFAULT_STORAGE_ENGINE
+
+        return self.storage_engines[StorageEngine(storage_engine)]
+
+    def _migrate_data(
+        self,
+        user_id: str,
+        file_uuid: str,
+        metadata: Metadata,
+        storage_engine: StorageEngine,
+    ):
+        """Convert a dataset stored with an older engine into the default one"""
+        path = self._get_user_path(user_id, file_uuid)
+        legacy_engine = self.storage_engines[storage_engine]
+        try:
+            columns = legacy_engine.read(path)
+        except ValueError:
+            # Another request may have migrated the dataset in the meantime
+            return
+
+        self.save_data(user_id, file_uuid, columns)
+        metadata["storage_engine"] = self.DEFAULT_STORAGE_ENGINE.value
+        self.save_metadata(user_id, file_uuid, metadata)
+        legacy_engine.delete(path)
+
+    def convert_df_to_columns(
+        self, df: pl.DataFrame, column_ids: Optional[List[str]] = None
+    ) -> List[ColumnDef]:
+        # Column IDs are passed in when converting batches of the same file
+        if column_ids is None:
+            column_ids = [self.generate_column_id(col_name) for col_name in df.columns]
+
+        # Values are typed the way an uploaded file's would be
+        df = df.select(pl.all().cast(pl.Utf8))
+        column_types = infer_column_types(
+            self._with_ids(df, column_ids)
+            .lazy()
+            .select(
+                self._to_null_if_empty(pl.col(column_id)).alias(column_id)
+                for column_id in column_ids
+            ),
+            column_ids,
+        )
+        dataset_df = self.to_dataset_frame(df, column_ids, column_types=column_types)
+        labels = [*df.columns, "Row ID"]
 
-        # Add row_id column
-        columns.append(
+        return [
             {
-                "id": "row_id",
-                "label": "Row ID",
+                "id": column_id,
+                "label": label,
                 "classification": None,
-                "data": row_ids,
+                "data": dataset_df.get_column(column_id).to_list(),
             }
+            for column_id, label in zip(dataset_df.columns, labels)
+        ]
+
+    def to_dataset_frame(
+        self,
+        df: pl.DataFrame,
+        column_ids: List[str],
+        first_row_id: int = 0,
+        column_types: Optional[Dict[str, ColumnType]] = None,
+    ) -> pl.DataFrame:
+        """
+        Convert a processed DataFrame into the columns stored for a dataset in a
+        single expression plan: values are stringified, empty/whitespace values
+        become null, values of typed columns are parsed into their
+        `column_types`, columns are named by ID and a row_id column numbering
+        the rows from `first_row_id` is appended
+        """
+        column_types = column_types or {}
+        expressions = []
+        for column_id in column_ids:
+            value = self._to_null_if_empty(pl.col(column_id).cast(pl.Utf8))
+            column_type = column_types.get(column_id, ColumnType.STRING)
+            if column_type != ColumnType.STRING:
+                value = parse_values(value.str.strip_chars(), column_type)
+            expressions.append(value.alias(column_id))
+
+        return (
+            self._with_ids(df, column_ids)
+            .select(expressions)
+            .with_columns(self.generate_row_ids(len(df), first_row_id))
+        )
+
+    @staticmethod
+    def _with_ids(df: pl.DataFrame, column_ids: List[str]) -> pl.DataFrame:
+        """
+        Name the columns of a frame by ID, in order. Expressions can't refer to
+        every header, e.g. "^a$" is read as a pattern, even through pl.nth.
+        """
+        return df.rename(dict(zip(df.columns, column_ids)))
+
+    @staticmethod
+    def _to_null_if_empty(value: pl.Expr) -> pl.Expr:
+        return (
+            pl.when(value.str.strip_chars().is_in(["", "None"]))
+            .then(None)
+            .otherwise(value)
         )
 
-        return columns
+    @staticmethod
+    def generate_row_ids(count: int, first_row_id: int = 0) -> pl.Series:
+        """
+        Number rows with compact integers. They never change once assigned,
+        so they stay stable across edits, and are packed as 32-bit integers.
+        """
+        return pl.int_range(
+            first_row_id, first_row_id + count, dtype=pl.UInt32, eager=True
+        ).alias("row_id")
 
     def transform_to_row_format(
-        self, columns: List[ColumnDef]
+        self, columns: List[ColumnDef], external_ids: bool = False
     ) -> tuple[List[Column], List[Row]]:
+        """
+        Transform columns into rows of values as displayed. Rows keep their
+        internal row IDs unless `external_ids` is set, for rows returned by the
+        API.
+        """
         if not columns or not columns[0]["data"]:
             return [], []
 
@@ -207,39 +748,188 @@ class CSVService:
             if col["id"] != "row_id"
         ]
 
+        # Transform to row format using stored row IDs, zipping the columns
+        # together instead of indexing into every column for every row
+        column_ids, values = self.transform_to_columnar_format(columns, external_ids)
+        data_column_ids = column_ids[1:]
+        rows = [
+            {"id": row_id, "data": dict(zip(data_column_ids, row_values))}
+            for row_id, *row_values in values
+        ]
+
+        return column_defs, rows
+
+    def transform_to_columnar_format(
+        self, columns: List[ColumnDef], external_ids: bool = False
+    ) -> tuple[List[str], List[tuple]]:
+        """
+        Transform columns into a compact table: the column IDs, starting with
+        "id" for the row ID, and one tuple of values as displayed per row, so
+        column IDs aren't repeated on every row
+        """
+        if not columns or not columns[0]["data"]:
+            return [], []
+
         # Find row_id column
         row_id_column = next((col for col in columns if col["id"] == "row_id"), None)
         if not row_id_column:
             raise ValueError("Row ID column not found")
 
-        # Transform to row format using stored row IDs
-        num_rows = len(columns[0]["data"])
-        rows = []
+        data_columns = [col for col in columns if col["id"] != "row_id"]
+        row_ids = row_id_column["data"]
+        if external_ids:
+            row_ids = map(to_external_row_id, row_ids)
+        values = list(
+            zip(row_ids, *(to_display_values(col["data"]) for col in data_columns))
+        )
 
-        for row_idx in range(num_rows):
-            row_data = {}
-            for col in columns:
-                if col["id"] != "row_id":  # Skip row_id column in data
-                    row_data[col["id"]] = col["data"][row_idx]
+        return ["id", *(col["id"] for col in data_columns)], values
 
-            rows.append({"id": row_id_column["data"][row_idx], "data": row_data})
+    def transform_to_arrow_table(
+        self, columns: List[ColumnDef], external_ids: bool = False
+    ) -> pa.Table:
+        """
+        Transform columns into an Arrow table with an "id" column for the row
+        ID followed by the columns as they are stored: typed and dictionary
+        encoded, with their label and classification as field metadata
+        """
+        row_id_column = next((col for col in columns if col["id"] == "row_id"), None)
+        if not row_id_column:
+            raise ValueError("Row ID column not found")
 
-        return column_defs, rows
+        row_ids = row_id_column["data"]
+        row_id_array = (
+            to_string_array([to_external_row_id(row_id) for row_id in row_ids])
+            if external_ids
+            else to_column_array("row_id", row_ids)
+        )
+        fields = [pa.field("id", row_id_array.type)]
+        arrays = [row_id_array]
+        for col in columns:
+            if col["id"] == "row_id":
+                continue
+            array = to_column_array(col["id"], col["data"])
+            fields.append(
+                pa.field(
+                    col["id"],
+                    array.type,
+                    metadata={
+                        "label": col["label"],
+                        "classification": col["classification"] or "",
+                    },
+                )
+            )
+            arrays.append(array)
+        return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
 
     def list_user_files(self, user_id: str) -> List[str]:
         """List all CSV file UUIDs for a user"""
-        # List all objects with the user_id prefix
-        response = self.s3.list_objects_v2(Bucket=self.bucket, Prefix=f"{user_id}/")
-
-        if "Contents" not in response:
-            return []
-
         # Get unique file UUIDs by looking at metadata.json files
         file_uuids = set()
-        for obj in response["Contents"]:
+        for obj in self.backend.list(f"{user_id}/"):
             # Extract UUID from paths like "user_id/uuid/metadata.json"
-            parts = obj["Key"].split("/")
+            parts = obj.key.split("/")
             if len(parts) == 3 and parts[2] == "metadata.json":
                 file_uuids.add(parts[1])
 
         return list(file_uuids)
+
+    def list_files(
+        self, user_id: str, offset: int = 0, limit: Optional[int] = None
+    ) -> tuple[List[CatalogEntry], int]:
+        """List a user's files from their catalog, newest first, with the total count"""
+        files = sorted(
+            self._get_catalog(user_id)["files"].values(),
+            key=lambda file: file["created_at"] or "",
+            reverse=True,
+        )
+        end = None if limit is None else offset + limit
+        return copy.deepcopy(files[offset:end]), len(files)
+
+    def count_user_files(self, user_id: str) -> int:
+        return len(self._get_catalog(user_id)["files"])
+
+    def _get_catalog_key(self, user_id: str) -> str:
+        return f"{user_id}/{self.CATALOG_FILENAME}"
+
+    def _get_catalog(self, user_id: str) -> Catalog:
+        """
+        Get the summary of every file of a user, revalidated through the cache.
+        Catalogs of users who uploaded before catalogs existed are rebuilt once.
+        """
+        try:
+            return self.cache.get_object(
+                self.backend, self._get_catalog_key(user_id), self._decode_catalog
+            )
+        except ObjectNotFoundError:
+            pass
+
+        # Files with missing/invalid metadata are skipped
+        all_metadata = self.get_many_metadata(user_id, self.list_user_files(user_id))
+        catalog: Catalog = {
+            "files": {
+                file_uuid: self._get_catalog_entry(file_uuid, metadata)
+                for file_uuid, metadata in all_metadata.items()
+            }
+        }
+
+        try:
+            self._write_catalog(user_id, catalog, etag=None)
+        except PreconditionFailedError:
+            # Another request created the catalog in the meantime
+            pass
+        return catalog
+
+    def _update_catalog(self, user_id: str, file_uuid: str, metadata: Metadata):
+        """
+        Upsert a file in its user's catalog. Writes are conditional on the
+        catalog not having changed since it was read, and retried otherwise,
+        so concurrent uploads don't overwrite each other's entries.
+        """
+        entry = self._get_catalog_entry(file_uuid, metadata)
+        for _ in range(self.CATALOG_WRITE_ATTEMPTS):
+            try:
+                catalog_obj = self.backend.get(self._get_catalog_key(user_id))
+            except ObjectNotFoundError:
+                # Builds the catalog, including this file's saved metadata
+                self._get_catalog(user_id)
+                continue
+
+            catalog, _ = self._decode_catalog(catalog_obj)
+            if catalog["files"].get(file_uuid) == entry:
+                return
+
+            catalog["files"][file_uuid] = entry
+            try:
+                self._write_catalog(user_id, catalog, etag=catalog_obj.etag)
+                return
+            except PreconditionFailedError:
+                continue
+
+        raise RuntimeError(f"Could not update the catalog of user {user_id}")
+
+    def _write_catalog(self, user_id: str, catalog: Catalog, etag: Optional[str]):
+        # Only create the catalog if it doesn't exist, or replace the version read
+        key = self._get_catalog_key(user_id)
+        try:
+            put_json(
+                self.backend,
+                key,
+                catalog,
+                if_match=etag,
+                if_none_match=None if etag else "*",
+            )
+        finally:
+            self.cache.invalidate(key)
+
+    def _decode_catalog(self, catalog_obj: StoredObject) -> tuple[Catalog, int]:
+        return decode_json(catalog_obj)
+
+    @staticmethod
+    def _get_catalog_entry(file_uuid: str, metadata: Metadata) -> CatalogEntry:
+        return {
+            "uuid": file_uuid,
+            "original_filename": metadata.get("original_filename"),
+            "dataset_type": metadata.get("dataset_type"),
+            "created_at": metadata.get("created_at"),  # Will be None if not present
+        }
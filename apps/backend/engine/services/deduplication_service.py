@@ -2,7 +2,7 @@ from typing import Dict, List, Tuple, NamedTuple
 from splink import Linker, SettingsCreator, block_on, DuckDBAPI
 from splink.blocking_rule_library import CustomRule
 import pandas as pd
-from .types import ColumnDef, Row
+from .types import ColumnDef, Row, RowId
 from .column_processor import get_classifier, ClassifierId
 from pathlib import Path
 import tempfile
@@ -10,6 +10,7 @@ from enum import Enum
 
 from .base import (
     DatasetType,
+    to_external_row_id,
 )
 
 
@@ -155,7 +156,12 @@ class DeduplicationService:
         column_ids: List[str],
         uuid: str,
         dataset_type: str,
+        columnar: bool = False,
     ) -> Dict:
+        """
+        Find duplicate rows. Rows are returned as {id, is_duplicate_of} dicts,
+        or with `columnar` as a table of `columns` and `data` value lists.
+        """
         try:
             if not column_ids:
                 raise DeduplicationError("NO_COLUMNS_SELECTED")
@@ -201,6 +207,15 @@ class DeduplicationService:
             processed_rows, deduplicated_count = self._process_rows_with_duplicates(
                 rows, duplicate_mapping
             )
+            if columnar:
+                processed_rows = {
+                    "columns": ["id", "is_duplicate_of"],
+                    "data": [
+                        (row["id"], row["is_duplicate_of"]) for row in processed_rows
+                    ],
+                }
+            else:
+                processed_rows = {"rows": processed_rows}
 
             return {
                 "original_count": len(rows),
@@ -208,7 +223,7 @@ class DeduplicationService:
                 "deduplication_type": "deterministic"
                 if rule_type == BlockingRuleType.DETERMINISTIC
                 else "probabilistic",
-                "rows": processed_rows,
+                **processed_rows,
             }
         except DeduplicationError as e:
             return {
@@ -267,10 +282,10 @@ class DeduplicationService:
         return linker.inference.predict(threshold_match_weight=-5), linker
 
     def _rows_to_splink(self, rows: List[Row]) -> List[Dict]:
-        """Transform rows to format expected by Splink"""
+        """Transform rows to format expected by Splink, keyed by the compact row IDs"""
         return [{"unique_id": row["id"]} | row["data"] for row in rows]
 
-    def _create_duplicate_mapping(self, clusters) -> Dict[str, str]:
+    def _create_duplicate_mapping(self, clusters) -> Dict[RowId, RowId]:
         """
         Create mapping of duplicate IDs to their canonical record IDs
 
@@ -298,7 +313,7 @@ class DeduplicationService:
         return duplicate_mapping
 
     def _process_rows_with_duplicates(
-        self, rows: List[Row], duplicate_mapping: Dict[str, str]
+        self, rows: List[Row], duplicate_mapping: Dict[RowId, RowId]
     ) -> Tuple[List[Row], int]:
         """
         Process rows and add duplicate information
@@ -315,8 +330,12 @@ class DeduplicationService:
         for row in rows:
             row_copy = {}
             row_id = row["id"]
-            row_copy["id"] = row_id
-            row_copy["is_duplicate_of"] = duplicate_mapping.get(row_id, None)
+            canonical_id = duplicate_mapping.get(row_id, None)
+            # Row IDs are only converted to external IDs in the response
+            row_copy["id"] = to_external_row_id(row_id)
+            row_copy["is_duplicate_of"] = (
+                to_external_row_id(canonical_id) if canonical_id is not None else None
+            )
             processed_rows.append(row_copy)
 
         deduplicated_count = len(rows) - len(duplicate_mapping)
@@ -0,0 +1,163 @@
+import array
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+class DictionaryData(Sequence):
+    """
+    Column data stored as integer codes into a list of distinct values, for
+    columns with many repeated values such as countries or roles. Behaves as a
+    read-only list of the values. Transforms map the distinct values only and
+    share the codes with the original data.
+    """
+
+    __slots__ = ("codes", "dictionary")
+
+    def __init__(self, codes: array.array, dictionary: List[Optional[Any]]):
+        self.codes = codes
+        self.dictionary = dictionary
+
+    @classmethod
+    def from_arrow(
+        cls, values: Union[pa.DictionaryArray, pa.ChunkedArray]
+    ) -> "DictionaryData":
+        if isinstance(values, pa.ChunkedArray):
+            # Unifies the dictionaries of the chunks
+            values = values.combine_chunks()
+        dictionary = values.dictionary.to_pylist()
+        indices = values.indices
+        if indices.null_count:
+            # Nulls get a code of their own
+            indices = pc.fill_null(indices, len(dictionary))
+            dictionary.append(None)
+
+        codes = array.array(cls._get_typecode(len(dictionary)))
+        codes.frombytes(
+            indices.cast(cls._get_arrow_type(codes.typecode))
+            .to_numpy(zero_copy_only=False)
+            .tobytes()
+        )
+        return cls(codes, dictionary)
+
+    @classmethod
+    def encode(cls, values: Sequence[Any]) -> "DictionaryData":
+        """Encode values as codes into their distinct values, if not already"""
+        if isinstance(values, DictionaryData):
+            return values
+        try:
+            series = pl.Series(values, dtype=pl.Utf8, strict=True)
+        except TypeError:
+            return cls._encode_objects(values)
+
+        series = series.cast(pl.Categorical)
+        dictionary = series.cat.get_categories().to_list()
+        indices = series.to_physical()
+        if indices.null_count():
+            # Nulls get a code of their own
+            indices = indices.fill_null(len(dictionary))
+            dictionary.append(None)
+
+        codes = array.array(cls._get_typecode(len(dictionary)))
+        codes.frombytes(
+            indices.cast(pl.UInt16 if codes.typecode == "H" else pl.UInt32)
+            .to_numpy()
+            .tobytes()
+        )
+        return cls(codes, dictionary)
+
+    @classmethod
+    def _encode_objects(cls, values: Sequence[Any]) -> "DictionaryData":
+        """Encode typed values, e.g. numbers, by hashing them"""
+        # Keyed by type too, 1 and True are equal but displayed differently
+        index: dict = {}
+        codes = [index.setdefault((type(value), value), len(index)) for value in values]
+        return cls(
+            array.array(cls._get_typecode(len(index)), codes),
+            [value for _, value in index],
+        )
+
+    def to_list(self) -> List[Optional[Any]]:
+        """Decode the values into a list"""
+        dictionary = np.fromiter(
+            self.dictionary, dtype=object, count=len(self.dictionary)
+        )
+        return dictionary[np.frombuffer(self.codes, dtype=self.codes.typecode)].tolist()
+
+    def count_codes(self) -> np.ndarray:
+        """Count the rows of each distinct value, by code"""
+        return np.bincount(
+            np.frombuffer(self.codes, dtype=self.codes.typecode),
+            minlength=len(self.dictionary),
+        )
+
+    def to_arrow(self) -> pa.DictionaryArray:
+        indices = pa.array(self.codes, type=self._get_arrow_type(self.codes.typecode))
+        indices = indices.cast(pa.int32())
+        null_codes = [
+            code for code, value in enumerate(self.dictionary) if value is None
+        ]
+        if null_codes:
+            # Codes of None become null indices
+            indices = pc.if_else(
+                pc.is_in(indices, pa.array(null_codes, pa.int32())),
+                pa.scalar(None, pa.int32()),
+                indices,
+            )
+        return pa.DictionaryArray.from_arrays(
+            indices,
+            # Parquet can't store nulls in the dictionary itself, the entry
+            # of None is only referenced by null indices
+            pa.array(
+                [str(value) if value is not None else "" for value in self.dictionary],
+                type=pa.string(),
+            ),
+        )
+
+    def map(self, func: Callable[[Any], Any]) -> "DictionaryData":
+        """Apply func to each distinct value, instead of every row"""
+        return DictionaryData(self.codes, [func(value) for value in self.dictionary])
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return DictionaryData(self.codes[index], self.dictionary)
+        return self.dictionary[self.codes[index]]
+
+    def __iter__(self) -> Iterator:
+        return map(self.dictionary.__getitem__, self.codes)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, DictionaryData):
+            if self.codes == other.codes and self.dictionary == other.dictionary:
+                return True
+        elif not isinstance(other, list):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            value == other_value for value, other_value in zip(self, other)
+        )
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"DictionaryData({len(self)} values, {len(self.dictionary)} distinct)"
+
+    @staticmethod
+    def _get_typecode(dictionary_size: int) -> str:
+        return "H" if dictionary_size <= 1 << 16 else "I"
+
+    @staticmethod
+    def _get_arrow_type(typecode: str) -> pa.DataType:
+        return pa.uint16() if typecode == "H" else pa.uint32()
+
+
+def map_values(values: Sequence, func: Callable[[Any], Any]) -> Sequence:
+    """Apply func to column data, once per distinct value when dictionary encoded"""
+    if isinstance(values, DictionaryData):
+        return values.map(func)
+    return [func(value) for value in values]
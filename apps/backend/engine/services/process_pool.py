@@ -0,0 +1,67 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Sequence
+
+from django.conf import settings
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Get the worker's pool of processes for CPU-bound work, started on first
+    use, or None when settings.CLASSIFY_PROCESS_POOL_WORKERS is 0. Processes
+    are forked from a server process that hasn't imported anything, forking
+    a worker with threads and Polars running could deadlock them.
+    """
+    global _pool
+    if settings.CLASSIFY_PROCESS_POOL_WORKERS <= 0:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.CLASSIFY_PROCESS_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _map_chunk(func: Callable[[Any], Any], values: Sequence[Any]) -> List[Any]:
+    return [func(value) for value in values]
+
+
+def map_in_processes(func: Callable[[Any], Any], values: Sequence[Any]) -> List[Any]:
+    """
+    Apply func to values, in chunks across the process pool when there are at
+    least settings.CLASSIFY_PROCESS_POOL_MIN_VALUES of them. func and the
+    values must be picklable. Runs in this process when there is no pool, or
+    when its processes died, in which case the pool is started again on next
+    use.
+    """
+    pool = get_process_pool()
+    if pool is None or len(values) < settings.CLASSIFY_PROCESS_POOL_MIN_VALUES:
+        return _map_chunk(func, values)
+
+    chunk_size = settings.CLASSIFY_PROCESS_POOL_CHUNK_SIZE
+    chunks = [
+        values[start : start + chunk_size]
+        for start in range(0, len(values), chunk_size)
+    ]
+    try:
+        futures = [pool.submit(_map_chunk, func, chunk) for chunk in chunks]
+        return [result for future in futures for result in future.result()]
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        return _map_chunk(func, values)
@@ -0,0 +1,167 @@
+from enum import StrEnum
+from typing import Any, List, Optional
+
+import polars as pl
+import pyarrow as pa
+
+from .base import ColumnNotFoundError
+from .column_types import to_display_expr
+from .storage import to_column_array
+from .types import ColumnDef, RowFilter, RowQuery, RowSort
+
+
+class FilterOperator(StrEnum):
+    EQUALS = "equals"
+    CONTAINS = "contains"
+    REGEX = "regex"
+    IS_NULL = "is_null"
+    IS_NOT_NULL = "is_not_null"
+
+
+class InvalidQueryError(Exception):
+    """Raised when a row query is malformed"""
+
+    pass
+
+
+class QueryService:
+    """Filters, sorts and searches the rows of a dataset with Polars"""
+
+    def parse_query(self, data: Any) -> RowQuery:
+        """Validate a query from a request body, raising InvalidQueryError"""
+        if not isinstance(data, dict):
+            raise InvalidQueryError("Query must be an object")
+
+        filters = data.get("filters") or []
+        sort = data.get("sort") or []
+        search = data.get("search") or None
+        if not isinstance(filters, list) or not isinstance(sort, list):
+            raise InvalidQueryError("filters and sort must be lists")
+        if search is not None and not isinstance(search, str):
+            raise InvalidQueryError("search must be a string")
+
+        return {
+            "filters": [self._parse_filter(row_filter) for row_filter in filters],
+            "sort": [self._parse_sort(row_sort) for row_sort in sort],
+            "search": search,
+        }
+
+    def _parse_filter(self, row_filter: Any) -> RowFilter:
+        if not isinstance(row_filter, dict) or not isinstance(
+            row_filter.get("column_id"), str
+        ):
+            raise InvalidQueryError("Each filter needs a column_id")
+        try:
+            operator = FilterOperator(row_filter.get("operator"))
+        except ValueError:
+            raise InvalidQueryError(
+                "Filter operator must be one of: " + ", ".join(FilterOperator)
+            )
+
+        value = row_filter.get("value")
+        if operator in (FilterOperator.IS_NULL, FilterOperator.IS_NOT_NULL):
+            value = None
+        elif value is None or isinstance(value, (dict, list)):
+            raise InvalidQueryError(f"Filter {operator} needs a value")
+        return {
+            "column_id": row_filter["column_id"],
+            "operator": operator,
+            "value": None if value is None else str(value),
+        }
+
+    def _parse_sort(self, row_sort: Any) -> RowSort:
+        if not isinstance(row_sort, dict) or not isinstance(
+            row_sort.get("column_id"), str
+        ):
+            raise InvalidQueryError("Each sort needs a column_id")
+        return {
+            "column_id": row_sort["column_id"],
+            "descending": bool(row_sort.get("descending", False)),
+        }
+
+    def query_rows(
+        self,
+        columns: List[ColumnDef],
+        query: RowQuery,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> tuple[List[ColumnDef], int]:
+        """
+        Get a range of the rows matching a query, in its sort order, along
+        with the number of matching rows. Sorting uses the stored types, e.g.
+        numbers sort numerically. Raises ColumnNotFoundError for unknown
+        columns and InvalidQueryError for invalid regular expressions.
+        """
+        df = self._to_frame(columns)
+        schema = df.schema
+
+        def display(column_id: str) -> pl.Expr:
+            if column_id not in schema or column_id == "row_id":
+                raise ColumnNotFoundError(f"Column not found: {column_id}")
+            return to_display_expr(pl.col(column_id), schema[column_id])
+
+        conditions = [
+            self._get_condition(display(row_filter["column_id"]), row_filter)
+            for row_filter in query["filters"]
+        ]
+        if query["search"]:
+            search = query["search"].lower()
+            conditions.append(
+                pl.any_horizontal(
+                    display(col["id"])
+                    .str.to_lowercase()
+                    .str.contains(search, literal=True)
+                    for col in columns
+                    if col["id"] != "row_id"
+                )
+            )
+
+        matches = df.lazy()
+        if conditions:
+            matches = matches.filter(*conditions)
+        if query["sort"]:
+            # Checks the sort columns exist
+            for row_sort in query["sort"]:
+                display(row_sort["column_id"])
+            matches = matches.sort(
+                [row_sort["column_id"] for row_sort in query["sort"]],
+                descending=[row_sort["descending"] for row_sort in query["sort"]],
+                nulls_last=True,
+                maintain_order=True,
+            )
+
+        # The count and the page share the filtered plan, it runs once
+        try:
+            count, page = pl.collect_all(
+                [matches.select(pl.len()), matches.slice(offset, limit)]
+            )
+        except pl.exceptions.ComputeError as e:
+            raise InvalidQueryError(f"Invalid query: {e}")
+
+        return [
+            {**col, "data": page.get_column(col["id"]).to_list()} for col in columns
+        ], count.item()
+
+    def _get_condition(self, values: pl.Expr, row_filter: RowFilter) -> pl.Expr:
+        operator = row_filter["operator"]
+        if operator == FilterOperator.IS_NULL:
+            return values.is_null()
+        if operator == FilterOperator.IS_NOT_NULL:
+            return values.is_not_null()
+        if operator == FilterOperator.EQUALS:
+            return values == row_filter["value"]
+        if operator == FilterOperator.CONTAINS:
+            return values.str.to_lowercase().str.contains(
+                row_filter["value"].lower(), literal=True
+            )
+        return values.str.contains(row_filter["value"])
+
+    @staticmethod
+    def _to_frame(columns: List[ColumnDef]) -> pl.DataFrame:
+        """Build a DataFrame of the columns with the types they are stored as"""
+        table = pa.Table.from_arrays(
+            [to_column_array(col["id"], col["data"]) for col in columns],
+            names=[col["id"] for col in columns],
+        )
+        # Dictionary encoded columns compare and sort as plain strings
+        return pl.from_arrow(table).with_columns(pl.col(pl.Categorical).cast(pl.Utf8))
@@ -0,0 +1,835 @@
+import json
+import secrets
+import tempfile
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from enum import StrEnum
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+
+from .backends import (
+    ObjectNotFoundError,
+    PreconditionFailedError,
+    StorageBackend,
+)
+from .cache import DatasetCache
+from .column_types import ARROW_TYPES, ColumnType, to_display_value
+from .compression import decode_json, get_json, put_json
+from .dictionary import DictionaryData
+from .types import ColumnDef, Column, Manifest, ManifestColumn
+
+T = TypeVar("T")
+
+# Settings of the Parquet objects the engines write
+PARQUET_COMPRESSION = "zstd"
+PARQUET_ROW_GROUP_SIZE = 10_000
+# Estimated Python overhead of a decoded cell (str object and list slot), for
+# the cached size of a dataset
+CELL_OVERHEAD_BYTES = 57
+
+
+class StorageEngine(StrEnum):
+    # Whole dataset serialized as a single JSON document
+    V1 = "v1"
+    # Columnar Parquet file, zstd compressed and readable column by column
+    V2 = "v2"
+    # One Parquet object per column, listed in a JSON manifest
+    V3 = "v3"
+
+
+def select_columns(
+    columns: List[T],
+    column_ids: Optional[Collection[str]],
+    get_id: Callable[[T], str] = lambda col: col["id"],
+) -> List[T]:
+    """
+    Keep the columns with the given IDs, in stored order, or all of them when
+    column_ids is None. Unknown IDs are skipped by every engine.
+    """
+    if column_ids is None:
+        return columns
+    return [col for col in columns if get_id(col) in column_ids]
+
+
+def copy_columns(
+    columns: List[ColumnDef], column_ids: Optional[List[str]] = None
+) -> List[ColumnDef]:
+    """Copy columns, optionally only the given IDs, so callers can mutate them"""
+    return [
+        # Dictionary encoded data is read-only and can be shared
+        {
+            **col,
+            "data": col["data"]
+            if isinstance(col["data"], DictionaryData)
+            else list(col["data"]),
+        }
+        for col in select_columns(columns, column_ids)
+    ]
+
+
+def slice_rows(
+    columns: List[ColumnDef], offset: int, limit: Optional[int]
+) -> tuple[List[ColumnDef], int]:
+    """Slice a range of rows out of columns, returning them with the total row count"""
+    total = len(columns[0]["data"]) if columns else 0
+    end = total if limit is None else offset + limit
+    return [{**col, "data": col["data"][offset:end]} for col in columns], total
+
+
+def get_changed_columns(
+    original_columns: List[ColumnDef], columns: List[ColumnDef]
+) -> List[ColumnDef]:
+    """Get the columns that were added or modified compared to the originals"""
+    originals = {col["id"]: col for col in original_columns}
+    return [col for col in columns if originals.get(col["id"]) != col]
+
+
+def to_string_array(values: List) -> pa.Array:
+    """Convert values to an Arrow string array, stringifying non-string values"""
+    try:
+        return pa.array(values, type=pa.string())
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        # Values set through transformations are not guaranteed to be strings
+        return pa.array(
+            [to_display_value(val) for val in values],
+            type=pa.string(),
+        )
+
+
+def to_typed_array(values: List) -> pa.Array:
+    """
+    Convert values to an Arrow array of the column type they all have, falling
+    back to strings for columns of mixed or unsupported types
+    """
+    try:
+        array = pa.array(values)
+    except (pa.ArrowTypeError, pa.ArrowInvalid, OverflowError):
+        return to_string_array(values)
+    if array.type in STORED_TYPES:
+        return array
+    return to_string_array(values)
+
+
+DICTIONARY_TYPE = pa.dictionary(pa.int32(), pa.string())
+STORED_TYPES = frozenset(ARROW_TYPES.values())
+
+
+def get_column_type(
+    column_id: str,
+    dictionary: bool = False,
+    column_type: ColumnType = ColumnType.STRING,
+) -> pa.DataType:
+    """
+    Row IDs are stored as packed integers, every other column as its
+    `column_type`, string columns dictionary encoded when `dictionary` is set
+    """
+    if column_id == "row_id":
+        return pa.uint32()
+    if column_type != ColumnType.STRING:
+        return ARROW_TYPES[column_type]
+    return DICTIONARY_TYPE if dictionary else pa.string()
+
+
+def to_column_array(column_id: str, values: Sequence) -> pa.Array:
+    """Convert a column's values to the Arrow array it is stored as"""
+    if isinstance(values, DictionaryData):
+        return values.to_arrow()
+    if column_id == "row_id":
+        try:
+            return pa.array(values, type=pa.uint32())
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            # Datasets ingested before integer row IDs keep their UUIDs
+            return to_string_array(values)
+    return to_typed_array(values)
+
+
+def read_row_range(
+    parquet_file: pq.ParquetFile, start: int, end: int, column_ids: List[str]
+) -> dict[str, List]:
+    """Read rows [start, end) of columns, fetching only the overlapping row groups"""
+    if not column_ids:
+        return {}
+
+    row_groups = []
+    first_row = 0
+    group_start = 0
+    for index in range(parquet_file.num_row_groups):
+        group_end = group_start + parquet_file.metadata.row_group(index).num_rows
+        if group_start < end and group_end > start:
+            if not row_groups:
+                first_row = group_start
+            row_groups.append(index)
+        group_start = group_end
+
+    if not row_groups:
+        return {col_id: [] for col_id in column_ids}
+
+    table = parquet_file.read_row_groups(row_groups, columns=column_ids)
+    table = table.slice(start - first_row, end - start)
+    return {col_id: table.column(col_id).to_pylist() for col_id in column_ids}
+
+
+class BaseStorageEngine(ABC):
+    """Reads and writes the data object of a dataset in a given format"""
+
+    filename: str
+
+    def __init__(self, backend: StorageBackend, cache: Optional[DatasetCache] = None):
+        self.backend = backend
+        self.cache = cache
+
+    def _get_key(self, path: str) -> str:
+        return f"{path}/{self.filename}"
+
+    @abstractmethod
+    def read(
+        self, path: str, column_ids: Optional[List[str]] = None
+    ) -> List[ColumnDef]:
+        pass
+
+    @abstractmethod
+    def write(self, path: str, columns: List[ColumnDef]):
+        pass
+
+    def write_batches(
+        self,
+        path: str,
+        column_defs: List[Column],
+        batches: Iterable[pl.DataFrame],
+        dictionary_column_ids: Collection[str] = (),
+        column_types: Optional[Dict[str, ColumnType]] = None,
+    ):
+        """
+        Write a dataset from DataFrames with one column per column ID. Engines
+        storing typed columns store them as `column_types` and dictionary
+        encode `dictionary_column_ids`.
+        """
+        frames = list(batches)
+        df = pl.concat(frames) if frames else None
+        self.write(
+            path,
+            [
+                {
+                    **col,
+                    "data": df.get_column(col["id"]).to_list()
+                    if df is not None
+                    else [],
+                }
+                for col in column_defs
+            ],
+        )
+
+    def update(
+        self, path: str, update: Callable[[List[ColumnDef]], List[ColumnDef]]
+    ) -> tuple[List[ColumnDef], str]:
+        """
+        Apply `update` to the columns of a dataset and save the changes,
+        returning the updated columns and the version saved
+        """
+        columns = self.read(path)
+        original_columns = copy_columns(columns)
+        columns = update(columns)
+        self.write_changes(
+            path, columns, get_changed_columns(original_columns, columns)
+        )
+        # Looked up after the write, datasets are migrated off the engines
+        # relying on this before they are updated
+        return columns, self.get_version(path)
+
+    def write_changes(
+        self,
+        path: str,
+        columns: List[ColumnDef],
+        changed_columns: List[ColumnDef],
+    ):
+        """
+        Save an updated dataset. `changed_columns` are the columns that were
+        added or modified, engines able to store them alone skip the others.
+        """
+        self.write(path, columns)
+
+    def read_rows(
+        self,
+        path: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        column_ids: Optional[List[str]] = None,
+    ) -> tuple[List[ColumnDef], int]:
+        """Read a range of rows, returning the columns and the total row count"""
+        return slice_rows(self.read(path, column_ids), offset, limit)
+
+    def get_version(self, path: str) -> str:
+        """
+        Get a version of the dataset that changes on every write, without
+        reading it. Raises ObjectNotFoundError when there is no dataset.
+        """
+        return self.backend.head(self._get_key(path))
+
+    def get_column_versions(self, path: str) -> Dict[str, str]:
+        """
+        Get a version of each column that changes whenever its data is
+        written. Columns stored together share the version of the dataset.
+        """
+        version = self.get_version(path)
+        return {col["id"]: version for col in self.read_column_defs(path)}
+
+    def read_column_defs(self, path: str) -> List[Column]:
+        """Read the column definitions without their data"""
+        return [
+            {
+                "id": col["id"],
+                "label": col["label"],
+                "classification": col["classification"],
+            }
+            for col in self.read(path)
+        ]
+
+    def delete(self, path: str):
+        self.backend.delete([self._get_key(path)])
+        if self.cache is not None:
+            self.cache.invalidate(self._get_key(path))
+
+    def _get_object_body(self, path: str) -> bytes:
+        return self.backend.get(self._get_key(path)).body.read()
+
+
+class JSONStorageEngine(BaseStorageEngine):
+    """Legacy engine storing the full list of columns as data.json"""
+
+    filename = "data.json"
+
+    def read(
+        self, path: str, column_ids: Optional[List[str]] = None
+    ) -> List[ColumnDef]:
+        return select_columns(get_json(self.backend, self._get_key(path)), column_ids)
+
+    def write(self, path: str, columns: List[ColumnDef]):
+        put_json(self.backend, self._get_key(path), columns)
+
+
+class ParquetStorageEngine(BaseStorageEngine):
+    """
+    Legacy engine storing each column as a Parquet column named after the
+    column ID. Labels and classifications are kept in the schema metadata so
+    the column definitions can be restored without a separate object.
+    Datasets are migrated off it to ColumnStorageEngine when accessed.
+
+    Updates used to be appended to a journal next to this snapshot, one
+    small Parquet object per update holding only the columns it changed.
+    Reads still replay the entries the snapshot doesn't include, so datasets
+    migrate with them.
+    """
+
+    filename = "data.parquet"
+    columns_metadata_key = b"columns"
+    # Last journal entry included in a snapshot
+    journal_seq_metadata_key = b"journal_seq"
+    # Column order after a journal entry
+    order_metadata_key = b"order"
+
+    journal_dirname = "journal"
+
+    def read(
+        self, path: str, column_ids: Optional[List[str]] = None
+    ) -> List[ColumnDef]:
+        snapshot = self._read_table(self._get_key(path))
+        columns = self.table_to_columns(snapshot)
+        # Snapshots written before the journal existed have no entries
+        journal_seq = int(
+            (snapshot.schema.metadata or {}).get(self.journal_seq_metadata_key, 0)
+        )
+        for seq, key in self._list_journal(path):
+            if seq <= journal_seq:
+                continue
+            entry = self._read_table(key)
+            by_id = {col["id"]: col for col in columns}
+            by_id.update((col["id"], col) for col in self.table_to_columns(entry))
+            order = json.loads(entry.schema.metadata[self.order_metadata_key])
+            columns = [by_id[col_id] for col_id in order]
+        return select_columns(columns, column_ids)
+
+    def write(self, path: str, columns: List[ColumnDef]):
+        """Write a snapshot, which replaces the whole journal"""
+        self._delete_journal(path)
+        sink = pa.BufferOutputStream()
+        pq.write_table(
+            self.columns_to_table(columns),
+            sink,
+            compression=PARQUET_COMPRESSION,
+            row_group_size=PARQUET_ROW_GROUP_SIZE,
+        )
+        self.backend.put(self._get_key(path), sink.getvalue().to_pybytes())
+
+    def delete(self, path: str):
+        super().delete(path)
+        self._delete_journal(path)
+
+    def _read_table(self, key: str) -> pa.Table:
+        body = self.backend.get(key).body.read()
+        return pq.ParquetFile(pa.BufferReader(body)).read()
+
+    def _list_journal(self, path: str) -> List[tuple[int, str]]:
+        """The sequence numbers and keys of the journal entries, in order"""
+        prefix = f"{path}/{self.journal_dirname}/"
+        return sorted(
+            (int(obj.key[len(prefix) :].split(".", 1)[0]), obj.key)
+            for obj in self.backend.list(prefix)
+        )
+
+    def _delete_journal(self, path: str):
+        keys = [key for _, key in self._list_journal(path)]
+        if keys:
+            self.backend.delete(keys)
+
+    @classmethod
+    def columns_to_table(cls, columns: List[ColumnDef]) -> pa.Table:
+        column_defs = [
+            {
+                "id": col["id"],
+                "label": col["label"],
+                "classification": col["classification"],
+            }
+            for col in columns
+        ]
+        table = pa.table(
+            {col["id"]: to_column_array(col["id"], col["data"]) for col in columns}
+        )
+        return table.replace_schema_metadata(
+            {cls.columns_metadata_key: json.dumps(column_defs)}
+        )
+
+    @classmethod
+    def table_to_columns(cls, table: pa.Table) -> List[ColumnDef]:
+        column_defs = json.loads(table.schema.metadata[cls.columns_metadata_key])
+        return [
+            {**col, "data": table.column(col["id"]).to_pylist()}
+            for col in column_defs
+            if col["id"] in table.column_names
+        ]
+
+
+class ColumnStorageEngine(BaseStorageEngine):
+    """
+    Stores the data of each column as its own single-column Parquet object,
+    listed with the column definitions and order in a JSON manifest.
+    Removing a column only rewrites the manifest, changing one rewrites a
+    single object, and reads fetch just the columns they need in parallel.
+
+    Column objects are never modified: changed columns are written under a
+    new version and the manifest, written last, switches to them. Manifest
+    writes during updates are conditional, so concurrent updates are retried
+    instead of overwriting each other.
+    """
+
+    filename = "manifest.json"
+    columns_dirname = "columns"
+    update_attempts = 5
+    # Reads racing an update are retried with the new manifest
+    read_attempts = 3
+
+    io_executor = ThreadPoolExecutor(
+        max_workers=settings.STORAGE_MAX_CONCURRENCY, thread_name_prefix="column-io"
+    )
+
+    def read(
+        self, path: str, column_ids: Optional[List[str]] = None
+    ) -> List[ColumnDef]:
+        columns, _ = self.read_rows(path, column_ids=column_ids)
+        return columns
+
+    def read_rows(
+        self,
+        path: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        column_ids: Optional[List[str]] = None,
+    ) -> tuple[List[ColumnDef], int]:
+        """
+        Read a range of rows of the given columns. Whole columns are fetched
+        with a single GET and cached, ranges only read the overlapping row
+        groups of columns that aren't cached.
+        """
+        for _ in range(self.read_attempts):
+            manifest = self._read_manifest(path)
+            manifest_columns = select_columns(manifest["columns"], column_ids)
+            total = manifest["num_rows"]
+            end = total if limit is None else min(offset + limit, total)
+
+            try:
+                columns = self._read_columns(path, manifest_columns, offset, end, total)
+            except ObjectNotFoundError:
+                # Replaced by an update after the manifest was read
+                continue
+            return columns, total
+
+        raise RuntimeError(f"Could not read a consistent manifest of {path}")
+
+    def read_column_defs(self, path: str) -> List[Column]:
+        """Read the column definitions from the manifest only"""
+        return [
+            {
+                "id": col["id"],
+                "label": col["label"],
+                "classification": col["classification"],
+            }
+            for col in self._read_manifest(path)["columns"]
+        ]
+
+    def get_column_versions(self, path: str) -> Dict[str, str]:
+        """Get the version of each column's data object from the manifest"""
+        return {
+            col["id"]: col["version"] for col in self._read_manifest(path)["columns"]
+        }
+
+    def _read_manifest(self, path: str) -> Manifest:
+        if self.cache is None:
+            return get_json(self.backend, self._get_key(path))
+
+        return self.cache.get_object(self.backend, self._get_key(path), decode_json)
+
+    def _get_manifest(self, path: str) -> tuple[Optional[Manifest], Optional[str]]:
+        """Get the current manifest and its ETag, bypassing the cache"""
+        try:
+            manifest_obj = self.backend.get(self._get_key(path))
+        except ObjectNotFoundError:
+            return None, None
+        manifest, _ = decode_json(manifest_obj)
+        return manifest, manifest_obj.etag
+
+    def _get_column_key(self, path: str, column: ManifestColumn) -> str:
+        return (
+            f"{path}/{self.columns_dirname}/{column['id']}/{column['version']}.parquet"
+        )
+
+    def _read_column(
+        self, path: str, column: ManifestColumn, start: int, end: int, total: int
+    ) -> List:
+        key = self._get_column_key(path, column)
+        # Column objects never change, a cached copy needs no revalidation
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            return cached.value[start:end]
+
+        if start > 0 or end < total:
+            parquet_file = pq.ParquetFile(self.backend.open(key))
+            return read_row_range(parquet_file, start, end, [column["id"]])[
+                column["id"]
+            ]
+
+        column_obj = self.backend.get(key)
+        # read_table also handles objects without row groups (empty uploads)
+        table = pq.read_table(pa.BufferReader(column_obj.body.read()))
+        if pa.types.is_dictionary(table.schema.types[0]):
+            data = DictionaryData.from_arrow(table.column(0))
+            # Codes are packed, only the distinct values are Python objects
+            size = data.codes.itemsize * len(data) + CELL_OVERHEAD_BYTES * len(
+                data.dictionary
+            )
+        else:
+            data = table.column(0).to_pylist()
+            size = table.nbytes + table.num_rows * CELL_OVERHEAD_BYTES
+        if self.cache is not None:
+            self.cache.set(key, column_obj.etag, data, size)
+        # Callers may mutate lists, the cached one is kept untouched. Dictionary
+        # encoded data is read-only.
+        return data if isinstance(data, DictionaryData) else list(data)
+
+    def update(
+        self, path: str, update: Callable[[List[ColumnDef]], List[ColumnDef]]
+    ) -> tuple[List[ColumnDef], str]:
+        """
+        Apply `update` and save the changed columns, returning the columns and
+        the ETag of the manifest written. When another update saves the
+        dataset first, it's applied again on top of that update.
+
+        `update` changes a column's data by replacing it, as the column
+        operations do, rather than mutating it in place: a column keeping its
+        data object is unchanged, so it's neither copied to compare it nor
+        written again. Columns whose label or classification alone changed
+        only change in the manifest.
+        """
+        # Decoded column objects by key, a retry only reads the columns the
+        # update it lost to wrote
+        decoded: Dict[str, Sequence] = {}
+        for _ in range(self.update_attempts):
+            manifest, etag = self._get_manifest(path)
+            if manifest is None:
+                raise ObjectNotFoundError("Data not found")
+
+            total = manifest["num_rows"]
+            keys = [self._get_column_key(path, col) for col in manifest["columns"]]
+            unread = [
+                col for col, key in zip(manifest["columns"], keys) if key not in decoded
+            ]
+            try:
+                for col, col_data in zip(
+                    unread,
+                    self._map(
+                        lambda col: self._read_column(path, col, 0, total, total),
+                        unread,
+                    ),
+                ):
+                    decoded[self._get_column_key(path, col)] = col_data
+            except ObjectNotFoundError:
+                continue
+
+            original_data = {
+                col["id"]: decoded[key] for col, key in zip(manifest["columns"], keys)
+            }
+            columns = update(
+                [
+                    {
+                        "id": col["id"],
+                        "label": col["label"],
+                        "classification": col["classification"],
+                        "data": original_data[col["id"]],
+                    }
+                    for col in manifest["columns"]
+                ]
+            )
+            try:
+                version = self._commit(
+                    path,
+                    manifest,
+                    columns,
+                    [
+                        col
+                        for col in columns
+                        if col["data"] is not original_data.get(col["id"])
+                    ],
+                    etag,
+                )
+            except PreconditionFailedError:
+                continue
+            return columns, version
+
+        raise RuntimeError(f"Could not update {path}")
+
+    def _read_columns(
+        self,
+        path: str,
+        manifest_columns: List[ManifestColumn],
+        start: int,
+        end: int,
+        total: int,
+    ) -> List[ColumnDef]:
+        data = self._map(
+            lambda col: self._read_column(path, col, start, end, total),
+            manifest_columns,
+        )
+        return [
+            {
+                "id": col["id"],
+                "label": col["label"],
+                "classification": col["classification"],
+                "data": col_data,
+            }
+            for col, col_data in zip(manifest_columns, data)
+        ]
+
+    def write(self, path: str, columns: List[ColumnDef]):
+        manifest, _ = self._get_manifest(path)
+        self._commit(path, manifest, columns, columns, etag=None)
+
+    def write_changes(
+        self,
+        path: str,
+        columns: List[ColumnDef],
+        changed_columns: List[ColumnDef],
+    ):
+        """Write the changed columns and a manifest pointing at them"""
+        manifest, etag = self._get_manifest(path)
+        if manifest is None:
+            self._commit(path, None, columns, columns, etag=None)
+        else:
+            self._commit(path, manifest, columns, changed_columns, etag)
+
+    def write_batches(
+        self,
+        path: str,
+        column_defs: List[Column],
+        batches: Iterable[pl.DataFrame],
+        dictionary_column_ids: Collection[str] = (),
+        column_types: Optional[Dict[str, ColumnType]] = None,
+    ):
+        """
+        Spool each column into its own temporary Parquet file as batches come
+        in, so only one batch is held in memory, then upload them in parallel
+        """
+        column_types = column_types or {}
+        manifest_columns = [
+            {**col, "version": self._new_version()} for col in column_defs
+        ]
+        num_rows = 0
+        with ExitStack() as files:
+            spools = {
+                col["id"]: files.enter_context(tempfile.TemporaryFile())
+                for col in column_defs
+            }
+            with ExitStack() as writers:
+                parquet_writers = {
+                    col_id: writers.enter_context(
+                        pq.ParquetWriter(
+                            spool,
+                            pa.schema(
+                                [
+                                    (
+                                        col_id,
+                                        get_column_type(
+                                            col_id,
+                                            col_id in dictionary_column_ids,
+                                            column_types.get(col_id, ColumnType.STRING),
+                                        ),
+                                    )
+                                ]
+                            ),
+                            compression=PARQUET_COMPRESSION,
+                        )
+                    )
+                    for col_id, spool in spools.items()
+                }
+                for batch in batches:
+                    num_rows += len(batch)
+                    for col_id, writer in parquet_writers.items():
+                        writer.write_table(
+                            pa.table(
+                                {col_id: batch.get_column(col_id).to_arrow()}
+                            ).cast(writer.schema),
+                            row_group_size=PARQUET_ROW_GROUP_SIZE,
+                        )
+
+            def upload(column: ManifestColumn):
+                spool = spools[column["id"]]
+                spool.seek(0)
+                self.backend.put_file(self._get_column_key(path, column), spool)
+
+            self._map(upload, manifest_columns)
+
+        self._write_manifest(
+            path, {"num_rows": num_rows, "columns": manifest_columns}, etag=None
+        )
+
+    def _commit(
+        self,
+        path: str,
+        manifest: Optional[Manifest],
+        columns: List[ColumnDef],
+        changed_columns: List[ColumnDef],
+        etag: Optional[str],
+    ) -> str:
+        """
+        Write new versions of the changed columns, then the manifest, and
+        return the manifest's ETag. Other columns keep their objects, with
+        the label and classification of `columns`. Objects no longer
+        referenced are deleted once the manifest is written, and the new ones
+        if it couldn't be.
+        """
+        previous_columns = (
+            {col["id"]: col for col in manifest["columns"]} if manifest else {}
+        )
+        written_columns = {
+            col["id"]: {
+                "id": col["id"],
+                "label": col["label"],
+                "classification": col["classification"],
+                "version": self._new_version(),
+            }
+            for col in changed_columns
+        }
+        self._map(
+            lambda col: self._write_column(
+                path, written_columns[col["id"]], col["data"]
+            ),
+            changed_columns,
+        )
+
+        new_manifest: Manifest = {
+            "num_rows": len(columns[0]["data"]) if columns else 0,
+            "columns": [
+                written_columns.get(col["id"])
+                or {
+                    **previous_columns[col["id"]],
+                    "label": col["label"],
+                    "classification": col["classification"],
+                }
+                for col in columns
+            ],
+        }
+        try:
+            version = self._write_manifest(path, new_manifest, etag)
+        except BaseException:
+            self._delete_columns(path, list(written_columns.values()))
+            raise
+
+        current_keys = {
+            self._get_column_key(path, col) for col in new_manifest["columns"]
+        }
+        self._delete_columns(
+            path,
+            [
+                col
+                for col in previous_columns.values()
+                if self._get_column_key(path, col) not in current_keys
+            ],
+        )
+        return version
+
+    def _write_column(self, path: str, column: ManifestColumn, data: Sequence):
+        sink = pa.BufferOutputStream()
+        pq.write_table(
+            pa.table({column["id"]: to_column_array(column["id"], data)}),
+            sink,
+            compression=PARQUET_COMPRESSION,
+            row_group_size=PARQUET_ROW_GROUP_SIZE,
+        )
+        self.backend.put(
+            self._get_column_key(path, column), sink.getvalue().to_pybytes()
+        )
+
+    def _write_manifest(
+        self, path: str, manifest: Manifest, etag: Optional[str]
+    ) -> str:
+        # Only replace the manifest the update was based on
+        try:
+            return put_json(self.backend, self._get_key(path), manifest, if_match=etag)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate(self._get_key(path))
+
+    def _delete_columns(self, path: str, columns: List[ManifestColumn]):
+        keys = [self._get_column_key(path, col) for col in columns]
+        self._delete_keys(keys)
+
+    def _delete_keys(self, keys: List[str]):
+        self.backend.delete(keys)
+        if self.cache is not None:
+            for key in keys:
+                self.cache.invalidate(key)
+
+    def delete(self, path: str):
+        super().delete(path)
+        prefix = f"{path}/{self.columns_dirname}/"
+        self._delete_keys([obj.key for obj in self.backend.list(prefix)])
+
+    def _map(self, func: Callable[[Any], T], items: List) -> List[T]:
+        """Run func over items on the I/O pool, re-raising the first error"""
+        return list(self.io_executor.map(func, items))
+
+    @staticmethod
+    def _new_version() -> str:
+        return secrets.token_hex(8)
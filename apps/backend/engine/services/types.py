@@ -1,4 +1,8 @@
-from typing import TypedDict, Optional, Dict, List, Any
+from typing import TypedDict, Optional, Dict, List, Any, Sequence, Union
+
+# Row IDs are integers numbered at ingest. Datasets ingested before that keep
+# their UUID strings.
+RowId = Union[int, str]
 
 
 class Metadata(TypedDict):
@@ -11,7 +15,8 @@ class ColumnDef(TypedDict):
     id: str
     label: str
     classification: Optional[str]
-    data: List[Any]
+    # A list, or DictionaryData for dictionary encoded columns
+    data: Sequence[Any]
 
 
 class Column(TypedDict):
@@ -21,5 +26,76 @@ class Column(TypedDict):
 
 
 class Row(TypedDict):
-    id: str
+    id: RowId
     data: Dict[str, str]
+
+
+class CatalogEntry(TypedDict):
+    uuid: str
+    original_filename: Optional[str]
+    dataset_type: Optional[str]
+    created_at: Optional[str]
+
+
+class Catalog(TypedDict):
+    files: Dict[str, CatalogEntry]
+
+
+class ManifestColumn(TypedDict):
+    id: str
+    label: str
+    classification: Optional[str]
+    # Version of the column's data object
+    version: str
+
+
+class Manifest(TypedDict):
+    num_rows: int
+    columns: List[ManifestColumn]
+
+
+class RowFilter(TypedDict):
+    column_id: str
+    # One of the FilterOperator values
+    operator: str
+    # Compared with values as displayed, unused by null checks
+    value: Optional[str]
+
+
+class RowSort(TypedDict):
+    column_id: str
+    descending: bool
+
+
+class RowQuery(TypedDict):
+    filters: List[RowFilter]
+    sort: List[RowSort]
+    # Case-insensitive text matched against every column
+    search: Optional[str]
+
+
+class ValueCount(TypedDict):
+    value: str
+    count: int
+
+
+class PatternCount(TypedDict):
+    # Values with uppercase letters, lowercase letters and digits collapsed
+    # into "A", "a" and "9"
+    pattern: str
+    count: int
+
+
+class ColumnStats(TypedDict):
+    # Non-null values
+    count: int
+    null_count: int
+    # Approximate count of the distinct non-null values
+    distinct_count: int
+    min_length: Optional[int]
+    max_length: Optional[int]
+    # Most frequent values and patterns first
+    top_values: List[ValueCount]
+    patterns: List[PatternCount]
+    # Version of the column data they were computed from
+    version: str
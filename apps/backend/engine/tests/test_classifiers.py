@@ -0,0 +1,76 @@
+import random
+
+import polars as pl
+from django.test import SimpleTestCase
+
+from engine.services.column_processor import (
+    ALL_CLASSIFIERS,
+    PersonFirstNameClassifier,
+)
+
+
+def generate_values() -> list[str]:
+    """Latin letters in word contexts, and random names, emails and URLs"""
+    values = ["Ayşe-ılkay", "ŉ", "O'Brien", "mc-donald"]
+    for code in range(0x20, 0x250):
+        char = chr(code)
+        values.extend(
+            template.format(char)
+            for template in ("{}", "a{}", "{}a", "a-{}b", "a.{}", "x {}", "1{}")
+        )
+
+    rng = random.Random(0)
+    alphabet = "abcxyzABCXYZ019 .-_'@/:?#&,\t\nßıİŉſşéÉÆæøΣσςñ"
+    pieces = [
+        "http://",
+        "https://",
+        "www.",
+        "@gmail.com",
+        ".com",
+        "/path/",
+        " Inc",
+        " LLC",
+        " Ltd.",
+        " GmbH",
+        "linkedin.com/in/",
+        "twitter.com/",
+    ]
+    for _ in range(5000):
+        values.append(
+            "".join(
+                rng.choice(pieces) if rng.random() < 0.3 else rng.choice(alphabet)
+                for _ in range(rng.randint(1, 12))
+            )
+        )
+    return list(dict.fromkeys(values))
+
+
+class TransformExprTests(SimpleTestCase):
+    def test_matches_transform(self):
+        values = generate_values()
+        for classifier_class in ALL_CLASSIFIERS:
+            classifier = classifier_class(column_id="column")
+            expr = classifier.transform_expr(pl.col("value"))
+            if expr is None:
+                continue
+            with self.subTest(classifier=classifier_class.__name__):
+                results = classifier._transform_vectorized(values, expr)
+                self.assertEqual(
+                    [
+                        (value, result)
+                        for value, result in zip(values, results)
+                        if result is not None
+                    ],
+                    [
+                        (value, classifier.transform(value))
+                        for value, result in zip(values, results)
+                        if result is not None
+                    ],
+                )
+
+    def test_names_title_cased_before_cleaning(self):
+        classifier = PersonFirstNameClassifier(column_id="column")
+        self.assertEqual(
+            classifier.transform_values(["Ayşe-ılkay", "ŉ"]),
+            ["Ayşeilkay", "ʼN"],
+        )
@@ -0,0 +1,145 @@
+import copy
+import random
+
+from django.test import SimpleTestCase
+
+from engine.services.base import ColumnNotFoundError
+from engine.services.column_processor import (
+    ClassifierId,
+    ColumnOperationService,
+    OperationPlan,
+    RemoveColumnOperation,
+    TransformColumnOperation,
+)
+from engine.services.dictionary import DictionaryData
+
+VALUES = [
+    "Ada Lovelace",
+    " ada@EXAMPLE.com ",
+    "example.com/path/",
+    "ACME Inc.",
+    "o'brien",
+    "1.5",
+    None,
+    "",
+]
+
+
+class OperationPlanTests(SimpleTestCase):
+    def setUp(self):
+        self.service = ColumnOperationService()
+        rng = random.Random(0)
+        self.columns = [
+            {
+                "id": f"col_{index}",
+                "label": f"Column {index}",
+                "classification": None,
+                "data": [rng.choice(VALUES) for _ in range(50)],
+            }
+            for index in range(4)
+        ]
+        self.columns[3]["data"] = DictionaryData.encode(self.columns[3]["data"])
+
+    def create(self, action, column_id, **kwargs):
+        return self.service.create_operation(action, column_id=column_id, **kwargs)
+
+    def apply_both(self, operation_args):
+        """Apply operations one by one and planned, each to its own columns"""
+        results = []
+        for planned in (False, True):
+            columns = copy.deepcopy(self.columns)
+            operations = [
+                self.create(*args, **kwargs) for args, kwargs in operation_args
+            ]
+            try:
+                if planned:
+                    columns = self.service.apply_operations(columns, operations)
+                else:
+                    for operation in operations:
+                        columns = operation.apply(columns)
+            except ColumnNotFoundError:
+                results.append(ColumnNotFoundError)
+                continue
+            # Columns added by splitting names get random IDs
+            results.append(
+                [
+                    (
+                        col["label"],
+                        col["classification"],
+                        col["id"] if col["id"].startswith("col_") else None,
+                        list(col["data"]),
+                    )
+                    for col in columns
+                ]
+            )
+        return results
+
+    def test_drops_operations_on_removed_columns(self):
+        plan = OperationPlan(
+            [
+                self.create("update_column_values", "col_0", updates={"1.5": "2"}),
+                self.create(
+                    "classify_column",
+                    "col_0",
+                    classification=ClassifierId.PERSON_EMAIL.value,
+                ),
+                self.create("remove_column", "col_0"),
+            ]
+        )
+
+        self.assertEqual(len(plan.steps), 1)
+        self.assertIsInstance(plan.steps[0], RemoveColumnOperation)
+
+    def test_fuses_transforms_of_a_column(self):
+        plan = OperationPlan(
+            [
+                self.create("update_column_values", "col_0", updates={"1.5": "2"}),
+                self.create("remove_column", "col_1"),
+                self.create(
+                    "classify_column",
+                    "col_0",
+                    classification=ClassifierId.PERSON_EMAIL.value,
+                ),
+                self.create(
+                    "classify_column",
+                    "col_2",
+                    classification=ClassifierId.PERSON_NAME.value,
+                ),
+            ]
+        )
+
+        self.assertEqual(
+            [type(step) for step in plan.steps],
+            [TransformColumnOperation, RemoveColumnOperation, type(plan.steps[2])],
+        )
+        self.assertEqual(len(plan.steps[0].operations), 2)
+        self.assertNotIsInstance(plan.steps[2], TransformColumnOperation)
+
+    def test_matches_sequential_application(self):
+        rng = random.Random(0)
+        classifications = [
+            ClassifierId.PERSON_NAME.value,
+            ClassifierId.PERSON_FIRST_NAME.value,
+            ClassifierId.PERSON_EMAIL.value,
+            ClassifierId.COMPANY_NAME.value,
+            ClassifierId.COMPANY_WEBSITE.value,
+        ]
+        for batch in range(200):
+            operation_args = []
+            for _ in range(rng.randint(1, 6)):
+                column_id = f"col_{rng.randrange(4)}"
+                action = rng.choice(
+                    ["remove_column", "classify_column", "update_column_values"]
+                )
+                if action == "classify_column":
+                    kwargs = {"classification": rng.choice(classifications)}
+                elif action == "update_column_values":
+                    value = rng.choice([v for v in VALUES if v])
+                    kwargs = {"updates": {value: rng.choice(VALUES[:5])}}
+                else:
+                    kwargs = {}
+                operation_args.append(((action, column_id), kwargs))
+
+            with self.subTest(batch=batch):
+                sequential, planned = self.apply_both(operation_args)
+                self.assertEqual(planned, sequential)
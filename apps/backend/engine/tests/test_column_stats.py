@@ -0,0 +1,48 @@
+import polars as pl
+from django.test import SimpleTestCase
+
+from engine.services.column_stats import TOP_SUMMARY_SIZE, ColumnProfile
+
+
+class ColumnProfileTests(SimpleTestCase):
+    def test_batches_are_merged(self):
+        profile = ColumnProfile(["a"])
+        profile.update(pl.DataFrame({"a": ["x", "y", None]}))
+        profile.update(pl.DataFrame({"a": ["x", "Zz1"]}))
+
+        stats = profile.result()["a"]
+        self.assertEqual(
+            {key: stats[key] for key in ("count", "null_count", "distinct_count")},
+            {"count": 4, "null_count": 1, "distinct_count": 3},
+        )
+        self.assertEqual((stats["min_length"], stats["max_length"]), (1, 3))
+        self.assertEqual(
+            stats["top_values"],
+            [
+                {"value": "x", "count": 2},
+                {"value": "Zz1", "count": 1},
+                {"value": "y", "count": 1},
+            ],
+        )
+        self.assertEqual(
+            stats["patterns"],
+            [{"pattern": "a", "count": 3}, {"pattern": "Aa9", "count": 1}],
+        )
+
+    def test_state_is_bounded_as_rows_grow(self):
+        profile = ColumnProfile(["a"])
+        batches = 5
+        for batch in range(batches):
+            start = batch * TOP_SUMMARY_SIZE
+            values = [str(value) for value in range(start, start + TOP_SUMMARY_SIZE)]
+            profile.update(pl.DataFrame({"a": values}))
+
+        self.assertEqual(profile.top_values["a"].collect().height, TOP_SUMMARY_SIZE)
+        stats = profile.result()["a"]
+        self.assertEqual(stats["count"], batches * TOP_SUMMARY_SIZE)
+        # HyperLogLog estimates are within a few percent
+        self.assertAlmostEqual(
+            stats["distinct_count"],
+            batches * TOP_SUMMARY_SIZE,
+            delta=batches * TOP_SUMMARY_SIZE * 0.03,
+        )
@@ -0,0 +1,62 @@
+import datetime
+import random
+import struct
+
+import polars as pl
+from django.test import SimpleTestCase
+
+from engine.services.column_types import (
+    format_float,
+    to_display_expr,
+    to_display_value,
+)
+
+
+class FormatFloatTests(SimpleTestCase):
+    def test_matches_polars(self):
+        rng = random.Random(0)
+        values = [
+            0.00001,
+            0.1 + 0.2,
+            2.0,
+            100.0,
+            1e-7,
+            1e16,
+            1e20,
+            1.5e21,
+            5e-324,
+            -0.0,
+            float("nan"),
+            float("-inf"),
+            *(rng.uniform(-1e6, 1e6) for _ in range(1000)),
+            *(10 ** rng.uniform(-30, 30) for _ in range(1000)),
+            *(struct.unpack("d", rng.randbytes(8))[0] for _ in range(1000)),
+        ]
+        expected = pl.Series(values, dtype=pl.Float64).cast(pl.Utf8).to_list()
+
+        self.assertEqual([format_float(value) for value in values], expected)
+
+    def test_display_value(self):
+        self.assertEqual(to_display_value(0.00001), "0.00001")
+        self.assertEqual(to_display_value(1.5), "1.5")
+
+
+class DisplayExprTests(SimpleTestCase):
+    def test_matches_display_value(self):
+        for values in [
+            [0.00001, 1e-7, 100.0, 1.5e21, float("nan"), None],
+            [1, -5, None],
+            [True, False, None],
+            [datetime.date(2024, 1, 2), None],
+            [datetime.datetime(2024, 1, 2, 3, 4, 5), None],
+            ["a", None],
+        ]:
+            series = pl.Series(values)
+            with self.subTest(dtype=series.dtype):
+                self.assertEqual(
+                    series.to_frame()
+                    .select(to_display_expr(pl.first(), series.dtype))
+                    .to_series()
+                    .to_list(),
+                    [to_display_value(value) for value in values],
+                )
@@ -0,0 +1,192 @@
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from engine.services.column_types import ColumnType, ColumnTypeError
+from engine.services.csv_service import CSVService
+from engine.services.dictionary import DictionaryData
+from engine.services.storage import StorageEngine
+
+from .utils import LocalStorageTestCase
+
+
+class IngestCSVTests(LocalStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.csv_service = CSVService()
+
+    def ingest(self, content: bytes, **kwargs):
+        samples, self.column_stats = self.csv_service.ingest_csv(
+            "user", "file", SimpleUploadedFile("data.csv", content), **kwargs
+        )
+        self.csv_service.save_metadata(
+            "user",
+            "file",
+            {
+                "uuid": "file",
+                "storage_engine": self.csv_service.DEFAULT_STORAGE_ENGINE.value,
+                "original_filename": "data.csv",
+                "user_id": "user",
+            },
+        )
+        return samples
+
+    def test_empty_header(self):
+        samples = self.ingest(b"a,,c\n1,2,3\n4,,6\n")
+
+        self.assertEqual(
+            [col["label"] for col in samples], ["a", "(No name)", "c", "Row ID"]
+        )
+        self.assertEqual(samples[1]["data"], ["2", None])
+        columns = self.csv_service.get_data("user", "file")
+        self.assertEqual(list(columns[1]["data"]), [2, None])
+
+    def test_headers_read_as_patterns(self):
+        samples = self.ingest(b"^a$,*,b\n1,x,y\n2,,z\n")
+
+        self.assertEqual(
+            [(col["label"], col["data"]) for col in samples[:3]],
+            [("^a$", ["1", "2"]), ("*", ["x", None]), ("b", ["y", "z"])],
+        )
+
+    def test_pinned_type_error_names_the_header(self):
+        with self.assertRaisesMessage(ColumnTypeError, "Column b has values"):
+            self.ingest(b"a,b\n1,x\n", pinned_types={"b": ColumnType.INTEGER})
+
+    def test_floats_are_displayed_as_written(self):
+        self.ingest(b"a\n0.00001\n1.5\n0.30000000000000004\n")
+
+        columns, _ = self.csv_service.get_rows("user", "file")
+        self.assertEqual(columns[0]["data"], [0.00001, 1.5, 0.30000000000000004])
+        _, rows = self.csv_service.transform_to_row_format(columns)
+        self.assertEqual(
+            [row["data"][columns[0]["id"]] for row in rows],
+            ["0.00001", "1.5", "0.30000000000000004"],
+        )
+
+    def test_batches_end_between_rows(self):
+        self.csv_service.CSV_BATCH_BYTES = 8
+        samples = self.ingest(b'a,b\n"x\ny",1\n"say ""hi""",2\nz\n')
+
+        self.assertEqual(samples[0]["data"], ["x\ny", 'say "hi"', "z"])
+        self.assertEqual(samples[1]["data"], ["1", "2", None])
+
+    def test_batches_are_typed_and_profiled_together(self):
+        self.csv_service.CSV_BATCH_BYTES = 16
+        # Only the last batch rules out integers for n
+        content = b"n,s\n" + b"".join(
+            f"{i},{'ab'[i % 2]}\n".encode() for i in range(50)
+        )
+        self.ingest(content + b"x,a\n")
+
+        n_stats, s_stats = self.column_stats.values()
+        self.assertEqual((n_stats["count"], n_stats["distinct_count"]), (51, 51))
+        self.assertEqual(
+            s_stats["top_values"],
+            [{"value": "a", "count": 26}, {"value": "b", "count": 25}],
+        )
+        columns = self.csv_service.get_data("user", "file")
+        self.assertEqual(list(columns[0]["data"][:2]), ["0", "1"])
+
+    def test_dictionary_columns_count_distinct_values_across_batches(self):
+        self.csv_service.CSV_BATCH_BYTES = 16
+        self.ingest(
+            b"id,role\n" + b"".join(f"{i},{'ab'[i % 2]}\n".encode() for i in range(60))
+        )
+
+        columns = self.csv_service.get_data("user", "file")
+        self.assertNotIsInstance(columns[0]["data"], DictionaryData)
+        self.assertIsInstance(columns[1]["data"], DictionaryData)
+        self.assertEqual(list(columns[1]["data"][:3]), ["a", "b", "a"])
+
+
+class MigrateStorageTests(LocalStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.csv_service = CSVService()
+        self.columns = [
+            {
+                "id": "name",
+                "label": "Name",
+                "classification": None,
+                "data": ["a", None],
+            },
+            {
+                "id": "row_id",
+                "label": "Row ID",
+                "classification": None,
+                "data": ["5f0d6a9e-row-0", "5f0d6a9e-row-1"],
+            },
+        ]
+
+    def save_legacy(self, storage_engine: StorageEngine):
+        self.csv_service.storage_engines[storage_engine].write(
+            "user/file", self.columns
+        )
+        self.csv_service.save_metadata(
+            "user",
+            "file",
+            {
+                "uuid": "file",
+                "storage_engine": storage_engine.value,
+                "original_filename": "data.csv",
+                "user_id": "user",
+            },
+        )
+
+    def test_migrates_on_read(self):
+        for storage_engine in (StorageEngine.V1, StorageEngine.V2):
+            with self.subTest(storage_engine=storage_engine):
+                self.save_legacy(storage_engine)
+
+                columns = self.csv_service.get_data("user", "file")
+
+                self.assertEqual(
+                    [{**col, "data": list(col["data"])} for col in columns],
+                    self.columns,
+                )
+                metadata = self.csv_service.get_metadata("user", "file")
+                self.assertEqual(metadata["storage_engine"], StorageEngine.V3.value)
+                with self.assertRaises(ValueError):
+                    self.csv_service.storage_engines[storage_engine].read("user/file")
+
+    def test_migrates_journaled_edits(self):
+        self.save_legacy(StorageEngine.V2)
+        legacy_engine = self.csv_service.storage_engines[StorageEngine.V2]
+        table = legacy_engine.columns_to_table(
+            [{**self.columns[0], "label": "Full name"}]
+        )
+        table = table.replace_schema_metadata(
+            {
+                **table.schema.metadata,
+                legacy_engine.order_metadata_key: json.dumps(["name", "row_id"]),
+            }
+        )
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink)
+        self.csv_service.backend.put(
+            "user/file/journal/0000000001.parquet", sink.getvalue().to_pybytes()
+        )
+
+        columns = self.csv_service.get_columns("user", "file")
+
+        self.assertEqual([col["label"] for col in columns], ["Full name"])
+        self.assertEqual(list(self.csv_service.backend.list("user/file/journal/")), [])
+
+    def test_migrates_on_update(self):
+        self.save_legacy(StorageEngine.V2)
+
+        def rename(columns):
+            columns[0]["label"] = "Full name"
+            return columns
+
+        self.csv_service.update_data("user", "file", rename)
+
+        self.assertEqual(
+            [col["label"] for col in self.csv_service.get_columns("user", "file")],
+            ["Full name"],
+        )
+        metadata = self.csv_service.get_metadata("user", "file")
+        self.assertEqual(metadata["storage_engine"], StorageEngine.V3.value)
@@ -0,0 +1,90 @@
+import random
+import zlib
+
+import zstandard
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from engine.middleware import (
+    CompressionMiddleware,
+    ContentEncoding,
+    get_content_encoding,
+)
+
+BODY = b'{"rows": [' + b'{"name": "Ada Lovelace", "id": 1},' * 500 + b"]}"
+
+
+def decompress(content: bytes, encoding: str) -> bytes:
+    if encoding == ContentEncoding.ZSTD:
+        return zstandard.ZstdDecompressor().decompressobj().decompress(content)
+    return zlib.decompress(content, wbits=31)
+
+
+class GetContentEncodingTests(SimpleTestCase):
+    def test_negotiation(self):
+        for accept_encoding, expected in [
+            ("gzip, deflate, br, zstd", ContentEncoding.ZSTD),
+            ("gzip, deflate, br", ContentEncoding.GZIP),
+            ("gzip;q=1.0, zstd;q=0.5", ContentEncoding.GZIP),
+            ("ZSTD;Q=0.8, gzip;q=0.9", ContentEncoding.GZIP),
+            ("*", ContentEncoding.ZSTD),
+            ("zstd;q=0, *", ContentEncoding.GZIP),
+            ("gzip;q=0", None),
+            ("gzip;q=high", None),
+            ("br, identity", None),
+            ("", None),
+        ]:
+            with self.subTest(accept_encoding=accept_encoding):
+                self.assertEqual(get_content_encoding(accept_encoding), expected)
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    def process(self, response, accept_encoding):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_negotiated_encoding(self):
+        for encoding in ContentEncoding:
+            with self.subTest(encoding=encoding):
+                response = HttpResponse(BODY)
+                response["ETag"] = '"version"'
+
+                response = self.process(response, encoding.value)
+
+                self.assertEqual(response["Content-Encoding"], encoding.value)
+                self.assertEqual(response["Vary"], "Accept-Encoding")
+                self.assertEqual(response["ETag"], 'W/"version"')
+                self.assertEqual(int(response["Content-Length"]), len(response.content))
+                self.assertEqual(decompress(response.content, encoding), BODY)
+
+    def test_compresses_streams(self):
+        chunks = [BODY[start : start + 1000] for start in range(0, len(BODY), 1000)]
+        for encoding in ContentEncoding:
+            with self.subTest(encoding=encoding):
+                response = self.process(
+                    StreamingHttpResponse(iter(chunks)), encoding.value
+                )
+
+                self.assertEqual(response["Content-Encoding"], encoding.value)
+                self.assertFalse(response.has_header("Content-Length"))
+                self.assertEqual(
+                    decompress(b"".join(response.streaming_content), encoding), BODY
+                )
+
+    def test_leaves_responses_uncompressed(self):
+        incompressible = random.Random(0).randbytes(4096)
+        for response, accept_encoding in [
+            (HttpResponse(b"{}"), "zstd"),
+            (HttpResponse(BODY), "br"),
+            (HttpResponse(BODY, headers={"Cache-Control": "no-transform"}), "zstd"),
+            (HttpResponse(BODY, headers={"Content-Encoding": "br"}), "zstd"),
+            (HttpResponse(incompressible), "gzip"),
+        ]:
+            content = response.content
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.process(response, accept_encoding)
+
+                self.assertEqual(response.content, content)
+                self.assertNotIn(
+                    response.get("Content-Encoding"), list(ContentEncoding)
+                )
@@ -0,0 +1,37 @@
+from django.test import SimpleTestCase
+
+from engine.services.column_types import to_display_values
+from engine.services.query_service import QueryService
+
+
+class QueryRowsTests(SimpleTestCase):
+    def setUp(self):
+        self.query_service = QueryService()
+        self.columns = [
+            {"id": "row_id", "name": "row_id", "data": [0, 1, 2]},
+            {"id": "col_0", "name": "amount", "data": [0.00001, 1e-7, 2.0]},
+        ]
+
+    def query(self, filters=(), search=None):
+        query = self.query_service.parse_query(
+            {"filters": list(filters), "search": search}
+        )
+        columns, _ = self.query_service.query_rows(self.columns, query)
+        return columns[0]["data"]
+
+    def test_filters_match_displayed_floats(self):
+        displayed = list(to_display_values(self.columns[1]["data"]))
+        self.assertEqual(displayed, ["0.00001", "1e-7", "2.0"])
+
+        for row_id, value in enumerate(displayed):
+            with self.subTest(value=value):
+                self.assertEqual(
+                    self.query(
+                        [{"column_id": "col_0", "operator": "equals", "value": value}]
+                    ),
+                    [row_id],
+                )
+
+    def test_search_matches_displayed_floats(self):
+        self.assertEqual(self.query(search="e-7"), [1])
+        self.assertEqual(self.query(search="0.0000"), [0])
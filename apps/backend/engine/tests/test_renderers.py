@@ -0,0 +1,40 @@
+import datetime
+from decimal import Decimal
+
+import orjson
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+
+from engine.renderers import ORJSONRenderer
+from engine.services.dictionary import DictionaryData
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def render(self, data):
+        return orjson.loads(ORJSONRenderer().render(data))
+
+    def test_serializes_column_data_and_drf_types(self):
+        self.assertEqual(
+            self.render(
+                {
+                    "data": DictionaryData.encode(["a", "b", "a"]),
+                    "tags": frozenset(["x"]),
+                    "price": Decimal("1.10"),
+                    "took": datetime.timedelta(seconds=1.5),
+                    "message": gettext_lazy("Not found."),
+                    "date": datetime.date(2024, 1, 2),
+                }
+            ),
+            {
+                "data": ["a", "b", "a"],
+                "tags": ["x"],
+                "price": "1.10",
+                "took": "1.5",
+                "message": "Not found.",
+                "date": "2024-01-02",
+            },
+        )
+
+    def test_unknown_types_raise(self):
+        with self.assertRaises(TypeError):
+            ORJSONRenderer().render({"value": object()})
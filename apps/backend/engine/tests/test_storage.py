@@ -0,0 +1,67 @@
+from collections import Counter
+from unittest import mock
+
+from engine.services.backends import get_storage_backend
+from engine.services.storage import ColumnStorageEngine
+
+from .utils import LocalStorageTestCase
+
+
+class ColumnStorageEngineTests(LocalStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.engine = ColumnStorageEngine(get_storage_backend())
+        self.engine.write(
+            "data",
+            [
+                {"id": "name", "label": "Name", "classification": None, "data": ["a"]},
+                {"id": "city", "label": "City", "classification": None, "data": ["x"]},
+            ],
+        )
+
+    def test_update_only_writes_replaced_data(self):
+        versions = self.engine.get_column_versions("data")
+
+        def update(columns):
+            columns[0]["label"] = "Full name"
+            columns[1]["data"] = ["y"]
+            return columns
+
+        self.engine.update("data", update)
+
+        new_versions = self.engine.get_column_versions("data")
+        self.assertEqual(new_versions["name"], versions["name"])
+        self.assertNotEqual(new_versions["city"], versions["city"])
+        self.assertEqual(
+            [(col["label"], col["data"]) for col in self.engine.read("data")],
+            [("Full name", ["a"]), ("City", ["y"])],
+        )
+
+    def test_retry_only_reads_columns_written_since(self):
+        read_column = self.engine._read_column
+        reads = Counter()
+
+        def count_reads(path, column, *args):
+            reads[column["id"]] += 1
+            return read_column(path, column, *args)
+
+        def move(columns):
+            columns[1]["data"] = ["z"]
+            return columns
+
+        def rename(columns):
+            if reads["name"] == 1:
+                # Another update saves the dataset first
+                self.engine.update("data", move)
+            columns[0]["label"] = "Full name"
+            return columns
+
+        with mock.patch.object(self.engine, "_read_column", count_reads):
+            self.engine.update("data", rename)
+
+        # Both updates read both columns, the retry only the moved one
+        self.assertEqual(reads, {"name": 2, "city": 3})
+        self.assertEqual(
+            [(col["label"], col["data"]) for col in self.engine.read("data")],
+            [("Full name", ["a"]), ("City", ["z"])],
+        )
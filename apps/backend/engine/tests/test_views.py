@@ -0,0 +1,267 @@
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from engine import views
+from engine.authentication import ClerkUser
+from engine.services import csv_service as csv_service_module
+from engine.services.csv_service import CSVService
+
+from .utils import LocalStorageTestCase
+
+
+class ViewTestCase(LocalStorageTestCase):
+    """Calls views as an authenticated user with a dataset of their own"""
+
+    def setUp(self):
+        super().setUp()
+        self.csv_service = CSVService()
+        self.enterContext(mock.patch.object(views, "csv_service", self.csv_service))
+        self.csv_service.ingest_csv(
+            "user",
+            "file",
+            SimpleUploadedFile("data.csv", b"name,amount\nAda,1.5\nGrace,2\n"),
+        )
+        self.csv_service.save_metadata(
+            "user",
+            "file",
+            {
+                "uuid": "file",
+                "storage_engine": self.csv_service.DEFAULT_STORAGE_ENGINE.value,
+                "original_filename": "data.csv",
+                "user_id": "user",
+            },
+        )
+
+    def request(self, method: str, view, *args, path="/", data=None, **headers):
+        request = getattr(APIRequestFactory(), method)(
+            path, data, format="json", headers=headers
+        )
+        force_authenticate(request, user=ClerkUser("user"))
+        response = view(request, *args)
+        response.render()
+        return response
+
+
+class ETagTests(ViewTestCase):
+    def test_get_csv_not_modified(self):
+        response = self.request("get", views.get_csv, "file")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.request(
+                    "get", views.get_csv, "file", if_none_match=if_none_match
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+                self.assertEqual(response.content, b"")
+
+    def test_get_csv_etag_changes(self):
+        etag = self.request("get", views.get_csv, "file")["ETag"]
+
+        # Another page or shape of the same data
+        response = self.request(
+            "get", views.get_csv, "file", path="/?limit=1", if_none_match=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        self.csv_service.update_data("user", "file", lambda columns: columns[1:])
+        response = self.request("get", views.get_csv, "file", if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_get_metadata_etag_changes(self):
+        response = self.request("get", views.get_metadata, "file")
+        etag = response["ETag"]
+        self.assertEqual(
+            self.request(
+                "get", views.get_metadata, "file", if_none_match=etag
+            ).status_code,
+            304,
+        )
+
+        metadata = self.csv_service.get_metadata("user", "file")
+        self.csv_service.save_metadata("user", "file", {**metadata, "name": "New"})
+        response = self.request("get", views.get_metadata, "file", if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["metadata"]["name"], "New")
+
+    def test_not_found(self):
+        response = self.request("get", views.get_csv, "missing", if_none_match="*")
+        self.assertEqual(response.status_code, 404)
+
+
+class UploadTests(ViewTestCase):
+    def upload(self):
+        request = APIRequestFactory().post(
+            "/",
+            {"file": SimpleUploadedFile("people.csv", b"name\nAda\n")},
+            format="multipart",
+        )
+        force_authenticate(request, user=ClerkUser("user"))
+        return views.upload_csv(request)
+
+    def test_failed_upload_leaves_no_data(self):
+        keys = {obj.key for obj in self.csv_service.backend.list("user/")}
+
+        with mock.patch.object(
+            views.ai_service, "detect_dataset_type", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.upload()
+
+        self.assertEqual(
+            {obj.key for obj in self.csv_service.backend.list("user/")}, keys
+        )
+
+
+class ColumnStatsTests(ViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.column_id = self.csv_service.get_columns("user", "file")[0]["id"]
+
+    def test_profiles_and_saves_missing_stats(self):
+        response = self.request("get", views.get_column_stats, "file", self.column_id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["stats"]["count"], 2)
+        metadata = self.csv_service.get_metadata("user", "file")
+        self.assertEqual(metadata["column_stats"][self.column_id]["count"], 2)
+
+    def test_skips_saving_over_concurrent_writes(self):
+        compute_column_stats = csv_service_module.compute_column_stats
+
+        def compute_during_write(*args):
+            # Another request saves the metadata while the column is profiled
+            metadata = self.csv_service.get_metadata("user", "file")
+            self.csv_service.save_metadata(
+                "user", "file", {**metadata, "dataset_type": "people"}
+            )
+            return compute_column_stats(*args)
+
+        with mock.patch.object(
+            csv_service_module, "compute_column_stats", compute_during_write
+        ):
+            response = self.request(
+                "get", views.get_column_facets, "file", self.column_id
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["distinct_count"], 2)
+        metadata = self.csv_service.get_metadata("user", "file")
+        self.assertEqual(metadata.get("dataset_type"), "people")
+        self.assertNotIn("column_stats", metadata)
+
+
+class ApplyOperationsTests(ViewTestCase):
+    def setUp(self):
+        super().setUp()
+        self.column_ids = [
+            col["id"] for col in self.csv_service.get_columns("user", "file")
+        ]
+
+    def apply(self, operations):
+        return self.request(
+            "post", views.apply_operations, "file", data={"operations": operations}
+        )
+
+    def test_returns_version_written(self):
+        response = self.apply(
+            [
+                {
+                    "action": "update_column_values",
+                    "column_id": self.column_ids[0],
+                    "updates": {"Ada": "Ada Lovelace"},
+                },
+                {"action": "remove_column", "column_id": self.column_ids[1]},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["operations_applied"], 2)
+        self.assertEqual(
+            response.data["version"],
+            self.csv_service.get_data_version("user", "file"),
+        )
+        columns = self.csv_service.get_data("user", "file")
+        self.assertEqual(
+            [(col["id"], list(col["data"])) for col in columns[:-1]],
+            [(self.column_ids[0], ["Ada Lovelace", "Grace"])],
+        )
+
+    def test_invalid_operations(self):
+        column_id = self.column_ids[0]
+        version = self.csv_service.get_data_version("user", "file")
+        for operation in [
+            "remove_column",
+            {"column_id": column_id},
+            {"action": "rename_column", "column_id": column_id},
+            {"action": "remove_column"},
+            {"action": "remove_column", "column_id": 1},
+            {"action": "remove_column", "column_id": column_id, "label": "Name"},
+            {"action": "classify_column", "column_id": column_id},
+            {
+                "action": "classify_column",
+                "column_id": column_id,
+                "classification": "unknown",
+            },
+            {"action": "update_column_values", "column_id": column_id, "updates": []},
+            {
+                "action": "update_column_values",
+                "column_id": column_id,
+                "updates": {"Ada": ["Ada"]},
+            },
+        ]:
+            with self.subTest(operation=operation):
+                # Nothing is saved, not even the valid operations
+                response = self.apply(
+                    [
+                        {"action": "remove_column", "column_id": self.column_ids[1]},
+                        operation,
+                    ]
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.data)
+
+        self.assertEqual(self.csv_service.get_data_version("user", "file"), version)
+
+    def test_unknown_column(self):
+        response = self.apply([{"action": "remove_column", "column_id": "missing"}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_drops_suggestions_without_overwriting_other_writes(self):
+        metadata = self.csv_service.get_metadata("user", "file")
+        metadata["suggestions"] = [
+            {"column_id": column_id} for column_id in self.column_ids
+        ]
+        self.csv_service.save_metadata("user", "file", metadata)
+        backend = self.csv_service.backend
+        backend_get = backend.get
+        manifest_etag = backend.head("user/file/manifest.json")
+
+        def get(key, *args, **kwargs):
+            stored_obj = backend_get(key, *args, **kwargs)
+            if (
+                key == "user/file/metadata.json"
+                and "dataset_type" not in metadata
+                and backend.head("user/file/manifest.json") != manifest_etag
+            ):
+                # Another request saves the metadata once the data is written
+                metadata["dataset_type"] = "people"
+                self.csv_service.save_metadata("user", "file", metadata)
+            return stored_obj
+
+        with mock.patch.object(backend, "get", get):
+            response = self.apply(
+                [{"action": "remove_column", "column_id": self.column_ids[1]}]
+            )
+
+        self.assertEqual(response.status_code, 200)
+        metadata = self.csv_service.get_metadata("user", "file")
+        self.assertEqual(metadata.get("dataset_type"), "people")
+        self.assertEqual(metadata["suggestions"], [{"column_id": self.column_ids[0]}])
@@ -0,0 +1,14 @@
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+
+class LocalStorageTestCase(SimpleTestCase):
+    """Stores datasets on local disk, in a directory of each test's own"""
+
+    def setUp(self):
+        super().setUp()
+        root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(
+            override_settings(STORAGE_BACKEND="local", LOCAL_STORAGE_ROOT=root)
+        )
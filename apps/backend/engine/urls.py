@@ -6,6 +6,7 @@ urlpatterns = [
     path("upload-csv", views.upload_csv, name="upload_csv"),
     path("csv/<str:uuid>", views.get_csv, name="get_csv"),
     path("csv/<str:uuid>/remove-column", views.remove_column, name="remove_column"),
+    path("csv/<str:uuid>/query", views.query_csv, name="query_csv"),
     path(
         "csv/<str:uuid>/update-dataset-type",
         views.update_dataset_type,
@@ -28,11 +29,26 @@ urlpatterns = [
         views.update_column_values,
         name="update_column_values",
     ),
+    path(
+        "csv/<str:uuid>/operations",
+        views.apply_operations,
+        name="apply_operations",
+    ),
     path(
         "csv/<str:uuid>/metadata",
         views.get_metadata,
         name="get_metadata",
     ),
+    path(
+        "csv/<str:uuid>/columns/<str:column_id>/stats",
+        views.get_column_stats,
+        name="get_column_stats",
+    ),
+    path(
+        "csv/<str:uuid>/columns/<str:column_id>/facets",
+        views.get_column_facets,
+        name="get_column_facets",
+    ),
     path(
         "deduplicate/visualize",
         views.visualize_deduplication,
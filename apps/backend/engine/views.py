@@ -2,10 +2,14 @@ from rest_framework.decorators import (
     api_view,
     authentication_classes,
     permission_classes,
+    renderer_classes,
 )
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
+import pyarrow as pa
 from .services.csv_service import CSVService, Metadata
+from .services.types import ColumnDef
 from .services.ai_service import AIService, TokenLimitExceededError
 from .services.base import (
     ColumnNotFoundError,
@@ -14,22 +18,35 @@ from .services.base import (
     DatasetType,
 )
 from .services.column_processor import ColumnOperationService, get_classifier
+from .services.column_stats import TOP_VALUES
+from .services.column_types import ColumnType, ColumnTypeError
 from .services.deduplication_service import DeduplicationService
+from .services.query_service import InvalidQueryError, QueryService
 from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
 from pathlib import Path
 import tempfile
 from rest_framework.permissions import IsAuthenticated
 from .authentication import ClerkJWTAuthentication
+from .renderers import ArrowStreamRenderer
 
 import datetime
+import hashlib
+import json
+from typing import Dict, List, Optional
 from .services.email_service import EmailService
 
 csv_service = CSVService()
 column_operation_service = ColumnOperationService()
 ai_service = AIService()
 deduplication_service = DeduplicationService()
+query_service = QueryService()
 email_service = EmailService()
 
+# Endpoints returning tables can also be requested as an Arrow IPC stream
+TABLE_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, ArrowStreamRenderer]
+
 
 @api_view(["POST"])
 @authentication_classes([ClerkJWTAuthentication])
@@ -42,8 +59,7 @@ def upload_csv(request):
 
     # Check user's paid status from the user instance
     if not request.user.is_paid:
-        file_uuids = csv_service.list_user_files(request.user.id)
-        if len(file_uuids) >= 3:
+        if csv_service.count_user_files(request.user.id) >= 3:
             return Response(
                 {
                     "error": "Free users can only upload up to 3 files. Please upgrade to upload more files."
@@ -51,33 +67,53 @@ def upload_csv(request):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
+    try:
+        pinned_types = _get_pinned_column_types(request)
+    except ValueError:
+        return Response(
+            {
+                "error": "column_types must map column headers to one of: "
+                + ", ".join(ColumnType)
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
     file = request.FILES["file"]
-    df = csv_service.parse_csv(file)
     file_uuid = csv_service.generate_friendly_id(file.name)
 
     # Create metadata with detected dataset type and user information
     metadata: Metadata = {
         "uuid": file_uuid,
-        "storage_engine": "v1",
+        "storage_engine": csv_service.DEFAULT_STORAGE_ENGINE.value,
         "original_filename": file.name,
         "user_id": request.user.id,  # Add user ID to metadata
         "created_at": datetime.datetime.now().isoformat(),
     }
 
-    # Convert DataFrame to column-based format
-    columns = csv_service.convert_df_to_columns(df)
-
-    # Detect dataset type using AI
     try:
-        dataset_type_result = ai_service.detect_dataset_type(columns)
-        metadata["dataset_type"] = dataset_type_result
-    except TokenLimitExceededError:
-        # If too many tokens we don't detect the dataset type
-        metadata["dataset_type"] = None
+        # Stream the CSV into storage, keeping a sample of the rows
+        try:
+            sample_columns, column_stats = csv_service.ingest_csv(
+                request.user.id, file_uuid, file, pinned_types
+            )
+        except ColumnTypeError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        metadata["column_stats"] = column_stats
 
-    # Save data and metadata
-    csv_service.save_data(request.user.id, file_uuid, columns)
-    csv_service.save_metadata(request.user.id, file_uuid, metadata)
+        # Detect dataset type using AI
+        try:
+            dataset_type_result = ai_service.detect_dataset_type(sample_columns)
+            metadata["dataset_type"] = dataset_type_result
+        except TokenLimitExceededError:
+            # If too many tokens we don't detect the dataset type
+            metadata["dataset_type"] = None
+
+        # Save metadata
+        csv_service.save_metadata(request.user.id, file_uuid, metadata)
+    except BaseException:
+        # Data without metadata would never be listed, nor cleaned up later
+        csv_service.delete_dataset(request.user.id, file_uuid)
+        raise
 
     return Response(
         {
@@ -87,26 +123,235 @@ def upload_csv(request):
     )
 
 
+def _get_pinned_column_types(request) -> Dict[str, ColumnType]:
+    """
+    Read the optional column_types field, a JSON object of column header to
+    type, raising ValueError when invalid
+    """
+    column_types = request.data.get("column_types") or {}
+    if isinstance(column_types, str):
+        column_types = json.loads(column_types)
+    if not isinstance(column_types, dict):
+        raise ValueError("column_types must be an object")
+    return {header: ColumnType(type_) for header, type_ in column_types.items()}
+
+
+# Arguments of each action apply_operations accepts, by type
+OPERATION_ARGUMENTS: Dict[str, Dict[str, type]] = {
+    "remove_column": {"column_id": str},
+    "classify_column": {"column_id": str, "classification": str},
+    "update_column_values": {"column_id": str, "updates": dict},
+}
+
+
+def _validate_operation(operation_request):
+    """
+    Check an operation of apply_operations has its action's arguments and
+    no others, raising ValueError when invalid
+    """
+    if not isinstance(operation_request, dict) or not isinstance(
+        operation_request.get("action"), str
+    ):
+        raise ValueError("Each operation must be an object with an action")
+    action = operation_request["action"]
+    if action not in OPERATION_ARGUMENTS:
+        raise ValueError(f"Invalid action: {action}")
+
+    arguments = OPERATION_ARGUMENTS[action]
+    unexpected = sorted(operation_request.keys() - {"action", *arguments})
+    if unexpected:
+        raise ValueError(f"Unexpected arguments for {action}: {', '.join(unexpected)}")
+    for name, argument_type in arguments.items():
+        if not isinstance(operation_request.get(name), argument_type):
+            expected = "an object" if argument_type is dict else "a string"
+            raise ValueError(f"{name} of {action} must be {expected}")
+    if action == "update_column_values" and not all(
+        value is None or isinstance(value, str)
+        for value in operation_request["updates"].values()
+    ):
+        raise ValueError("updates must map values to strings or null")
+
+
+def _get_pagination_params(request) -> tuple[int, Optional[int]]:
+    """Read offset/limit query params, raising ValueError when invalid"""
+    offset = int(request.query_params.get("offset", 0))
+    limit = request.query_params.get("limit")
+    limit = int(limit) if limit is not None else None
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError("offset and limit must be non-negative")
+    return offset, limit
+
+
+def _is_arrow(request) -> bool:
+    return request.accepted_renderer.format == ArrowStreamRenderer.format
+
+
+def _with_metadata(table: pa.Table, metadata: dict) -> pa.Table:
+    """Attach response fields besides the rows to an Arrow table's schema"""
+    return table.replace_schema_metadata(
+        {key: "" if value is None else str(value) for key, value in metadata.items()}
+    )
+
+
+def _get_etag(*parts) -> str:
+    """
+    Strong ETag of a response, from the versions of the objects it is built
+    from and the parameters shaping it
+    """
+    digest = hashlib.sha256("\0".join(map(str, parts)).encode()).hexdigest()
+    return quote_etag(digest[:32])
+
+
+def _is_not_modified(request, etag: str) -> bool:
+    """Whether the client's If-None-Match already has the `etag` version"""
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    # If-None-Match compares weakly
+    return "*" in etags or etag in (tag.removeprefix("W/") for tag in etags)
+
+
+def _with_etag(response: Response, etag: str) -> Response:
+    """Tag a response, which clients must revalidate before reusing"""
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ["Accept"])
+    return response
+
+
+def _is_columnar(request) -> bool:
+    """
+    Read the shape query param: "rows" (default) for a list of row objects,
+    "columnar" for {columns, data} with one list of values per row. Raises
+    ValueError when invalid.
+    """
+    shape = request.query_params.get("shape", "rows")
+    if shape not in ("rows", "columnar"):
+        raise ValueError("shape must be rows or columnar")
+    return shape == "columnar"
+
+
 @api_view(["GET"])
 @authentication_classes([ClerkJWTAuthentication])
 @permission_classes([IsAuthenticated])
+@renderer_classes(TABLE_RENDERER_CLASSES)
 def get_csv(request, uuid):
+    try:
+        offset, limit = _get_pagination_params(request)
+    except ValueError:
+        return Response(
+            {"error": "offset and limit must be non-negative integers"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        columnar = _is_columnar(request)
+    except ValueError:
+        return Response(
+            {"error": "shape must be rows or columnar"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        # Revalidating only looks up the version of the data, the tag is taken
+        # before reading so a concurrent write can't be hidden behind it
+        etag = _get_etag(
+            csv_service.get_data_version(request.user.id, str(uuid)),
+            offset,
+            limit,
+            columnar,
+            request.accepted_renderer.format,
+        )
+        if _is_not_modified(request, etag):
+            return _with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        # Only the row groups covering the requested page are read
+        columns, total = csv_service.get_rows(
+            request.user.id, str(uuid), offset=offset, limit=limit
+        )
+        page = {"total": total, "offset": offset, "limit": limit}
+        return _with_etag(_get_rows_response(request, columns, page, columnar), etag)
+    except ValueError:
+        return Response({"error": "CSV not found"}, status=status.HTTP_404_NOT_FOUND)
+
+
+def _get_rows_response(
+    request, columns: List[ColumnDef], page: dict, columnar: bool
+) -> Response:
+    """Respond with a page of rows in the shape or media type requested"""
+    if _is_arrow(request):
+        table = csv_service.transform_to_arrow_table(columns, external_ids=True)
+        return Response(_with_metadata(table, page))
+    if columnar:
+        column_ids, data = csv_service.transform_to_columnar_format(
+            columns, external_ids=True
+        )
+        return Response({"columns": column_ids, "data": data, **page})
+    _, rows = csv_service.transform_to_row_format(columns, external_ids=True)
+    return Response({"rows": rows, **page})
+
+
+@api_view(["POST"])
+@authentication_classes([ClerkJWTAuthentication])
+@permission_classes([IsAuthenticated])
+@renderer_classes(TABLE_RENDERER_CLASSES)
+def query_csv(request, uuid):
+    """
+    Filter, sort and search the rows of a dataset. The body holds the query,
+    pages and shapes are requested as with get_csv, and total is the number
+    of matching rows.
+    """
+    try:
+        offset, limit = _get_pagination_params(request)
+    except ValueError:
+        return Response(
+            {"error": "offset and limit must be non-negative integers"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        columnar = _is_columnar(request)
+        query = query_service.parse_query(request.data)
+    except InvalidQueryError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ValueError:
+        return Response(
+            {"error": "shape must be rows or columnar"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
     try:
         columns = csv_service.get_data(request.user.id, str(uuid))
-        _, rows = csv_service.transform_to_row_format(columns)
-        return Response({"rows": rows})
     except ValueError:
         return Response({"error": "CSV not found"}, status=status.HTTP_404_NOT_FOUND)
 
+    try:
+        columns, total = query_service.query_rows(columns, query, offset, limit)
+    except (ColumnNotFoundError, InvalidQueryError) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    page = {"total": total, "offset": offset, "limit": limit}
+    return _get_rows_response(request, columns, page, columnar)
+
 
 @api_view(["GET"])
 @authentication_classes([ClerkJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def get_metadata(request, uuid):
     try:
-        metadata = csv_service.get_metadata(request.user.id, str(uuid))
-        columns = csv_service.get_data(request.user.id, str(uuid))
-        column_defs, _ = csv_service.transform_to_row_format(columns)
+        etag = _get_etag(
+            *csv_service.get_many(
+                lambda: csv_service.get_metadata_version(request.user.id, str(uuid)),
+                # Column definitions are stored with the data
+                lambda: csv_service.get_data_version(request.user.id, str(uuid)),
+            )
+        )
+        if _is_not_modified(request, etag):
+            return _with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        metadata, column_defs = csv_service.get_many(
+            lambda: csv_service.get_metadata(request.user.id, str(uuid)),
+            lambda: csv_service.get_columns(request.user.id, str(uuid)),
+        )
 
         # Enhance column definitions with classifier metadata
         dataset_type = metadata.get("dataset_type")
@@ -123,10 +368,60 @@ def get_metadata(request, uuid):
                         else False
                     )
 
-        return Response({"columns": column_defs, "metadata": metadata})
+        return _with_etag(
+            Response({"columns": column_defs, "metadata": metadata}), etag
+        )
+    except ValueError:
+        return Response({"error": "CSV not found"}, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(["GET"])
+@authentication_classes([ClerkJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def get_column_stats(request, uuid, column_id):
+    try:
+        stats = csv_service.get_column_stats(request.user.id, str(uuid), column_id)
+    except ColumnNotFoundError as e:
+        return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except ValueError:
+        return Response({"error": "CSV not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({"column_id": column_id, "stats": stats})
+
+
+@api_view(["GET"])
+@authentication_classes([ClerkJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def get_column_facets(request, uuid, column_id):
+    """The most frequent values of a column, as filter options with their counts"""
+    try:
+        limit = int(request.query_params.get("limit", TOP_VALUES))
+    except ValueError:
+        return Response(
+            {"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    # Only the top values profiled are stored
+    limit = max(0, min(limit, TOP_VALUES))
+
+    try:
+        stats = csv_service.get_column_stats(request.user.id, str(uuid), column_id)
+    except ColumnNotFoundError as e:
+        return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
     except ValueError:
         return Response({"error": "CSV not found"}, status=status.HTTP_404_NOT_FOUND)
 
+    facets = stats["top_values"][:limit]
+    return Response(
+        {
+            "column_id": column_id,
+            "facets": facets,
+            # Values outside the facets, and empty ones
+            "other_count": stats["count"] - sum(facet["count"] for facet in facets),
+            "null_count": stats["null_count"],
+            "distinct_count": stats["distinct_count"],
+        }
+    )
+
 
 @api_view(["POST"])
 @authentication_classes([ClerkJWTAuthentication])
@@ -147,7 +442,7 @@ def update_dataset_type(request, uuid):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        columns = csv_service.get_data(request.user.id, str(uuid))
+        columns = csv_service.get_columns(request.user.id, str(uuid))
         # Check if any columns are already classified
         classified_columns = [col for col in columns if col.get("classification")]
         if classified_columns:
@@ -181,7 +476,6 @@ def apply_classifications(request, uuid):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        columns = csv_service.get_data(request.user.id, str(uuid))
         operations = []
 
         for classification in classifications:
@@ -197,8 +491,13 @@ def apply_classifications(request, uuid):
             ) as e:
                 return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        columns = column_operation_service.apply_operations(columns, operations)
-        csv_service.save_data(request.user.id, str(uuid), columns)
+        csv_service.update_data(
+            request.user.id,
+            str(uuid),
+            lambda columns: column_operation_service.apply_operations(
+                columns, operations
+            ),
+        )
 
         # Update metadata to remove applied suggestions
         metadata = csv_service.get_metadata(request.user.id, str(uuid)) or {}
@@ -266,6 +565,7 @@ def get_suggestions(request, uuid):
 @api_view(["POST"])
 @authentication_classes([ClerkJWTAuthentication])
 @permission_classes([IsAuthenticated])
+@renderer_classes(TABLE_RENDERER_CLASSES)
 def deduplicate_csv(request, uuid):
     # Get column_ids from request body
     column_ids = request.data.get("column_ids", [])
@@ -273,10 +573,22 @@ def deduplicate_csv(request, uuid):
         return Response(
             {"error": "No column_ids provided"}, status=status.HTTP_400_BAD_REQUEST
         )
+    try:
+        columnar = _is_columnar(request)
+    except ValueError:
+        return Response(
+            {"error": "shape must be rows or columnar"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
     # Get the existing classified data
-    metadata = csv_service.get_metadata(request.user.id, str(uuid))
-    columns = csv_service.get_data(request.user.id, str(uuid))
+    # Only the selected columns take part in deduplication
+    metadata, columns = csv_service.get_many(
+        lambda: csv_service.get_metadata(request.user.id, str(uuid)),
+        lambda: csv_service.get_data(
+            request.user.id, str(uuid), column_ids=[*column_ids, "row_id"]
+        ),
+    )
     column_defs, rows = csv_service.transform_to_row_format(columns)
 
     # Perform deduplication
@@ -286,7 +598,19 @@ def deduplicate_csv(request, uuid):
         column_ids,
         uuid,
         metadata["dataset_type"],
+        columnar=columnar or _is_arrow(request),
     )
+    if _is_arrow(request) and "data" in result:
+        data = result.pop("data")
+        ids, duplicate_of = zip(*data) if data else ((), ())
+        table = pa.table(
+            {
+                "id": pa.array(ids, type=pa.string()),
+                "is_duplicate_of": pa.array(duplicate_of, type=pa.string()),
+            }
+        )
+        del result["columns"]
+        return Response(_with_metadata(table, result))
     return Response(result)
 
 
@@ -325,15 +649,18 @@ def remove_column(request, uuid):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        columns = csv_service.get_data(request.user.id, str(uuid))
-
         # Create and apply remove column operation
         try:
             operation = column_operation_service.create_operation(
                 action="remove_column", column_id=column_id
             )
-            columns = column_operation_service.apply_operations(columns, [operation])
-            csv_service.save_data(request.user.id, str(uuid), columns)
+            csv_service.update_data(
+                request.user.id,
+                str(uuid),
+                lambda columns: column_operation_service.apply_operations(
+                    columns, [operation]
+                ),
+            )
 
             return Response({"status": "success"})
 
@@ -358,8 +685,10 @@ def generate_column_values(request, uuid):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Get all columns
-        columns = csv_service.get_data(request.user.id, str(uuid))
+        # Get the target column only
+        columns = csv_service.get_data(
+            request.user.id, str(uuid), column_ids=[column_id]
+        )
 
         # Find the target column
         target_column = next((col for col in columns if col["id"] == column_id), None)
@@ -414,18 +743,17 @@ def update_column_values(request, uuid):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Get all columns
-        columns = csv_service.get_data(request.user.id, str(uuid))
-
-        # Create and apply the update operation
+        # Create and apply the update operation, only the column is rewritten
         operation = column_operation_service.create_operation(
             action="update_column_values", column_id=column_id, updates=transformations
         )
-
-        updated_columns = column_operation_service.apply_operations(
-            columns, [operation]
+        csv_service.update_data(
+            request.user.id,
+            str(uuid),
+            lambda columns: column_operation_service.apply_operations(
+                columns, [operation]
+            ),
         )
-        csv_service.save_data(request.user.id, str(uuid), updated_columns)
 
         return Response(
             {
@@ -444,6 +772,90 @@ def update_column_values(request, uuid):
         return Response({"error": "CSV not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(["POST"])
+@authentication_classes([ClerkJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def apply_operations(request, uuid):
+    """
+    Apply an ordered list of column operations, each an action with its
+    arguments as for create_operation, e.g. {"action": "remove_column",
+    "column_id": "..."}. The dataset is read and saved once, and none of the
+    operations are saved unless all of them apply.
+
+    The response's version is the version of the data written, as
+    CSVService.get_data_version gives it, to tell one write from another. It
+    is not an ETag: get_csv and get_metadata tag responses with a hash of the
+    data version and the parameters shaping them, so it can't be sent as
+    If-None-Match.
+    """
+    try:
+        operation_requests = request.data.get("operations")
+        if not operation_requests or not isinstance(operation_requests, list):
+            return Response(
+                {"error": "operations must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        operations = []
+        for operation_request in operation_requests:
+            try:
+                _validate_operation(operation_request)
+                operations.append(
+                    column_operation_service.create_operation(**operation_request)
+                )
+            except (
+                ValueError,
+                InvalidActionError,
+                InvalidClassificationError,
+            ) as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            _, version = csv_service.update_data(
+                request.user.id,
+                str(uuid),
+                lambda columns: column_operation_service.apply_operations(
+                    columns, operations
+                ),
+            )
+        except ColumnNotFoundError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Suggestions for classified or removed columns no longer apply
+        changed_columns = {
+            operation_request.get("column_id")
+            for operation_request in operation_requests
+            if operation_request["action"] in ("classify_column", "remove_column")
+        }
+
+        def drop_suggestions(metadata: Metadata) -> Metadata:
+            if "suggestions" in metadata:
+                metadata["suggestions"] = [
+                    s
+                    for s in metadata["suggestions"]
+                    if s.get("column_id") not in changed_columns
+                ]
+            return metadata
+
+        if changed_columns:
+            # Conditional, so suggestions or a dataset type saved meanwhile
+            # are kept
+            csv_service.update_metadata(request.user.id, str(uuid), drop_suggestions)
+
+        # The data version written, even when a later write already replaced
+        # it. A separate identifier from the ETags of the GET endpoints.
+        return Response(
+            {
+                "status": "success",
+                "operations_applied": len(operations),
+                "version": version,
+            }
+        )
+
+    except ValueError:
+        return Response({"error": "CSV not found"}, status=status.HTTP_404_NOT_FOUND)
+
+
 @api_view(["POST"])
 def send_message(request):
     """Handle incoming messages from users"""
@@ -484,29 +896,19 @@ def send_message(request):
 @authentication_classes([ClerkJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def list_csv_files(request):
-    # Get list of file UUIDs
-    file_uuids = csv_service.list_user_files(request.user.id)
+    try:
+        offset, limit = _get_pagination_params(request)
+    except ValueError:
+        return Response(
+            {"error": "offset and limit must be non-negative integers"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
-    # Fetch metadata for each file
-    files = []
-    for file_uuid in file_uuids:
-        try:
-            metadata = csv_service.get_metadata(request.user.id, file_uuid)
-            files.append(
-                {
-                    "uuid": file_uuid,
-                    "original_filename": metadata.get("original_filename"),
-                    "dataset_type": metadata.get("dataset_type"),
-                    "created_at": metadata.get(
-                        "created_at"
-                    ),  # Will be None if not present
-                }
-            )
-        except ValueError:
-            # Skip files with missing/invalid metadata
-            continue
+    # Files come from the user's catalog, sorted newest first
+    files, total = csv_service.list_files(request.user.id, offset=offset, limit=limit)
 
-    # Sort by created_at if available, newest first
-    files.sort(key=lambda x: x["created_at"] if x["created_at"] else "", reverse=True)
+    # Without a limit every file is returned as a plain list
+    if limit is None:
+        return Response(files)
 
-    return Response(files)
+    return Response({"files": files, "total": total, "offset": offset, "limit": limit})